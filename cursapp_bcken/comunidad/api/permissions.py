@@ -1,6 +1,7 @@
 from rest_framework import permissions
-from evaluacion.models import Inscripcion
+from cursos.models import Leccion
 from comunidad.models import PreguntaForo
+from evaluacion import accesos
 
 class IsEnrolledAndOwnerOrReadOnly(permissions.BasePermission):
     """
@@ -28,39 +29,33 @@ class IsEnrolledAndOwnerOrReadOnly(permissions.BasePermission):
             return False
         
         if pregunta_id:
-            # Si estamos creando una RESPUESTA, buscamos la lección a través de la pregunta
-            try:
-                leccion_id = PreguntaForo.objects.get(pk=pregunta_id).leccion.id
-            except PreguntaForo.DoesNotExist:
-                return False
+            # Si estamos creando una RESPUESTA, buscamos el curso a través de la pregunta
+            curso_id = PreguntaForo.objects.filter(pk=pregunta_id).values_list(
+                'leccion__curso_id', flat=True
+            ).first()
+        else:
+            curso_id = Leccion.objects.filter(pk=leccion_id).values_list('curso_id', flat=True).first()
         
-        # Verificar la inscripción
-        esta_inscrito = Inscripcion.objects.filter(
-            alumno=request.user,
-            curso__modulos__lecciones__id=leccion_id,
-            estado_pago=Inscripcion.ESTADO_PAGADO
-        ).exists()
+        if curso_id is None:
+            return False
         
-        return esta_inscrito
+        # Verificar la inscripción (caché de accesos, sin consultas con la caché caliente)
+        return accesos.esta_inscrito(request.user, curso_id)
     
     def has_object_permission(self, request, view, obj):
         # Permisos de Lectura
         if request.method in permissions.SAFE_METHODS:
             # Verificamos si el usuario puede ver este objeto (si está inscrito)
-            curso = None
+            curso_id = None
             if hasattr(obj, 'leccion'): # Si es una Pregunta
-                curso = obj.leccion.modulo.curso
+                curso_id = obj.leccion.curso_id
             elif hasattr(obj, 'pregunta'): # Si es una Respuesta
-                curso = obj.pregunta.leccion.modulo.curso
+                curso_id = obj.pregunta.leccion.curso_id
                 
-            if not curso:
+            if not curso_id:
                 return False
             
-            return Inscripcion.objects.filter(
-                alumno=request.user,
-                curso=curso,
-                estado_pago=Inscripcion.ESTADO_PAGADO
-            ).exists()
+            return accesos.esta_inscrito(request.user, curso_id)
             
         # Permisos de Edición/Borrado
         # Solo el autor original puede editar o borrar
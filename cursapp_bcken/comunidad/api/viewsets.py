@@ -16,7 +16,7 @@ class PreguntaForoViewSet(viewsets.ModelViewSet):
         # Filtra las preguntas para la lección específica en la URL
         leccion_pk = self.kwargs.get('leccion_pk')
         if leccion_pk:
-            return PreguntaForo.objects.filter(leccion_id=leccion_pk)
+            return PreguntaForo.objects.filter(leccion_id=leccion_pk).select_related('leccion')
         return PreguntaForo.objects.none()
     
     def perform_create(self, serializer):
@@ -34,7 +34,7 @@ class RespuestaForoViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         pregunta_pk = self.kwargs.get('pregunta_pk')
         if pregunta_pk:
-            return RespuestaForo.objects.filter(pregunta_id=pregunta_pk)
+            return RespuestaForo.objects.filter(pregunta_id=pregunta_pk).select_related('pregunta__leccion')
         return RespuestaForo.objects.none()
     
     def perform_create(self, serializer):
@@ -48,8 +48,8 @@ class RespuestaForoViewSet(viewsets.ModelViewSet):
         respuesta = self.get_object()
         
         # Solo el instructor del curso o el autor de la pregunta pueden marcar 'es_util'
-        es_instructor = respuesta.pregunta.leccion.modulo.curso.instructor == request.user
-        es_autor_pregunta = respuesta.pregunta.autor == request.user
+        es_instructor = respuesta.pregunta.leccion.instructor_id == request.user.pk
+        es_autor_pregunta = respuesta.pregunta.autor_id == request.user.pk
         
         if 'es_util' in request.data and not (es_instructor or es_autor_pregunta):
             raise exceptions.PermissionDenied("Solo el instructor o el autor de la pregunta puede marcar esta respuesta.")
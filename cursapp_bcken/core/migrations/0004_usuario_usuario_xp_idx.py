@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0003_usuario_puntos_totales_usuario_xp_totales'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(fields=['-xp_totales', 'id'], name='usuario_xp_idx'),
+        ),
+    ]
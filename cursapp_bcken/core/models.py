@@ -65,6 +65,10 @@ class Usuario(AbstractUser):
     class Meta:
         verbose_name = 'Usuario'
         verbose_name_plural = 'Usuarios'
+        indexes = [
+            # Clave de la paginación por cursor del Leaderboard
+            models.Index(fields=['-xp_totales', 'id'], name='usuario_xp_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_rol_display()}: {self.username}"
@@ -5,6 +5,11 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+El endpoint de progreso del procesamiento de video (Server-Sent Events) es
+una vista asíncrona que mantiene la conexión abierta: en producción servir
+la aplicación con un servidor ASGI (p. ej. 'uvicorn cursapp_bcken.asgi:application'
+o daphne) para que cada cliente conectado no ocupe un worker WSGI.
 """
 
 import os
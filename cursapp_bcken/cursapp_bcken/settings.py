@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -48,12 +49,17 @@ INSTALLED_APPS = [
     'django_celery_results',
 ]
 
+# Caché compartida (Redis) entre todos los workers de gunicorn y Celery.
+# La tasa BCV y demás valores calculados deben ser los mismos para todos los procesos.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'tasa-bcv-cache',
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_CACHE_URL', 'redis://localhost:6379/1'),
     }
 }
+# Progreso del procesamiento de video por SSE con pub/sub de Redis
+# (None: el stream consulta la caché cada medio segundo)
+PROGRESO_REDIS_URL = os.environ.get('REDIS_CACHE_URL', 'redis://localhost:6379/1')
 
 # -------------------------------------------------------------
 # Configuración de Django REST Framework (DRF)
@@ -118,6 +124,41 @@ AUTH_USER_MODEL = 'core.Usuario'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Subidas reanudables por partes de archivos de lecciones (videos, SCORM)
+SUBIDAS_DIRECTORIO = 'subidas' # Archivos parciales, relativo a MEDIA_ROOT
+SUBIDAS_TAMANO_MAXIMO = 10 * 1024 ** 3 # 10 GB
+SUBIDAS_CADUCIDAD_HORAS = 24 # Sesiones sin actividad se eliminan después de este tiempo
+
+# Procesamiento de video (HLS adaptativo con ffmpeg)
+FFMPEG_BINARIO = os.environ.get('FFMPEG_BINARIO', 'ffmpeg')
+FFPROBE_BINARIO = os.environ.get('FFPROBE_BINARIO', 'ffprobe')
+HLS_DIRECTORIO = 'hls' # Escaleras HLS por lección, relativo a MEDIA_ROOT
+TRANSCODIFICACION_CPUS = int(os.environ.get('TRANSCODIFICACION_CPUS', os.cpu_count() or 1)) # CPUs por tarea
+SSE_MAX_CONEXIONES = int(os.environ.get('SSE_MAX_CONEXIONES', 1000)) # Streams abiertos por proceso
+
+# Paquetes SCORM descomprimidos (almacenamiento direccionado por contenido)
+SCORM_DIRECTORIO = 'scorm' # Relativo a MEDIA_ROOT
+SCORM_MAX_ARCHIVOS = 20000
+SCORM_MAX_DESCOMPRIMIDO = 4 * 1024 ** 3 # 4 GB (protección contra zip bombs)
+SCORM_MAX_MANIFIESTO = 2 * 1024 ** 2 # 2 MB: imsmanifest.xml se lee entero en memoria
+SCORM_SUSPEND_DATA_MAXIMO = 64000 # Caracteres de cmi.suspend_data (límite de SCORM 2004)
+# Origen (esquema://host) desde el que se sirven los paquetes SCORM: otro dominio
+# que apunte a este backend, sin las cookies de la API (que no comparta
+# SESSION_COOKIE_DOMAIN) y en ALLOWED_HOSTS. Vacío: el origen de la API (desarrollo).
+SCORM_ORIGEN = os.environ.get('SCORM_ORIGEN', '')
+
+# Variantes responsivas de las portadas (nombres con hash: cacheables para siempre)
+PORTADAS_DIRECTORIO = 'portadas'
+PORTADA_TAMANO_MAXIMO = 10 * 1024 ** 2 # 10 MB
+
+# Entrega de los archivos de las lecciones (con verificación de inscripción)
+# - 'x-accel': Nginx envía el archivo (location 'internal' con alias a MEDIA_ROOT en MEDIA_ACCEL_PREFIJO)
+# - 'x-sendfile': Apache (mod_xsendfile) envía el archivo
+# - 'python': sin proxy; Django lo envía (os.sendfile vía wsgi.file_wrapper en gunicorn)
+MEDIA_ENTREGA = os.environ.get('MEDIA_ENTREGA', 'python')
+MEDIA_ACCEL_PREFIJO = os.environ.get('MEDIA_ACCEL_PREFIJO', '/media-protegida/')
+MEDIA_TOKEN_DURACION = 60 * 60 * 4 # segundos de validez de las URLs firmadas (más que un video largo)
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -214,12 +255,39 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Tareas periódicas (Celery beat)
+CELERY_BEAT_SCHEDULE = {
+    # Refresca la tasa BCV cada hora, mucho antes de que se venza (6 horas)
+    'refrescar-tasa-bcv': {
+        'task': 'evaluacion.tasks.refrescar_tasa_bcv_task',
+        'schedule': timedelta(hours=1),
+    },
+    # Elimina las subidas reanudables abandonadas y sus archivos parciales
+    'limpiar-subidas-abandonadas': {
+        'task': 'cursos.tasks.limpiar_subidas_abandonadas_task',
+        'schedule': timedelta(hours=6),
+    },
+    # Vuelca a la BD los commits SCORM diferidos (?modo=diferido)
+    'volcar-commits-scorm': {
+        'task': 'evaluacion.tasks.volcar_commits_scorm_task',
+        'schedule': timedelta(seconds=10),
+    },
+    # Suma a la BD el tiempo dedicado y el porcentaje visto de los latidos
+    'volcar-latidos': {
+        'task': 'evaluacion.tasks.volcar_latidos_task',
+        'schedule': timedelta(seconds=30),
+    },
+}
+
 # Configuración de CORS
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",  # El puerto donde corre Vite
     "http://127.0.0.1:5173", # Por si acaso
 ]
 
+# Páginas que pueden mostrar los paquetes SCORM en un iframe (CSP frame-ancestors)
+SCORM_FRAME_ANCESTORS = CORS_ALLOWED_ORIGINS
+
 # Opcional pero recomendado para que acepte headers como Authorization
 CORS_ALLOW_HEADERS = [
     'accept',
@@ -0,0 +1,15 @@
+"""
+Ajustes para ejecutar los tests sin un servidor Redis.
+
+'manage.py test' los usa por defecto; con otros runners (pytest-django, etc.)
+hay que indicarlos con DJANGO_SETTINGS_MODULE=cursapp_bcken.settings_test.
+"""
+from .settings import * # noqa: F401,F403
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'cursapp-tests',
+    }
+}
+PROGRESO_REDIS_URL = None
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Categoria, Etiqueta, Curso, Modulo, Leccion, Cupon
+from .models import Categoria, Etiqueta, Curso, Modulo, Leccion, Cupon, SubidaLeccion, PaqueteScorm
 
 # --- Inlines (para edición anidada) ---
 class LeccionInline(admin.TabularInline):
@@ -45,8 +45,9 @@ class CursoAdmin(admin.ModelAdmin):
         'promedio_calidad_contenido',
         'promedio_claridad_explicacion',
         'promedio_utilidad_practica',
-        'promedio_soporte_instructor'
+        'promedio_soporte_instructor',
     )
+    readonly_contadores = Curso.CAMPOS_CONTADORES
     
     # Añadir Módulos en la misma página de edicion del Curso
     inlines = [ModuloInline]
@@ -66,7 +67,12 @@ class CursoAdmin(admin.ModelAdmin):
             'classes': ('collapse',), # Ocultar por defecto
             'fields': readonly_fields,
         }),
+        ('Contadores (Solo Lectura)', {
+            'classes': ('collapse',),
+            'fields': readonly_contadores,
+        }),
     )
+    readonly_fields = readonly_fields + readonly_contadores
 
 @admin.register(Modulo)
 class ModuloAdmin(admin.ModelAdmin):
@@ -88,7 +94,7 @@ class LeccionAdmin(admin.ModelAdmin):
     
 @admin.register(Categoria)
 class CategoriaAdmin(admin.ModelAdmin):
-    list_display = ('nombre', 'slug')
+    list_display = ('nombre', 'slug', 'num_cursos_publicados')
     search_fields = ('nombre',)
     prepopulated_fields = {'slug': ('nombre',)}
     
@@ -111,4 +117,20 @@ class CuponAdmin(admin.ModelAdmin):
     list_filter = ('instructor', 'fecha_expiracion')
     search_fields = ('codigo', 'instructor__username')
     readonly_fields = ('usos_actuales',)
-    autocomplete_fields = ('instructor', 'cursos')
\ No newline at end of file
+    autocomplete_fields = ('instructor', 'cursos')
+    
+@admin.register(SubidaLeccion)
+class SubidaLeccionAdmin(admin.ModelAdmin):
+    list_display = ('nombre_archivo', 'leccion', 'usuario', 'offset', 'tamano_total', 'fecha_actualizacion')
+    search_fields = ('nombre_archivo', 'leccion__titulo', 'usuario__username')
+    readonly_fields = ('leccion', 'usuario', 'ruta_parcial', 'offset', 'tamano_total')
+    
+@admin.register(PaqueteScorm)
+class PaqueteScormAdmin(admin.ModelAdmin):
+    list_display = ('leccion', 'version', 'titulo', 'href_inicio', 'num_archivos', 'fecha_procesamiento')
+    list_filter = ('version',)
+    search_fields = ('titulo', 'leccion__titulo')
+    readonly_fields = (
+        'leccion', 'version', 'titulo', 'href_inicio', 'puntuacion_minima', 'scos',
+        'huella', 'num_archivos', 'tamano_total'
+    )
@@ -0,0 +1,80 @@
+from rest_framework import filters
+from rest_framework.settings import api_settings
+from django.db.models import Case, When, IntegerField, Q
+from cursos import busqueda, facetas
+
+
+class BusquedaCatalogoFilter(filters.BaseFilterBackend):
+    """
+    Búsqueda de texto completo del catálogo (?search=...).
+    Usa el índice de 'cursos.busqueda' (título, descripción, etiquetas,
+    categoría e instructor), insensible a acentos y con raíces en español.
+    Los resultados se ordenan por relevancia, salvo que se pida ?ordering=.
+    
+    El orden por relevancia se limita a las busqueda.MAX_RESULTADOS
+    coincidencias más relevantes; si hay más, deja 'busqueda_truncada' en
+    la vista. Con ?ordering= se filtra con todas las coincidencias.
+    """
+    search_param = 'search'
+    
+    @classmethod
+    def obtener_termino(cls, request):
+        return request.query_params.get(cls.search_param, '').strip()
+    
+    @staticmethod
+    def filtrar(queryset, termino):
+        """Todas las coincidencias, sin orden (subconsulta al índice)."""
+        coincidencias = busqueda.subconsulta_cursos(termino)
+        if coincidencias is None:
+            return BusquedaCatalogoFilter.filtrar_sin_indice(queryset, termino)
+        if not coincidencias:
+            return queryset.none()
+        return queryset.filter(pk__in=coincidencias)
+    
+    @staticmethod
+    def filtrar_por_relevancia(queryset, termino):
+        """
+        Devuelve (queryset, truncado): las MAX_RESULTADOS coincidencias más
+        relevantes en orden, y si quedaron otras fuera.
+        """
+        ids = busqueda.buscar_cursos(termino, limite=busqueda.MAX_RESULTADOS + 1)
+        if ids is None:
+            return BusquedaCatalogoFilter.filtrar_sin_indice(queryset, termino), False
+        if not ids:
+            return queryset.none(), False
+        truncado = len(ids) > busqueda.MAX_RESULTADOS
+        ids = ids[:busqueda.MAX_RESULTADOS]
+        
+        # Conserva el orden de relevancia del índice
+        relevancia = Case(
+            *[When(pk=pk, then=posicion) for posicion, pk in enumerate(ids)],
+            output_field=IntegerField()
+        )
+        return queryset.filter(pk__in=ids).annotate(relevancia=relevancia).order_by('relevancia'), truncado
+    
+    @staticmethod
+    def filtrar_sin_indice(queryset, termino):
+        """Motor sin índice: búsqueda simple por contenido."""
+        return queryset.filter(
+            Q(titulo__icontains=termino) |
+            Q(descripcion__icontains=termino) |
+            Q(instructor__username__icontains=termino)
+        )
+    
+    def filter_queryset(self, request, queryset, view):
+        termino = self.obtener_termino(request)
+        if not termino:
+            return queryset
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            return self.filtrar(queryset, termino)
+        queryset, view.busqueda_truncada = self.filtrar_por_relevancia(queryset, termino)
+        return queryset
+    
+
+class FacetasCatalogoFilter(filters.BaseFilterBackend):
+    """
+    Filtros facetados del catálogo: ?categoria=, ?etiquetas=, ?precio=,
+    ?certificado= y ?calificacion_min= (ver 'cursos.facetas').
+    """
+    def filter_queryset(self, request, queryset, view):
+        return facetas.aplicar_filtros(queryset, facetas.leer_filtros(request.query_params))
@@ -1,14 +1,33 @@
+from django.conf import settings
 from rest_framework import serializers
-from cursos.models import Curso, Modulo, Leccion, Categoria, Etiqueta, Cupon
+from cursos.models import Curso, Modulo, Leccion, Categoria, Etiqueta, Cupon, SubidaLeccion
 from core.models import Usuario
+from evaluacion.models import Cuestionario, Pregunta, OpcionRespuesta
 from utils.monetizacion import obtener_tasa_bcv
+from cursos import portadas
 
 
+# Portada responsiva: srcset de las variantes según el uso (tarjeta o detalle)
+class PortadaResponsivaField(serializers.Field):
+    def __init__(self, uso, **kwargs):
+        self.uso = uso
+        kwargs.setdefault('source', 'portada_variantes')
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+    
+    def to_representation(self, variantes):
+        return portadas.srcset(variantes, self.uso)
+
 # Serializer para Categoría
 class CategoriaSerializer(serializers.ModelSerializer):
     class Meta: 
         model = Categoria
         fields = ('id', 'nombre', 'slug', 'descripcion')
+
+# Categoría en el listado público (con su contador de cursos publicados)
+class CategoriaListadoSerializer(CategoriaSerializer):
+    class Meta(CategoriaSerializer.Meta):
+        fields = CategoriaSerializer.Meta.fields + ('num_cursos_publicados',)
         
 # Serializer para Etiqueta
 class EtiquetaSerializer(serializers.ModelSerializer):
@@ -40,8 +59,45 @@ class LeccionSerializer(serializers.ModelSerializer):
             'archivo_url', 'archivo','duracion_minutos', 
             'estado_procesamiento', 'cuerpo_articulo'
         )
+        # El contenido multimedia no se expone: el detalle del curso es un
+        # snapshot compartido por todos los usuarios. Las URLs (firmadas) se
+        # piden a la acción 'acceso', que verifica la inscripción.
+        extra_kwargs = {
+            'archivo': {'write_only': True},
+            'archivo_url': {'write_only': True},
+        }
+    
+    def to_representation(self, instance):
+        """
+        Con el contexto 'formato_articulo' = 'html' (LeccionViewSet con
+        '?formato=html') el artículo se entrega ya renderizado en lugar del Markdown.
+        """
+        datos = super().to_representation(instance)
+        if self.context.get('formato_articulo') == 'html':
+            datos.pop('cuerpo_articulo', None)
+            datos['articulo_html'] = instance.articulo_html
+            datos['articulo_indice'] = instance.articulo_indice
+        return datos
         
     
+# Sesión de subida reanudable del archivo de una lección
+class SubidaLeccionSerializer(serializers.ModelSerializer):
+    completa = serializers.BooleanField(read_only=True)
+    
+    class Meta:
+        model = SubidaLeccion
+        fields = ('id', 'leccion', 'nombre_archivo', 'tamano_total', 'offset', 'completa', 'fecha_creacion')
+        read_only_fields = ('id', 'leccion', 'offset', 'fecha_creacion')
+        
+    def validate_tamano_total(self, valor):
+        if valor <= 0:
+            raise serializers.ValidationError("El archivo no puede estar vacío.")
+        if valor > settings.SUBIDAS_TAMANO_MAXIMO:
+            raise serializers.ValidationError(
+                f"El archivo excede el máximo permitido ({settings.SUBIDAS_TAMANO_MAXIMO} bytes)."
+            )
+        return valor
+    
 # Módulo Serializer (Nivel intermedio: incluye lecciones)
 class ModuloSerializer(serializers.ModelSerializer):
     # Serializer anidado para mostrar las lecciones dentro de cada módulo.
@@ -56,6 +112,7 @@ class CursoDetailSerializer(serializers.ModelSerializer):
     instructor = InstructorSerializer(read_only=True)
     modulos = ModuloSerializer(many=True, read_only=True)
     estado_display = serializers.CharField(source='get_estado_display', read_only=True)
+    portada_responsiva = PortadaResponsivaField(portadas.USO_DETALLE)
     
     # Campos de recomendación
     categoria = CategoriaSerializer(read_only=True)
@@ -69,6 +126,7 @@ class CursoDetailSerializer(serializers.ModelSerializer):
             'id', 'titulo', 'slug', 'descripcion', 'instructor', 'precio_usd',
             'req_certificado', 'estado', 'estado_display', 'fecha_creacion', 
             'fecha_actualizacion', 'modulos', 'categoria', 'etiquetas', 'portada',
+            'portada_original', 'portada_responsiva',
             # Campos de Calificaiones
             'total_resenas',
             'promedio_calificacion_general',
@@ -77,39 +135,143 @@ class CursoDetailSerializer(serializers.ModelSerializer):
             'promedio_utilidad_practica',
             'promedio_soporte_instructor'
         )
+    
+    def validate_portada_original(self, imagen):
+        if imagen and imagen.size > settings.PORTADA_TAMANO_MAXIMO:
+            raise serializers.ValidationError(
+                f"La imagen excede el máximo permitido ({settings.PORTADA_TAMANO_MAXIMO} bytes)."
+            )
+        return imagen
         
 # Curso List Serializer (Vista de listado: minimalista y rápido)
 class CursoListSerializer(serializers.ModelSerializer):
     instructor_nombre = serializers.CharField(source='instructor.get_full_name', read_only=True)
-    num_modulos = serializers.SerializerMethodField()
     estado_display = serializers.CharField(source='get_estado_display', read_only=True)
     promedio_calificacion_general = serializers.DecimalField(max_digits=3, decimal_places=2, read_only=True)
     total_resenas = serializers.IntegerField(read_only=True)
     precio_ves = serializers.SerializerMethodField()
+    portada_responsiva = PortadaResponsivaField(portadas.USO_TARJETA)
     
     class Meta:
         model = Curso
         fields = (
             'id', 'titulo', 'slug', 'descripcion', 'instructor_nombre', 
             'precio_usd', 'precio_ves','estado', 'estado_display', 'num_modulos',
-            'promedio_calificacion_general', 'total_resenas', 'portada'
+            'num_lecciones', 'duracion_total_minutos', 'num_inscritos_pagados',
+            'promedio_calificacion_general', 'total_resenas', 'portada', 'portada_responsiva'
         )
     
     def get_precio_ves(self, obj):
         """
-        Calcula el precio en VES en tiendo real.
+        Calcula el precio en VES con la tasa BCV vigente.
+        La tasa se lee una sola vez por serialización (no una vez por fila).
         """
-        try:
-            tasa = obtener_tasa_bcv()
-            if tasa and obj.precio_usd:
-                return round(obj.precio_usd * tasa, 2)
-        except Exception:
-            pass
+        if not hasattr(self, '_tasa_bcv'):
+            self._tasa_bcv = obtener_tasa_bcv()
+        tasa = self._tasa_bcv
+        if tasa and obj.precio_usd:
+            return round(obj.precio_usd * tasa, 2)
         return None
+    
+# --- Importación / exportación del árbol completo de un curso ---
+# Mismo formato de entrada y de salida: lo que exporta un entorno se importa en otro.
+
+MAX_MODULOS_IMPORTACION = 100
+MAX_LECCIONES_POR_MODULO = 200
+MAX_PREGUNTAS_POR_CUESTIONARIO = 200
+
+def validar_ordenes(elementos, nombre):
+    """
+    Asigna el orden por posición a los elementos que no lo traen y valida
+    que no se repita (unique_together con el padre).
+    """
+    vistos = set()
+    for posicion, elemento in enumerate(elementos, start=1):
+        orden = elemento.setdefault('orden', posicion)
+        if orden in vistos:
+            raise serializers.ValidationError(f"Hay dos {nombre} con el orden {orden}.")
+        vistos.add(orden)
+    return elementos
+
+class OpcionTransferSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OpcionRespuesta
+        fields = ('texto_opcion', 'es_correcta')
+
+class PreguntaTransferSerializer(serializers.ModelSerializer):
+    opciones = OpcionTransferSerializer(many=True, required=False)
+    
+    class Meta:
+        model = Pregunta
+        fields = ('texto_pregunta', 'tipo_pregunta', 'puntuacion', 'opciones')
+
+class CuestionarioTransferSerializer(serializers.ModelSerializer):
+    preguntas = PreguntaTransferSerializer(many=True, required=False, max_length=MAX_PREGUNTAS_POR_CUESTIONARIO)
+    
+    class Meta:
+        model = Cuestionario
+        fields = ('titulo', 'descripcion', 'calificacion_minima', 'maximo_intentos', 'preguntas')
+
+class LeccionTransferSerializer(serializers.ModelSerializer):
+    orden = serializers.IntegerField(min_value=0, required=False)
+    cuestionario = CuestionarioTransferSerializer(required=False, allow_null=True)
+    
+    class Meta:
+        model = Leccion
+        fields = (
+            'titulo', 'orden', 'tipo_contenido', 'cuerpo_articulo',
+            'archivo_url', 'duracion_minutos', 'cuestionario'
+        )
+
+class ModuloTransferSerializer(serializers.ModelSerializer):
+    orden = serializers.IntegerField(min_value=0, required=False)
+    lecciones = LeccionTransferSerializer(many=True, required=False, max_length=MAX_LECCIONES_POR_MODULO)
+    
+    class Meta:
+        model = Modulo
+        fields = ('titulo', 'descripcion', 'orden', 'lecciones')
+        
+    def validate_lecciones(self, lecciones):
+        return validar_ordenes(lecciones, 'lecciones')
+
+class EtiquetasPorSlugField(serializers.ListField):
+    """Lista de slugs de etiquetas (ya existentes)."""
+    child = serializers.SlugField()
+    
+    def to_representation(self, data):
+        return [etiqueta.slug for etiqueta in data.all()]
+
+class CursoTransferBaseSerializer(serializers.ModelSerializer):
+    """Datos propios del curso (sin el árbol de contenido)."""
+    categoria = serializers.SlugRelatedField(
+        slug_field='slug', queryset=Categoria.objects.all(), required=False, allow_null=True
+    )
+    etiquetas = EtiquetasPorSlugField(required=False)
+    
+    class Meta:
+        model = Curso
+        fields = (
+            'titulo', 'slug', 'descripcion', 'portada', 'precio_usd',
+            'req_certificado', 'categoria', 'etiquetas'
+        )
+        
+    def validate_etiquetas(self, slugs):
+        # Una sola consulta para todas las etiquetas
+        etiquetas = list(Etiqueta.objects.filter(slug__in=set(slugs)))
+        faltantes = set(slugs) - {etiqueta.slug for etiqueta in etiquetas}
+        if faltantes:
+            raise serializers.ValidationError(f"Etiquetas inexistentes: {', '.join(sorted(faltantes))}.")
+        return etiquetas
+
+class CursoTransferSerializer(CursoTransferBaseSerializer):
+    """Curso completo: módulos -> lecciones -> cuestionario -> preguntas -> opciones."""
+    modulos = ModuloTransferSerializer(many=True, max_length=MAX_MODULOS_IMPORTACION)
+    
+    class Meta(CursoTransferBaseSerializer.Meta):
+        fields = CursoTransferBaseSerializer.Meta.fields + ('modulos',)
         
-    # Método para calcular el número de módulos eficientemente
-    def get_num_modulos(self, obj):
-        return obj.modulos.count()
+    def validate_modulos(self, modulos):
+        return validar_ordenes(modulos, 'módulos')
     
 class CuponSerializer(serializers.ModelSerializer):
     class Meta:
@@ -1,7 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_nested import routers
-from .viewsets import CursoViewSet, ModuloViewSet, LeccionViewSet, CategoriaViewSet, CuponViewSet
+from cursos.views import progreso_procesamiento_sse, MediaLeccionView, archivo_scorm
+from .viewsets import CursoViewSet, ModuloViewSet, LeccionViewSet, CategoriaViewSet, CuponViewSet, SubidaLeccionViewSet
 from evaluacion.api.viewsets import ResenaViewSet
 from comunidad.api.viewsets import PreguntaForoViewSet, RespuestaForoViewSet
 
@@ -19,6 +20,10 @@ cursos_router.register(r'modulos', ModuloViewSet, basename='curso-modulos')
 modulos_router = routers.NestedSimpleRouter(cursos_router, r'modulos', lookup='modulo')
 modulos_router.register(r'lecciones', LeccionViewSet, basename='modulo-lecciones')
 
+# Router Anidado para subidas reanudables (curso/1/modulos/2/lecciones/3/subidas/)
+subidas_router = routers.NestedSimpleRouter(modulos_router, r'lecciones', lookup='leccion')
+subidas_router.register(r'subidas', SubidaLeccionViewSet, basename='leccion-subidas')
+
 # Router Anidado desde lecciones par el foro
 preguntas_router = routers.NestedSimpleRouter(modulos_router, r'lecciones', lookup='leccion')
 preguntas_router.register(r'preguntas', PreguntaForoViewSet,  basename='leccion-preguntas')
@@ -31,4 +36,13 @@ respuestas_router.register(r'respuestas', RespuestaForoViewSet, basename='pregun
 resenas_router = routers.NestedSimpleRouter(router, r'catalogo', lookup='curso')
 resenas_router.register(r'resenas', ResenaViewSet, basename='curso-resenas')
 
-urlpatterns = router.urls + cursos_router.urls + modulos_router.urls + resenas_router.urls + preguntas_router.urls + respuestas_router.urls
\ No newline at end of file
+urlpatterns = [
+    # Avance del procesamiento del video de una lección (Server-Sent Events)
+    path('lecciones/<int:leccion_pk>/progreso/', progreso_procesamiento_sse, name='leccion-progreso'),
+    # Archivos de la lección con verificación de inscripción (original, HLS y vista previa)
+    path('lecciones/<int:leccion_pk>/media/', MediaLeccionView.as_view(), name='leccion-media'),
+    path('lecciones/<int:leccion_pk>/media/<path:ruta>', MediaLeccionView.as_view(), name='leccion-media-archivo'),
+    # Archivos del paquete SCORM descomprimido (token firmado en la ruta)
+    path('lecciones/<int:leccion_pk>/scorm/<str:token>/<path:ruta>', archivo_scorm, name='leccion-scorm'),
+]
+urlpatterns += router.urls + cursos_router.urls + modulos_router.urls + resenas_router.urls + preguntas_router.urls + respuestas_router.urls + subidas_router.urls
\ No newline at end of file
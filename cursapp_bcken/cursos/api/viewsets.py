@@ -1,9 +1,24 @@
-from rest_framework import viewsets, permissions, filters
+from urllib.parse import quote
+from rest_framework import viewsets, permissions, filters, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError, UnsupportedMediaType
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.db.models import Count
-from cursos.models import Curso, Modulo, Leccion, Categoria, Cupon
-from .serializers import CursoListSerializer, CursoDetailSerializer, ModuloSerializer, LeccionSerializer, CategoriaSerializer, CuponSerializer
-from cursos.tasks import process_video_task
+from django.urls import reverse
+from django.utils.http import parse_etags
+from django.db import transaction
+from django.db.models import Prefetch, Q, F
+from cursos.models import Curso, Modulo, Leccion, Categoria, Cupon, SubidaLeccion, PaqueteScorm
+from .filters import BusquedaCatalogoFilter, FacetasCatalogoFilter
+from .serializers import CursoListSerializer, CursoDetailSerializer, ModuloSerializer, LeccionSerializer, CategoriaListadoSerializer, CuponSerializer, CursoTransferSerializer, SubidaLeccionSerializer
+from cursos.tasks import encolar_procesamiento
+from cursos import snapshots, facetas, busqueda, importacion, subidas, firmas
+from evaluacion import accesos
+from cursos.transcodificacion import LISTA_MAESTRA, POSTER, SPRITE_VTT
+from utils.paginacion import PaginacionHibrida
 
 # --- Permisos Personalizados ---
 class IsOwnerOrReadOnly(permissions.BasePermission):
@@ -34,20 +49,62 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
         if not request.user.es_instructor:
             return False
         
-        # Determinar el propietario
-        owner = None
+        # Determinar el propietario (solo ids: sin cargar el usuario)
+        owner_id = None
         if isinstance(obj, Curso):
             # Si el objeto es un Curso, el dueño es 'instructor'
-            owner = obj.instructor
+            owner_id = obj.instructor_id
         elif isinstance(obj, Modulo):
             # Si el objeto es un Modulo, el dueño es 'curso.instructor'
-            owner = obj.curso.instructor
+            owner_id = Curso.objects.filter(pk=obj.curso_id).values_list('instructor_id', flat=True).first()
         elif isinstance(obj, Leccion):
-            # Si el objeto es una Leccion, el dueño es 'modulo.curso.instructor'
-            owner = obj.modulo.curso.instructor
+            # Si el objeto es una Leccion, el dueño está copiado en la propia lección
+            owner_id = obj.instructor_id
             
         # Permitir solo si el usuario es el propietario
-        return owner == request.user
+        return owner_id is not None and owner_id == request.user.pk
+    
+# --- Reordenamiento ---
+class ReordenarMixin:
+    """
+    Acción 'reordenar' (POST {"orden": [id, id, ...]}) para módulos y lecciones.
+    Recibe la lista completa de hermanos en el nuevo orden y la aplica en una
+    transacción con un número fijo de queries, sin chocar con el
+    unique_together (padre, orden):
+    1. Desplaza todos los 'orden' por encima del máximo actual (un UPDATE).
+    2. Escribe el orden final 1..N con un solo bulk_update.
+    La vista define 'obtener_hermanos()' -> (queryset de hermanos, curso).
+    """
+    
+    @action(detail=False, methods=['post'])
+    def reordenar(self, request, *args, **kwargs):
+        hermanos, curso = self.obtener_hermanos()
+        if curso.instructor_id != request.user.pk:
+            raise PermissionDenied("Solo el instructor del curso puede reordenar su contenido.")
+        
+        ids = request.data.get('orden')
+        if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            raise ValidationError({'orden': "Debe ser una lista de ids."})
+        if len(set(ids)) != len(ids):
+            raise ValidationError({'orden': "La lista tiene ids repetidos."})
+        
+        with transaction.atomic():
+            # Bloquea a los hermanos mientras se reordenan
+            actuales = dict(hermanos.select_for_update().values_list('id', 'orden'))
+            if set(ids) != set(actuales):
+                raise ValidationError({'orden': "Debe incluir exactamente todos los ids del contenedor."})
+            
+            if ids:
+                desplazamiento = max(len(ids), max(actuales.values())) + 1
+                hermanos.update(orden=F('orden') + desplazamiento)
+                modelo = hermanos.model
+                modelo.objects.bulk_update(
+                    [modelo(pk=pk, orden=posicion) for posicion, pk in enumerate(ids, start=1)],
+                    ['orden']
+                )
+            snapshots.invalidar_cursos([curso.pk])
+        
+        return Response([{'id': pk, 'orden': posicion} for posicion, pk in enumerate(ids, start=1)])
     
 # --- ViewSets ---
 class CursoViewSet(viewsets.ModelViewSet):
@@ -59,20 +116,42 @@ class CursoViewSet(viewsets.ModelViewSet):
     queryset = Curso.objects.all().order_by('-fecha_creacion')
     permission_classes = [IsOwnerOrReadOnly] # Lectura pública, escritura solo para Instructores.
     
-    filter_backends = [filters.OrderingFilter, filters.SearchFilter]
+    # La búsqueda (?search=) usa el índice de texto completo y ordena por relevancia;
+    # ?ordering= tiene prioridad sobre la relevancia.
+    # Filtros facetados: ?categoria=, ?etiquetas=, ?precio=, ?certificado=, ?calificacion_min=
+    filter_backends = [BusquedaCatalogoFilter, FacetasCatalogoFilter, filters.OrderingFilter]
     ordering_fields = ['fecha_creacion', 'promedio_calificacion_general', 'total_resenas']
-    search_fields = ['titulo', 'descripcion', 'instructor__username']
+    
+    # ?paginacion=cursor activa la paginación por cursor (scroll infinito).
+    # Claves estables según ?ordering= (la primera es la de por defecto).
+    pagination_class = PaginacionHibrida
+    cursor_ordenamientos = {
+        '-fecha_creacion': ('-fecha_creacion', 'id'),
+        '-promedio_calificacion_general': ('-promedio_calificacion_general', 'id'),
+    }
     
     def get_serializer_class(self):
         """Alterna entre el serializer de listado y el de detalle."""
         if self.action == 'list':
             return CursoListSerializer
+        if self.action == 'importar':
+            return CursoTransferSerializer
         return CursoDetailSerializer
         
     def get_queryset(self):
         """
-        Filtra dinámicamente los cursos visibles basado en el rol del usuario.
+        Filtra dinámicamente los cursos visibles basado en el rol del usuario
+        y aplica el plan de consultas de la acción (número fijo de queries).
         """
+        queryset = self.queryset_visible()
+        if self.action == 'list':
+            return self.plan_listado(queryset)
+        if self.action == 'exportar':
+            return queryset # El árbol se carga por lotes al exportar
+        return self.plan_detalle(queryset)
+    
+    def queryset_visible(self):
+        """Cursos que el usuario puede ver según su rol."""
         user = self.request.user
         
         # Si el usuario no está autenticado O no es instructor
@@ -80,19 +159,144 @@ class CursoViewSet(viewsets.ModelViewSet):
             # Mostrar solo cursos PUBLICADOS
             return self.queryset.filter(estado=Curso.ESTADO_PUBLICADO)
         
-        # Si el usuario es instructor
-        from django.db.models import Q
-        
+        # Si el usuario es instructor: sus cursos y los publicados.
+        # (Sin JOINs, así que no hacen falta DISTINCT)
         return self.queryset.filter(
             Q(instructor=user) | Q(estado=Curso.ESTADO_PUBLICADO)
-        ).distinct() # Para evitar duplicados si un curso es público y es mío
+        )
+    
+    def list(self, request, *args, **kwargs):
+        """
+        Catálogo paginado + conteo de facetas ('facetas') que respeta los filtros activos.
+        
+        Una búsqueda ordenada por relevancia devuelve como mucho las
+        busqueda.MAX_RESULTADOS coincidencias más relevantes ('count' cuenta
+        solo esas). Si había más, lo indica 'busqueda':
+        {"truncado": true, "total": <coincidencias reales>, "maximo": MAX_RESULTADOS}.
+        Con ?ordering= no hay límite.
+        """
+        self.busqueda_truncada = False
+        respuesta = super().list(request, *args, **kwargs)
+        if self.busqueda_truncada:
+            respuesta.data['busqueda'] = {
+                'truncado': True,
+                'total': self.contar_coincidencias(),
+                'maximo': busqueda.MAX_RESULTADOS,
+            }
+        respuesta.data['facetas'] = self.obtener_facetas()
+        return respuesta
+    
+    def contar_coincidencias(self):
+        """Total real de la búsqueda con la visibilidad y los filtros facetados."""
+        base = facetas.aplicar_filtros(self.queryset_visible(), facetas.leer_filtros(self.request.query_params))
+        termino = BusquedaCatalogoFilter.obtener_termino(self.request)
+        return BusquedaCatalogoFilter.filtrar(base, termino).count()
+    
+    def obtener_facetas(self):
+        user = self.request.user
+        base = self.queryset_visible()
+        termino = BusquedaCatalogoFilter.obtener_termino(self.request)
+        if termino:
+            base = BusquedaCatalogoFilter.filtrar(base, termino)
+        
+        # Todo lo que cambia la base además de los filtros: visibilidad y búsqueda
+        visibilidad = f'instructor:{user.pk}' if user.is_authenticated and user.es_instructor else 'publico'
+        alcance = [visibilidad, busqueda.normalizar_texto(termino)]
+        return facetas.calcular_facetas(base, facetas.leer_filtros(self.request.query_params), alcance)
+    
+    @staticmethod
+    def plan_listado(queryset):
+        """
+        Catálogo: instructor en el mismo JOIN. Los conteos (módulos, lecciones,
+        duración, inscritos) son columnas desnormalizadas del curso.
+        """
+        return queryset.select_related('instructor')
+    
+    @staticmethod
+    def plan_detalle(queryset):
+        """
+        Detalle: el árbol módulos -> lecciones y las etiquetas se cargan con
+        una query por nivel, sin importar el tamaño del curso.
+        """
+        return queryset.select_related('instructor', 'categoria').prefetch_related(
+            Prefetch(
+                'modulos',
+                queryset=Modulo.objects.order_by('orden').prefetch_related(
+                    Prefetch('lecciones', queryset=Leccion.objects.order_by('orden'))
+                )
+            ),
+            'etiquetas'
+        )
+        
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Detalle del curso servido desde un snapshot cacheado y versionado.
+        - Un hit de caché no toca el ORM (la visibilidad se decide con el snapshot).
+        - Responde con ETag; si el cliente envía If-None-Match vigente, devuelve 304.
+        """
+        curso_id = kwargs.get(self.lookup_field)
+        if not str(curso_id).isdigit():
+            return super().retrieve(request, *args, **kwargs)
+        
+        version, snapshot = snapshots.obtener_snapshot(curso_id)
+        if snapshot is None:
+            # get_object() aplica la visibilidad por rol y los permisos
+            curso = self.get_object()
+            contenido = JSONRenderer().render(self.get_serializer(curso).data)
+            snapshot = snapshots.guardar_snapshot(curso, version, contenido)
+        elif not self.puede_ver_snapshot(snapshot):
+            raise Http404
+        
+        if snapshot['etag'] in parse_etags(request.headers.get('If-None-Match', '')):
+            respuesta = HttpResponseNotModified()
+        else:
+            respuesta = HttpResponse(snapshot['contenido'], content_type='application/json')
+        respuesta['ETag'] = snapshot['etag']
+        respuesta['Cache-Control'] = 'no-cache' # El cliente debe revalidar con el ETag
+        return respuesta
+    
+    def puede_ver_snapshot(self, snapshot):
+        """Misma regla que get_queryset(): publicados para todos, el resto solo su instructor."""
+        if snapshot['estado'] == Curso.ESTADO_PUBLICADO:
+            return True
+        user = self.request.user
+        return user.is_authenticated and user.es_instructor and user.pk == snapshot['instructor_id']
         
     def perform_create(self, serializer):
         # Asigna automáticamente al usuario logueado como el instructor del curso
         serializer.save(instructor=self.request.user)
+    
+    @action(detail=False, methods=['post'])
+    def importar(self, request):
+        """
+        Crea un curso completo (módulos, lecciones, artículos y cuestionarios)
+        en una sola petición. Se valida todo el árbol antes de insertar nada;
+        el curso queda como Borrador y a nombre del instructor autenticado.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        curso = importacion.importar_curso(serializer.validated_data, request.user)
         
+        curso = self.plan_detalle(Curso.objects.filter(pk=curso.pk)).get()
+        return Response(CursoDetailSerializer(curso, context=self.get_serializer_context()).data,
+                        status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['get'])
+    def exportar(self, request, pk=None):
+        """
+        Descarga el árbol completo del curso en el formato que acepta 'importar'
+        (para migrar cursos entre entornos). Solo para su instructor.
+        """
+        curso = self.get_object()
+        if not (request.user.is_authenticated and (curso.instructor_id == request.user.pk or request.user.is_staff)):
+            raise PermissionDenied("Solo el instructor del curso puede exportarlo.")
         
-class ModuloViewSet(viewsets.ModelViewSet):
+        respuesta = StreamingHttpResponse(importacion.exportar_curso(curso), content_type='application/json')
+        respuesta['Content-Disposition'] = f'attachment; filename="{curso.slug}.json"'
+        return respuesta
+        
+        
+class ModuloViewSet(ReordenarMixin, viewsets.ModelViewSet):
     """ViewSet para la gestión de Módulos."""
     serializer_class = ModuloSerializer
     permission_classes = [IsOwnerOrReadOnly]
@@ -111,7 +315,11 @@ class ModuloViewSet(viewsets.ModelViewSet):
         curso = get_object_or_404(Curso, pk=self.kwargs.get('curso_pk'))
         serializer.save(curso=curso)
     
-class LeccionViewSet(viewsets.ModelViewSet):
+    def obtener_hermanos(self):
+        curso = get_object_or_404(Curso, pk=self.kwargs.get('curso_pk'))
+        return Modulo.objects.filter(curso=curso), curso
+    
+class LeccionViewSet(ReordenarMixin, viewsets.ModelViewSet):
     """ViewSet para la gestión de Lecciones."""
     serializer_class = LeccionSerializer
     permission_classes = [IsOwnerOrReadOnly]
@@ -123,29 +331,189 @@ class LeccionViewSet(viewsets.ModelViewSet):
             return Leccion.objects.filter(modulo__pk=modulo_pk).order_by('orden')
         return Leccion.objects.all().order_by('orden')
     
+    def get_serializer_context(self):
+        # '?formato=html': artículo pre-renderizado (no afecta al snapshot del curso)
+        contexto = super().get_serializer_context()
+        if self.request.query_params.get('formato') == 'html':
+            contexto['formato_articulo'] = 'html'
+        return contexto
+    
     def perform_create(self, serializer):
         """
         Asigna automáticamente la Lección al Módulo padre (obtenido de la URL).
-        Y dispara la tarea asíncrona si es un video.
+        Y dispara la tarea asíncrona si es un video o un paquete SCORM.
         """
         modulo = get_object_or_404(Modulo, pk=self.kwargs.get('modulo_pk'))
         
         # Guarda la lección (aún en estado PENDIENTE)
         leccion = serializer.save(modulo=modulo)
         
-        if leccion.tipo_contenido == Leccion.TIPO_VIDEO and leccion.archivo:
+        if leccion.tipo_contenido in subidas.TIPOS_PROCESADOS and leccion.archivo:
             leccion.estado_procesamiento = Leccion.ESTADO_PROCESANDO
             leccion.save(update_fields=['estado_procesamiento'])
             
-            # Llama a la tarea asíncrona
-            process_video_task.delay(leccion.id)
+            # Llama a la tarea asíncrona (transcodificación o ingesta SCORM)
+            encolar_procesamiento(leccion)
+    
+    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def acceso(self, request, *args, **kwargs):
+        """
+        Verifica la inscripción una sola vez y devuelve las URLs firmadas del
+        contenido de la lección. Las peticiones a esas URLs (y a cada segmento
+        HLS) se validan solo con la firma, sin consultar la BD.
+        """
+        leccion = self.get_object()
+        if not accesos.tiene_acceso(request.user, leccion.curso_id, leccion.instructor_id):
+            raise PermissionDenied("Debes estar inscrito en el curso para acceder a este contenido.")
+        token, expira = firmas.firmar(request.user.pk, leccion.pk)
+        
+        def url(ruta=None):
+            if ruta is None:
+                ubicacion = reverse('leccion-media', args=[leccion.pk])
+            else:
+                ubicacion = reverse('leccion-media-archivo', args=[leccion.pk, ruta])
+            return request.build_absolute_uri(f'{ubicacion}?{firmas.PARAMETRO}={quote(token, safe=":")}')
+        
+        video_listo = leccion.estado_procesamiento == Leccion.ESTADO_COMPLETADO and leccion.recursos_video
+        return Response({
+            'expira': expira,
+            'archivo': url() if leccion.archivo else None,
+            'hls': url(LISTA_MAESTRA) if video_listo else None,
+            'poster': url(POSTER) if video_listo else None,
+            'sprites': url(SPRITE_VTT) if video_listo else None,
+            'scorm': self.inicio_scorm(request, leccion, token),
+        })
+    
+    @action(detail=True, methods=['get'], url_path='progreso-url', permission_classes=[permissions.IsAuthenticated])
+    def progreso_url(self, request, *args, **kwargs):
+        """
+        URL del stream SSE con el avance del procesamiento, con un token firmado
+        solo para esta lección y de pocos minutos (EventSource no envía la
+        cabecera Authorization). El token se valida al conectar; si la conexión
+        se rechaza después (p. ej. al reconectar), el cliente pide otra URL.
+        """
+        leccion = self.get_object()
+        if not (leccion.instructor_id == request.user.pk or request.user.is_staff):
+            raise PermissionDenied("Solo el instructor del curso puede seguir el procesamiento.")
+        token, expira = firmas.firmar(
+            request.user.pk, leccion.pk, duracion=firmas.DURACION_PROGRESO, salt=firmas.SALT_PROGRESO
+        )
+        ubicacion = reverse('leccion-progreso', args=[leccion.pk])
+        return Response({
+            'url': request.build_absolute_uri(f'{ubicacion}?{firmas.PARAMETRO}={quote(token, safe=":")}'),
+            'expira': expira,
+        })
+    
+    def inicio_scorm(self, request, leccion, token):
+        """URL firmada del archivo de inicio del paquete SCORM (y sus datos del manifiesto)."""
+        if leccion.tipo_contenido != Leccion.TIPO_SCORM:
+            return None
+        paquete = PaqueteScorm.objects.filter(leccion=leccion).first()
+        if paquete is None:
+            return None
+        ruta, separador, parametros = paquete.href_inicio.partition('?')
+        ubicacion = reverse('leccion-scorm', args=[leccion.pk, token, ruta])
+        # Fuera del origen de la API: los scripts del paquete no ven sus cookies
+        if settings.SCORM_ORIGEN:
+            ubicacion = settings.SCORM_ORIGEN.rstrip('/') + ubicacion
+        return {
+            'url': request.build_absolute_uri(ubicacion) + separador + parametros,
+            'version': paquete.version,
+            'puntuacion_minima': paquete.puntuacion_minima,
+            'scos': paquete.scos,
+        }
+    
+    def obtener_hermanos(self):
+        modulo = get_object_or_404(
+            Modulo.objects.select_related('curso'),
+            pk=self.kwargs.get('modulo_pk'), curso_id=self.kwargs.get('curso_pk')
+        )
+        return Leccion.objects.filter(modulo=modulo), modulo.curso
  
+class SubidaLeccionViewSet(viewsets.GenericViewSet):
+    """
+    Subida reanudable por partes del archivo de una lección (estilo tus):
+    - POST   .../lecciones/{id}/subidas/                 {nombre_archivo, tamano_total}
+    - HEAD   .../subidas/{uuid}/                         -> Upload-Offset
+    - PATCH  .../subidas/{uuid}/  (application/offset+octet-stream, Upload-Offset)
+    - POST   .../subidas/{uuid}/finalizar/               -> adjunta y encola el procesamiento
+    - DELETE .../subidas/{uuid}/                         -> cancela
+    Solo para el instructor propietario de la lección.
+    """
+    serializer_class = SubidaLeccionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    tipo_contenido_bloque = 'application/offset+octet-stream'
+    
+    def get_queryset(self):
+        return SubidaLeccion.objects.filter(
+            usuario=self.request.user, leccion_id=self.kwargs.get('leccion_pk')
+        ).select_related('leccion')
+    
+    def obtener_leccion(self):
+        leccion = get_object_or_404(
+            Leccion,
+            pk=self.kwargs.get('leccion_pk'),
+            modulo_id=self.kwargs.get('modulo_pk'),
+            curso_id=self.kwargs.get('curso_pk')
+        )
+        if leccion.instructor_id != self.request.user.pk:
+            raise PermissionDenied("Solo el instructor del curso puede subir archivos a esta lección.")
+        return leccion
+    
+    def respuesta(self, subida, status_code=status.HTTP_200_OK):
+        respuesta = Response(self.get_serializer(subida).data, status=status_code)
+        respuesta['Upload-Offset'] = str(subida.offset)
+        respuesta['Upload-Length'] = str(subida.tamano_total)
+        respuesta['Cache-Control'] = 'no-store'
+        return respuesta
+        
+    def create(self, request, *args, **kwargs):
+        leccion = self.obtener_leccion()
+        if leccion.tipo_contenido not in subidas.TIPOS_CON_ARCHIVO:
+            raise ValidationError("Este tipo de lección no admite archivos.")
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        subida = subidas.crear_subida(leccion, request.user, **serializer.validated_data)
+        
+        respuesta = self.respuesta(subida, status.HTTP_201_CREATED)
+        respuesta['Location'] = request.build_absolute_uri(f'{subida.pk}/')
+        return respuesta
+    
+    def retrieve(self, request, *args, **kwargs):
+        # También responde a HEAD: el cliente consulta el offset para reanudar
+        return self.respuesta(self.get_object())
+    
+    def partial_update(self, request, *args, **kwargs):
+        subida = self.get_object()
+        # Solo el tipo de medio: el cliente puede añadir parámetros ('; charset=...')
+        if request.content_type.split(';')[0].strip().lower() != self.tipo_contenido_bloque:
+            raise UnsupportedMediaType(request.content_type)
+        try:
+            offset = int(request.headers['Upload-Offset'])
+        except (KeyError, ValueError):
+            raise ValidationError({'Upload-Offset': "Encabezado requerido (entero)."})
+        
+        # El cuerpo no pasa por los parsers: se lee del stream por bloques
+        subidas.escribir_bloque(subida, offset, request.stream)
+        respuesta = Response(status=status.HTTP_204_NO_CONTENT)
+        respuesta['Upload-Offset'] = str(subida.offset)
+        return respuesta
+    
+    def destroy(self, request, *args, **kwargs):
+        subidas.cancelar_subida(self.get_object())
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    @action(detail=True, methods=['post'])
+    def finalizar(self, request, *args, **kwargs):
+        leccion = subidas.finalizar_subida(self.get_object())
+        return Response(LeccionSerializer(leccion, context=self.get_serializer_context()).data)
+    
 class CategoriaViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet para listar y recuperar Categorías. Solo lectura
     """
-    queryset = Categoria.objects.annotate(num_cursos=Count('cursos')).order_by('nombre')
-    serializer_class = CategoriaSerializer
+    queryset = Categoria.objects.order_by('nombre')
+    serializer_class = CategoriaListadoSerializer
     permission_classes = [permissions.AllowAny] # Público
 
 class CuponViewSet(viewsets.ModelViewSet):
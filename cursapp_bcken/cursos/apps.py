@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CursosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cursos'
+    
+    def ready(self):
+        import cursos.signals # Importa las señales al iniciar la app
@@ -0,0 +1,82 @@
+"""
+Artículos de las lecciones (Markdown) pre-renderizados en el servidor.
+
+Al guardar una lección de tipo Artículo/Código, su Markdown se convierte en
+HTML saneado (nh3) con los bloques de código resaltados por Pygments (clases
+CSS de la hoja 'highlight') y una tabla de contenidos de los encabezados.
+El resultado se guarda junto con el hash del Markdown: si el texto no cambió
+no se vuelve a renderizar, y dos lecciones con el mismo texto (p. ej. un curso
+importado) comparten el render en la caché.
+"""
+import hashlib
+import markdown
+import nh3
+from django.core.cache import cache
+
+# Subir al cambiar las extensiones o la lista blanca: invalida todos los renders
+VERSION_RENDER = 1
+
+RENDER_KEY = "articulo:{}"
+RENDER_TIMEOUT = 60 * 60 * 24 * 7 # 7 días
+
+EXTENSIONES = ['fenced_code', 'tables', 'sane_lists', 'codehilite', 'toc']
+CONFIGURACION = {
+    'codehilite': {'css_class': 'highlight', 'guess_lang': False},
+    'toc': {'toc_depth': '2-4'},
+}
+
+ETIQUETAS = {
+    'p', 'br', 'hr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'strong', 'em', 'b', 'i',
+    'del', 's', 'sup', 'sub', 'blockquote', 'ul', 'ol', 'li', 'a', 'img', 'code',
+    'pre', 'div', 'span', 'table', 'thead', 'tbody', 'tr', 'th', 'td',
+}
+ATRIBUTOS = {
+    '*': {'class', 'id'},
+    'a': {'href', 'title'},
+    'img': {'src', 'alt', 'title'},
+}
+ESQUEMAS_URL = {'http', 'https', 'mailto'}
+
+
+def huella(texto):
+    return hashlib.sha256(f'{VERSION_RENDER}:{texto}'.encode('utf-8')).hexdigest()
+
+
+def _indice(tokens):
+    return [
+        {'nivel': t['level'], 'id': t['id'], 'titulo': t['name'], 'hijos': _indice(t['children'])}
+        for t in tokens
+    ]
+
+
+def renderizar(texto):
+    """Devuelve (html saneado, tabla de contenidos)."""
+    conversor = markdown.Markdown(extensions=EXTENSIONES, extension_configs=CONFIGURACION)
+    html = conversor.convert(texto)
+    html = nh3.clean(html, tags=ETIQUETAS, attributes=ATRIBUTOS, url_schemes=ESQUEMAS_URL)
+    return html, _indice(conversor.toc_tokens)
+
+
+def actualizar_articulo(leccion):
+    """
+    Rellena 'articulo_html', 'articulo_indice' y 'articulo_hash' de la lección
+    (sin guardarla). Devuelve True si cambiaron.
+    """
+    texto = leccion.cuerpo_articulo or ''
+    if leccion.tipo_contenido != leccion.TIPO_ARTICULO or not texto.strip():
+        if not leccion.articulo_hash and not leccion.articulo_html:
+            return False
+        leccion.articulo_html, leccion.articulo_indice, leccion.articulo_hash = '', [], ''
+        return True
+
+    clave = huella(texto)
+    if clave == leccion.articulo_hash:
+        return False
+
+    render = cache.get(RENDER_KEY.format(clave))
+    if render is None:
+        render = renderizar(texto)
+        cache.set(RENDER_KEY.format(clave), render, RENDER_TIMEOUT)
+    leccion.articulo_html, leccion.articulo_indice = render
+    leccion.articulo_hash = clave
+    return True
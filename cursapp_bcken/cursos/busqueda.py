@@ -0,0 +1,259 @@
+"""
+Índice de búsqueda de texto completo del catálogo.
+
+- SQLite (desarrollo): tabla virtual FTS5 ordenada con bm25.
+- PostgreSQL: tabla con un tsvector ponderado e índice GIN, ordenada con ts_rank.
+
+El texto se normaliza en Python antes de indexar y antes de buscar (minúsculas,
+sin acentos, sin palabras vacías y con una raíz española ligera), así
+"programacion", "Programación" y "programar" encuentran los mismos cursos en
+ambos motores.
+
+La tabla del índice la crea la migración 0011 (con su propia copia del DDL).
+"""
+import re
+import logging
+import unicodedata
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+
+logger = logging.getLogger(__name__)
+
+TABLA_INDICE = 'cursos_curso_busqueda'
+# Máximo de cursos ordenados por relevancia que devuelve una búsqueda. El
+# catálogo avisa ('busqueda.truncado') cuando hay más coincidencias.
+MAX_RESULTADOS = 500
+
+# Campos indexados y su peso en la relevancia (mayor = más importante)
+CAMPOS = ('titulo', 'descripcion', 'etiquetas', 'categoria', 'instructor')
+PESOS_SQLITE = (10.0, 1.0, 5.0, 3.0, 2.0)
+PESOS_POSTGRES = ('A', 'D', 'B', 'C', 'C')
+
+PALABRAS_VACIAS = {
+    'a', 'al', 'como', 'con', 'de', 'del', 'desde', 'e', 'el', 'en', 'entre', 'es',
+    'hasta', 'la', 'las', 'le', 'lo', 'los', 'mas', 'mi', 'muy', 'no', 'o', 'para',
+    'pero', 'por', 'que', 'se', 'si', 'sin', 'sobre', 'son', 'su', 'sus', 'tu', 'u',
+    'un', 'una', 'uno', 'y', 'ya',
+}
+
+# Sufijos derivativos y verbales (del más largo al más corto)
+SUFIJOS = (
+    'amientos', 'imientos', 'aciones', 'uciones', 'amiento', 'imiento', 'idades',
+    'amente', 'acion', 'ucion', 'adora', 'ador', 'ancia', 'encia', 'idad', 'ismo',
+    'ista', 'able', 'ible', 'ando', 'iendo', 'oso', 'osa', 'ivo', 'iva', 'mente',
+    'ar', 'er', 'ir',
+)
+LONGITUD_MINIMA_RAIZ = 4
+
+_PATRON_PALABRA = re.compile(r'[a-z0-9]+')
+
+
+def quitar_acentos(texto):
+    """'Programación' -> 'Programacion' (la ñ se convierte en n)."""
+    return ''.join(
+        c for c in unicodedata.normalize('NFKD', texto) if not unicodedata.combining(c)
+    )
+
+
+def raiz(palabra):
+    """
+    Stemmer español ligero: quita plural, un sufijo derivativo/verbal y la
+    vocal final, sin dejar raíces demasiado cortas.
+    'programas', 'programacion', 'programar' -> 'program'.
+    """
+    for plural in ('es', 's'):
+        if palabra.endswith(plural) and len(palabra) - len(plural) >= LONGITUD_MINIMA_RAIZ:
+            palabra = palabra[:-len(plural)]
+            break
+    for sufijo in SUFIJOS:
+        if palabra.endswith(sufijo) and len(palabra) - len(sufijo) >= LONGITUD_MINIMA_RAIZ:
+            palabra = palabra[:-len(sufijo)]
+            break
+    if palabra[-1] in 'aeo' and len(palabra) > LONGITUD_MINIMA_RAIZ:
+        palabra = palabra[:-1]
+    return palabra
+
+
+def normalizar_terminos(texto):
+    """Convierte un texto libre en la lista de raíces que se indexan/buscan."""
+    texto = quitar_acentos((texto or '').lower())
+    return [
+        raiz(palabra) for palabra in _PATRON_PALABRA.findall(texto)
+        if palabra not in PALABRAS_VACIAS
+    ]
+
+
+def normalizar_texto(texto):
+    return ' '.join(normalizar_terminos(texto))
+
+
+def documento_curso(curso):
+    """
+    Devuelve los campos normalizados (en el orden de CAMPOS) de un curso.
+    """
+    instructor = curso.instructor
+    nombre_instructor = ''
+    if instructor is not None:
+        nombre_instructor = f"{instructor.first_name} {instructor.last_name} {instructor.username}"
+    return (
+        normalizar_texto(curso.titulo),
+        normalizar_texto(curso.descripcion),
+        normalizar_texto(' '.join(etiqueta.nombre for etiqueta in curso.etiquetas.all())),
+        normalizar_texto(curso.categoria.nombre if curso.categoria else ''),
+        normalizar_texto(nombre_instructor),
+    )
+
+
+# --- Motores ---
+
+def motor_disponible(conexion=None):
+    """True si la base de datos soporta el índice (SQLite o PostgreSQL)."""
+    return (conexion or connection).vendor in ('sqlite', 'postgresql')
+
+
+def _escribir(cursor, vendor, curso_id, campos):
+    if vendor == 'sqlite':
+        cursor.execute(f"DELETE FROM {TABLA_INDICE} WHERE rowid = %s", [curso_id])
+        cursor.execute(
+            f"INSERT INTO {TABLA_INDICE} (rowid, {', '.join(CAMPOS)}) VALUES (%s, %s, %s, %s, %s, %s)",
+            [curso_id, *campos]
+        )
+    else:
+        vector = ' || '.join(
+            f"setweight(to_tsvector('simple', %s), '{peso}')" for peso in PESOS_POSTGRES
+        )
+        cursor.execute(
+            f"INSERT INTO {TABLA_INDICE} (curso_id, documento) VALUES (%s, {vector}) "
+            "ON CONFLICT (curso_id) DO UPDATE SET documento = EXCLUDED.documento",
+            [curso_id, *campos]
+        )
+
+
+def indexar_cursos(cursos, conexion=None):
+    """
+    (Re)indexa los cursos dados. 'cursos' debe traer instructor/categoría con
+    select_related y etiquetas con prefetch_related para no hacer N+1.
+    """
+    conexion = conexion or connection
+    if not motor_disponible(conexion):
+        return
+    with conexion.cursor() as cursor:
+        for curso in cursos:
+            _escribir(cursor, conexion.vendor, curso.pk, documento_curso(curso))
+
+
+def indexar_cursos_por_id(curso_ids):
+    """Carga los cursos indicados y los reindexa."""
+    from cursos.models import Curso
+    curso_ids = list(curso_ids)
+    if not curso_ids or not motor_disponible():
+        return
+    indexar_cursos(
+        Curso.objects.filter(pk__in=curso_ids)
+        .select_related('instructor', 'categoria')
+        .prefetch_related('etiquetas')
+    )
+
+
+def programar_indexacion(curso_ids):
+    """
+    Reindexa los cursos en segundo plano al confirmar la transacción actual
+    (para cambios que pueden tocar muchos cursos a la vez).
+    """
+    curso_ids = sorted(set(curso_ids))
+    if not curso_ids:
+        return
+
+    def encolar():
+        try:
+            from cursos.tasks import indexar_cursos_task
+            indexar_cursos_task.delay(curso_ids)
+        except Exception as e:
+            logger.warning("No se pudo encolar la reindexación de %s cursos: %s", len(curso_ids), e)
+            indexar_cursos_por_id(curso_ids)
+
+    transaction.on_commit(encolar)
+
+
+def eliminar_curso(curso_id):
+    """Quita un curso del índice."""
+    if not motor_disponible():
+        return
+    with connection.cursor() as cursor:
+        columna = 'rowid' if connection.vendor == 'sqlite' else 'curso_id'
+        cursor.execute(f"DELETE FROM {TABLA_INDICE} WHERE {columna} = %s", [curso_id])
+
+
+def reconstruir_indice(queryset_cursos, conexion=None, tamano_lote=500):
+    """Vacía el índice y lo vuelve a llenar con todos los cursos del queryset."""
+    conexion = conexion or connection
+    if not motor_disponible(conexion):
+        return 0
+    with conexion.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLA_INDICE}")
+
+    queryset = queryset_cursos.select_related('instructor', 'categoria').order_by('pk')
+    total = 0
+    ultimo_id = 0
+    while True:
+        lote = list(queryset.filter(pk__gt=ultimo_id).prefetch_related('etiquetas')[:tamano_lote])
+        if not lote:
+            break
+        indexar_cursos(lote, conexion)
+        total += len(lote)
+        ultimo_id = lote[-1].pk
+    return total
+
+
+def _coincidencias(terminos):
+    """
+    (SQL, parámetros) que seleccionan los ids del índice que coinciden con
+    todos los términos, sin orden ni límite. Cada término se busca por prefijo.
+    """
+    if connection.vendor == 'sqlite':
+        consulta = ' '.join(f'"{t}"*' for t in terminos)
+        return f"SELECT rowid FROM {TABLA_INDICE} WHERE {TABLA_INDICE} MATCH %s", [consulta]
+    consulta = ' & '.join(f'{t}:*' for t in terminos)
+    return f"SELECT curso_id FROM {TABLA_INDICE} WHERE documento @@ to_tsquery('simple', %s)", [consulta]
+
+
+def buscar_cursos(termino, limite=MAX_RESULTADOS):
+    """
+    Devuelve los ids de los cursos que coinciden con 'termino', del más al
+    menos relevante (como mucho 'limite'). Cada palabra se busca por prefijo
+    (búsqueda mientras se escribe).
+    Devuelve None si la base de datos no soporta el índice.
+    """
+    if not motor_disponible():
+        return None
+    terminos = normalizar_terminos(termino)
+    if not terminos:
+        return []
+
+    sql, parametros = _coincidencias(terminos)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            pesos = ', '.join(str(p) for p in PESOS_SQLITE)
+            cursor.execute(f"{sql} ORDER BY bm25({TABLA_INDICE}, {pesos}) LIMIT %s", [*parametros, limite])
+        else:
+            cursor.execute(
+                f"SELECT curso_id FROM {TABLA_INDICE}, to_tsquery('simple', %s) consulta "
+                "WHERE documento @@ consulta ORDER BY ts_rank(documento, consulta) DESC LIMIT %s",
+                [*parametros, limite]
+            )
+        return [fila[0] for fila in cursor.fetchall()]
+
+
+def subconsulta_cursos(termino):
+    """
+    Todas las coincidencias de 'termino' (sin límite) como subconsulta para
+    filtrar o contar en la base de datos: queryset.filter(pk__in=...).
+    Devuelve None si la base de datos no soporta el índice y [] si el
+    término solo tiene palabras vacías.
+    """
+    if not motor_disponible():
+        return None
+    terminos = normalizar_terminos(termino)
+    if not terminos:
+        return []
+    return RawSQL(*_coincidencias(terminos))
@@ -0,0 +1,83 @@
+"""
+Contadores desnormalizados del catálogo.
+
+- Curso: num_modulos, num_lecciones, duracion_total_minutos, num_inscritos_pagados
+- Categoria: num_cursos_publicados
+
+Las señales los mantienen con UPDATE atómicos (F() + delta), sin leer el
+valor actual. 'recalcular_contadores' los reconstruye desde cero con un solo
+UPDATE con subconsultas (comando 'recalcular_contadores').
+"""
+from django.db.models import F, Count, Sum, OuterRef, Subquery, IntegerField
+from django.db.models.functions import Coalesce, Greatest
+from cursos.models import Curso, Categoria, Modulo, Leccion
+
+
+def _expresiones(deltas):
+    """{'campo': delta} -> {'campo': F('campo') + delta}, sin bajar de 0."""
+    expresiones = {}
+    for campo, delta in deltas.items():
+        if not delta:
+            continue
+        if delta > 0:
+            expresiones[campo] = F(campo) + delta
+        else:
+            expresiones[campo] = Greatest(F(campo) + delta, 0)
+    return expresiones
+
+
+def ajustar_curso(curso_id, **deltas):
+    """Suma (o resta) a los contadores del curso con un único UPDATE."""
+    expresiones = _expresiones(deltas)
+    if curso_id and expresiones:
+        Curso.objects.filter(pk=curso_id).update(**expresiones)
+
+
+def ajustar_categoria(categoria_id, **deltas):
+    expresiones = _expresiones(deltas)
+    if categoria_id and expresiones:
+        Categoria.objects.filter(pk=categoria_id).update(**expresiones)
+
+
+def _subconsulta(queryset, agrupar_por, agregado):
+    """Subconsulta correlacionada que devuelve un agregado (0 si no hay filas)."""
+    return Coalesce(
+        Subquery(
+            queryset.order_by().values(agrupar_por).annotate(total=agregado).values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def recalcular_contadores(curso_ids=None):
+    """
+    Recalcula desde cero los contadores de los cursos dados (o de todos) y
+    de sus categorías (o de todas).
+    Devuelve (cursos, categorías) actualizados.
+    """
+    from evaluacion.models import Inscripcion
+
+    cursos = Curso.objects.all()
+    categorias = Categoria.objects.all()
+    if curso_ids is not None:
+        cursos = cursos.filter(pk__in=list(curso_ids))
+        categorias = categorias.filter(pk__in=cursos.values('categoria'))
+
+    lecciones = Leccion.objects.filter(modulo__curso=OuterRef('pk'))
+    total_cursos = cursos.update(
+        num_modulos=_subconsulta(Modulo.objects.filter(curso=OuterRef('pk')), 'curso', Count('id')),
+        num_lecciones=_subconsulta(lecciones, 'modulo__curso', Count('id')),
+        duracion_total_minutos=_subconsulta(lecciones, 'modulo__curso', Sum('duracion_minutos')),
+        num_inscritos_pagados=_subconsulta(
+            Inscripcion.objects.filter(curso=OuterRef('pk'), estado_pago=Inscripcion.ESTADO_PAGADO),
+            'curso', Count('id')
+        ),
+    )
+    total_categorias = categorias.update(
+        num_cursos_publicados=_subconsulta(
+            Curso.objects.filter(categoria=OuterRef('pk'), estado=Curso.ESTADO_PUBLICADO),
+            'categoria', Count('id')
+        )
+    )
+    return total_cursos, total_categorias
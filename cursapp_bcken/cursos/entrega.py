@@ -0,0 +1,154 @@
+"""
+Entrega de archivos protegidos (contenido de las lecciones) una vez que la
+vista verificó el acceso.
+
+- 'x-accel' / 'x-sendfile': Django solo responde las cabeceras y el proxy
+  (Nginx/Apache) envía el archivo, con soporte de rangos y sin que los bytes
+  pasen por Python.
+- 'python': sin proxy. Django resuelve las peticiones condicionales y de
+  rango (un solo rango, lo que piden los reproductores al buscar) y entrega un
+  FileResponse acotado al tramo; bajo gunicorn 'wsgi.file_wrapper' lo envía con
+  os.sendfile desde la posición del archivo.
+"""
+import os
+import mimetypes
+from urllib.parse import quote
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+ENTREGA_X_ACCEL = 'x-accel'
+ENTREGA_X_SENDFILE = 'x-sendfile'
+ENTREGA_PYTHON = 'python'
+
+CACHE_CONTROL = 'private, max-age=3600' # Contenido con control de acceso: nunca en cachés compartidas
+
+# Tipos que mimetypes no siempre conoce
+TIPOS_CONTENIDO = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.ts': 'video/mp2t',
+    '.vtt': 'text/vtt',
+    '.webp': 'image/webp',
+}
+
+
+def tipo_contenido(ruta):
+    extension = os.path.splitext(ruta)[1].lower()
+    return TIPOS_CONTENIDO.get(extension) or mimetypes.guess_type(ruta)[0] or 'application/octet-stream'
+
+
+def _etag(estado):
+    return f'"{estado.st_mtime_ns:x}-{estado.st_size:x}"'
+
+
+def rango_solicitado(request, tamano, etag, modificado):
+    """
+    Devuelve (inicio, fin) inclusivo del rango pedido, None si se debe enviar
+    el archivo completo o False si el rango no se puede satisfacer.
+    """
+    cabecera = request.META.get('HTTP_RANGE', '')
+    if not cabecera.startswith('bytes=') or ',' in cabecera:
+        return None # Sin rango, o varios rangos: se envía completo
+
+    # If-Range: si el archivo cambió, se ignora el rango
+    si_rango = request.META.get('HTTP_IF_RANGE')
+    if si_rango and si_rango != etag:
+        fecha = parse_http_date_safe(si_rango)
+        if fecha is None or fecha < int(modificado):
+            return None
+
+    inicio, _, fin = cabecera[6:].strip().partition('-')
+    try:
+        if inicio == '': # Sufijo: los últimos N bytes
+            largo = int(fin)
+            if largo <= 0:
+                return False
+            return max(0, tamano - largo), tamano - 1
+        inicio = int(inicio)
+        fin = int(fin) if fin else tamano - 1
+    except ValueError:
+        return None
+    if inicio >= tamano or fin < inicio:
+        return False
+    return inicio, min(fin, tamano - 1)
+
+
+class _Tramo:
+    """
+    Archivo acotado a 'largo' bytes desde la posición actual. Expone fileno()
+    para que el servidor WSGI pueda usar sendfile sobre el descriptor.
+    """
+
+    def __init__(self, archivo, largo):
+        self.archivo = archivo
+        self.restante = largo
+        self.name = archivo.name
+
+    def read(self, tamano=-1):
+        if self.restante <= 0:
+            return b''
+        if tamano < 0 or tamano > self.restante:
+            tamano = self.restante
+        datos = self.archivo.read(tamano)
+        self.restante -= len(datos)
+        return datos
+
+    def fileno(self):
+        return self.archivo.fileno()
+
+    def close(self):
+        self.archivo.close()
+
+
+def entregar_archivo(request, ruta, nombre_interno, tipo=None):
+    """
+    Respuesta para el archivo en 'ruta' (absoluta). 'nombre_interno' es la
+    ruta relativa a MEDIA_ROOT, la que conoce el proxy. 'tipo' reemplaza al
+    Content-Type deducido de la extensión (objetos sin extensión).
+    """
+    tipo = tipo or tipo_contenido(ruta)
+    estado = os.stat(ruta)
+    etag = _etag(estado)
+    modificado = estado.st_mtime
+
+    respuesta = get_conditional_response(request, etag=etag, last_modified=int(modificado))
+    if respuesta is not None: # 304 / 412
+        respuesta['Cache-Control'] = CACHE_CONTROL
+        return respuesta
+
+    entrega = settings.MEDIA_ENTREGA
+    if entrega == ENTREGA_X_ACCEL:
+        respuesta = HttpResponse(content_type=tipo)
+        respuesta['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIJO + quote(nombre_interno.replace(os.sep, '/'))
+    elif entrega == ENTREGA_X_SENDFILE:
+        respuesta = HttpResponse(content_type=tipo)
+        respuesta['X-Sendfile'] = ruta
+    else:
+        respuesta = _respuesta_directa(request, ruta, estado, etag, tipo)
+
+    respuesta['ETag'] = etag
+    respuesta['Last-Modified'] = http_date(modificado)
+    respuesta['Cache-Control'] = CACHE_CONTROL
+    return respuesta
+
+
+def _respuesta_directa(request, ruta, estado, etag, tipo):
+    tamano = estado.st_size
+    rango = rango_solicitado(request, tamano, etag, estado.st_mtime)
+    if rango is False:
+        respuesta = HttpResponse(status=416)
+        respuesta['Content-Range'] = f'bytes */{tamano}'
+        return respuesta
+
+    archivo = open(ruta, 'rb')
+    if rango is None:
+        respuesta = FileResponse(archivo, content_type=tipo)
+    else:
+        inicio, fin = rango
+        archivo.seek(inicio)
+        respuesta = FileResponse(_Tramo(archivo, fin - inicio + 1), content_type=tipo, status=206)
+        respuesta['Content-Length'] = fin - inicio + 1
+        respuesta['Content-Range'] = f'bytes {inicio}-{fin}/{tamano}'
+    respuesta['Accept-Ranges'] = 'bytes'
+    return respuesta
@@ -0,0 +1,206 @@
+"""
+Filtros facetados del catálogo y conteo de facetas.
+
+Cada faceta se cuenta con UNA consulta agrupada (GROUP BY o agregados
+condicionales) que respeta los demás filtros activos, pero no el suyo propio
+(así el usuario ve cuántos cursos obtendría al cambiar esa faceta).
+El resultado se guarda en la caché compartida bajo la versión del catálogo.
+"""
+import json
+import time
+import hashlib
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Exists, OuterRef
+from rest_framework.exceptions import ValidationError
+from cursos.models import Curso
+
+CATALOGO_VERSION_KEY = "catalogo:version"
+FACETAS_KEY = "catalogo:facetas:v{}:{}"
+FACETAS_TIMEOUT = 60 * 5 # 5 minutos
+MAX_ETIQUETAS = 30 # Etiquetas más frecuentes que se devuelven en la faceta
+
+# Rangos de precio (USD): clave -> (nombre, mínimo exclusivo, máximo inclusivo)
+RANGOS_PRECIO = {
+    'gratis': ('Gratis', None, Decimal('0')),
+    'hasta_20': ('Hasta $20', Decimal('0'), Decimal('20')),
+    '20_50': ('$20 - $50', Decimal('20'), Decimal('50')),
+    '50_100': ('$50 - $100', Decimal('50'), Decimal('100')),
+    'mas_100': ('Más de $100', Decimal('100'), None),
+}
+UMBRALES_CALIFICACION = (4, 3, 2, 1)
+FACETAS = ('categoria', 'etiquetas', 'precio', 'certificado', 'calificacion_min')
+
+
+# --- Versión del catálogo (invalida las facetas cacheadas) ---
+
+def obtener_version_catalogo():
+    version = cache.get(CATALOGO_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOGO_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(CATALOGO_VERSION_KEY)
+    return version
+
+
+def invalidar_catalogo():
+    """Sube la versión del catálogo al confirmar la transacción actual."""
+    transaction.on_commit(lambda: cache.set(CATALOGO_VERSION_KEY, time.time_ns(), None))
+
+
+# --- Lectura y aplicación de filtros ---
+
+def _lista(valor):
+    return [v.strip() for v in (valor or '').split(',') if v.strip()]
+
+
+def leer_filtros(query_params):
+    """
+    Interpreta los filtros facetados de la URL:
+    ?categoria=python,diseno  ?etiquetas=rest-api  ?precio=gratis,hasta_20
+    ?certificado=true  ?calificacion_min=4
+    """
+    filtros = {}
+    if _lista(query_params.get('categoria')):
+        filtros['categoria'] = sorted(_lista(query_params.get('categoria')))
+    if _lista(query_params.get('etiquetas')):
+        filtros['etiquetas'] = sorted(_lista(query_params.get('etiquetas')))
+
+    rangos = _lista(query_params.get('precio'))
+    if rangos:
+        invalidos = [r for r in rangos if r not in RANGOS_PRECIO]
+        if invalidos:
+            raise ValidationError({'precio': f"Rangos no válidos: {', '.join(invalidos)}. Opciones: {', '.join(RANGOS_PRECIO)}."})
+        filtros['precio'] = sorted(rangos)
+
+    certificado = query_params.get('certificado')
+    if certificado:
+        if certificado.lower() not in ('true', 'false'):
+            raise ValidationError({'certificado': "Debe ser 'true' o 'false'."})
+        filtros['certificado'] = certificado.lower() == 'true'
+
+    calificacion = query_params.get('calificacion_min')
+    if calificacion:
+        if not calificacion.isdigit() or int(calificacion) not in UMBRALES_CALIFICACION:
+            raise ValidationError({'calificacion_min': f"Opciones: {', '.join(map(str, UMBRALES_CALIFICACION))}."})
+        filtros['calificacion_min'] = int(calificacion)
+    return filtros
+
+
+def _q_rango_precio(clave):
+    _, minimo, maximo = RANGOS_PRECIO[clave]
+    condicion = Q()
+    if minimo is not None:
+        condicion &= Q(precio_usd__gt=minimo)
+    if maximo is not None:
+        condicion &= Q(precio_usd__lte=maximo)
+    return condicion
+
+
+def aplicar_filtros(queryset, filtros, excluir=None):
+    """Aplica los filtros facetados, salvo la faceta 'excluir'."""
+    if 'categoria' in filtros and excluir != 'categoria':
+        queryset = queryset.filter(categoria__slug__in=filtros['categoria'])
+    if 'etiquetas' in filtros and excluir != 'etiquetas':
+        # EXISTS en lugar de JOIN para no duplicar cursos con varias etiquetas
+        queryset = queryset.filter(Exists(
+            Curso.etiquetas.through.objects.filter(
+                curso_id=OuterRef('pk'), etiqueta__slug__in=filtros['etiquetas']
+            )
+        ))
+    if 'precio' in filtros and excluir != 'precio':
+        condicion = Q()
+        for clave in filtros['precio']:
+            condicion |= _q_rango_precio(clave)
+        queryset = queryset.filter(condicion)
+    if 'certificado' in filtros and excluir != 'certificado':
+        queryset = queryset.filter(req_certificado=filtros['certificado'])
+    if 'calificacion_min' in filtros and excluir != 'calificacion_min':
+        queryset = queryset.filter(promedio_calificacion_general__gte=filtros['calificacion_min'])
+    return queryset
+
+
+# --- Conteo de facetas ---
+
+def _contar_facetas(base, filtros):
+    resultado = {}
+
+    # Categorías: un GROUP BY
+    filas = (
+        aplicar_filtros(base, filtros, excluir='categoria')
+        .filter(categoria__isnull=False).order_by()
+        .values('categoria__slug', 'categoria__nombre')
+        .annotate(total=Count('id')).order_by('-total', 'categoria__nombre')
+    )
+    activas = set(filtros.get('categoria', ()))
+    resultado['categoria'] = [
+        {'valor': f['categoria__slug'], 'nombre': f['categoria__nombre'],
+         'total': f['total'], 'activo': f['categoria__slug'] in activas}
+        for f in filas
+    ]
+
+    # Etiquetas: un GROUP BY sobre la tabla intermedia
+    cursos = aplicar_filtros(base, filtros, excluir='etiquetas').order_by().values('pk')
+    filas = (
+        Curso.etiquetas.through.objects.filter(curso_id__in=cursos)
+        .values('etiqueta__slug', 'etiqueta__nombre')
+        .annotate(total=Count('curso_id')).order_by('-total', 'etiqueta__nombre')[:MAX_ETIQUETAS]
+    )
+    activas = set(filtros.get('etiquetas', ()))
+    resultado['etiquetas'] = [
+        {'valor': f['etiqueta__slug'], 'nombre': f['etiqueta__nombre'],
+         'total': f['total'], 'activo': f['etiqueta__slug'] in activas}
+        for f in filas
+    ]
+
+    # Precio: un agregado con un COUNT condicional por rango
+    conteos = aplicar_filtros(base, filtros, excluir='precio').order_by().aggregate(**{
+        clave: Count('id', filter=_q_rango_precio(clave)) for clave in RANGOS_PRECIO
+    })
+    activas = set(filtros.get('precio', ()))
+    resultado['precio'] = [
+        {'valor': clave, 'nombre': nombre, 'total': conteos[clave], 'activo': clave in activas}
+        for clave, (nombre, _, _) in RANGOS_PRECIO.items()
+    ]
+
+    # Certificado: un agregado
+    conteos = aplicar_filtros(base, filtros, excluir='certificado').order_by().aggregate(
+        con=Count('id', filter=Q(req_certificado=True)),
+        sin=Count('id', filter=Q(req_certificado=False)),
+    )
+    activo = filtros.get('certificado')
+    resultado['certificado'] = [
+        {'valor': 'true', 'nombre': 'Con certificado', 'total': conteos['con'], 'activo': activo is True},
+        {'valor': 'false', 'nombre': 'Sin certificado', 'total': conteos['sin'], 'activo': activo is False},
+    ]
+
+    # Calificación mínima: un agregado con un COUNT por umbral (acumulado)
+    conteos = aplicar_filtros(base, filtros, excluir='calificacion_min').order_by().aggregate(**{
+        f'min_{umbral}': Count('id', filter=Q(promedio_calificacion_general__gte=umbral))
+        for umbral in UMBRALES_CALIFICACION
+    })
+    activo = filtros.get('calificacion_min')
+    resultado['calificacion_min'] = [
+        {'valor': umbral, 'nombre': f'{umbral} estrellas o más',
+         'total': conteos[f'min_{umbral}'], 'activo': activo == umbral}
+        for umbral in UMBRALES_CALIFICACION
+    ]
+    return resultado
+
+
+def calcular_facetas(base, filtros, alcance):
+    """
+    Devuelve los conteos de todas las facetas para el queryset 'base'
+    (visibilidad + búsqueda), cacheados por versión del catálogo.
+    'alcance' identifica todo lo que cambia 'base' además de los filtros
+    (visibilidad del usuario, término de búsqueda).
+    """
+    firma = hashlib.sha1(
+        json.dumps([alcance, filtros], sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()
+    clave = FACETAS_KEY.format(obtener_version_catalogo(), firma)
+    facetas = cache.get(clave)
+    if facetas is None:
+        facetas = _contar_facetas(base, filtros)
+        cache.set(clave, facetas, FACETAS_TIMEOUT)
+    return facetas
@@ -0,0 +1,78 @@
+"""
+URLs firmadas y con caducidad para los archivos de las lecciones.
+
+El endpoint 'acceso' de la lección verifica la inscripción una sola vez y
+emite un token {u: usuario, l: lección, e: expiración} firmado con HMAC
+(django.core.signing con SECRET_KEY). Cada petición de segmento/archivo con
+'?t=<token>' se valida solo con el HMAC y la fecha: sin consultas a la BD.
+Las listas HLS (.m3u8) y el índice de sprites (.vtt) se reescriben para que
+cada URL que contienen lleve el mismo token.
+
+El stream SSE del progreso de procesamiento usa tokens con otra sal
+(SALT_PROGRESO) y de pocos minutos: solo se validan al abrir la conexión.
+"""
+import re
+import time
+from urllib.parse import quote
+from django.conf import settings
+from django.core import signing
+
+SALT = 'cursos.media'
+SALT_PROGRESO = 'cursos.progreso'
+DURACION_PROGRESO = 60 * 5 # segundos
+PARAMETRO = 't'
+
+# URI entre comillas en etiquetas HLS (EXT-X-MAP, EXT-X-KEY, EXT-X-MEDIA...)
+URI_ATRIBUTO = re.compile(r'URI="([^"]+)"')
+
+
+class TokenInvalido(Exception):
+    pass
+
+
+def firmar(usuario_id, leccion_id, duracion=None, salt=SALT):
+    """Devuelve (token, expiración en segundos epoch)."""
+    expira = int(time.time()) + (duracion or settings.MEDIA_TOKEN_DURACION)
+    token = signing.dumps({'u': usuario_id, 'l': leccion_id, 'e': expira}, salt=salt, compress=True)
+    return token, expira
+
+
+def verificar(token, leccion_id, salt=SALT):
+    """Devuelve el id del usuario del token si es válido para la lección."""
+    try:
+        datos = signing.loads(token, salt=salt)
+    except signing.BadSignature as e:
+        raise TokenInvalido('Firma no válida.') from e
+    if datos.get('l') != leccion_id:
+        raise TokenInvalido('El token no corresponde a esta lección.')
+    if datos.get('e', 0) < time.time():
+        raise TokenInvalido('El token expiró.')
+    return datos['u']
+
+
+def _con_token(uri, token):
+    if '://' in uri or uri.startswith('/'):
+        return uri # Solo se firman las rutas relativas (archivos de la propia lección)
+    base, almohadilla, fragmento = uri.partition('#')
+    separador = '&' if '?' in base else '?'
+    return f'{base}{separador}{PARAMETRO}={quote(token, safe=":")}{almohadilla}{fragmento}'
+
+
+def reescribir_lista(contenido, token):
+    """Añade el token a cada URI de una lista HLS (.m3u8)."""
+    lineas = []
+    for linea in contenido.splitlines():
+        if linea.startswith('#'):
+            linea = URI_ATRIBUTO.sub(lambda m: f'URI="{_con_token(m.group(1), token)}"', linea)
+        elif linea.strip():
+            linea = _con_token(linea.strip(), token)
+        lineas.append(linea)
+    return '\n'.join(lineas) + '\n'
+
+
+def reescribir_vtt(contenido, token):
+    """Añade el token a las imágenes del índice de sprites (líneas 'sprite.jpg#xywh=...')."""
+    return '\n'.join(
+        _con_token(linea.strip(), token) if '#xywh=' in linea else linea
+        for linea in contenido.splitlines()
+    ) + '\n'
@@ -0,0 +1,114 @@
+"""
+Importación y exportación del árbol completo de un curso en una sola petición
+(módulos, lecciones, artículos y cuestionarios con preguntas y opciones).
+
+- Importar: el árbol ya validado ('CursoTransferSerializer') se inserta con
+  un bulk_create por nivel dentro de una transacción (número fijo de INSERTs,
+  sin importar el tamaño del curso).
+- Exportar: genera el mismo JSON por partes, módulo a módulo, para enviarlo
+  con un StreamingHttpResponse sin armar todo el documento en memoria.
+"""
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Prefetch
+from cursos.models import Curso, Modulo, Leccion
+from cursos.contadores import recalcular_contadores
+from cursos.articulos import actualizar_articulo
+from evaluacion.models import Cuestionario, Pregunta, OpcionRespuesta
+
+TAMANO_LOTE_EXPORTACION = 20 # Módulos que se cargan por consulta al exportar
+
+
+@transaction.atomic
+def importar_curso(datos, instructor):
+    """
+    Crea el curso (como borrador) y todo su contenido a partir de los datos
+    validados. Los bulk_create no disparan señales, así que al final se
+    recalculan los contadores del curso. El índice de búsqueda, el snapshot
+    y las facetas se actualizan con las señales del propio curso.
+    """
+    datos = dict(datos)
+    modulos = datos.pop('modulos')
+    etiquetas = datos.pop('etiquetas', [])
+
+    curso = Curso.objects.create(instructor=instructor, estado=Curso.ESTADO_BORRADOR, **datos)
+    if etiquetas:
+        curso.etiquetas.set(etiquetas)
+
+    # Nivel 1: módulos
+    objetos_modulos = Modulo.objects.bulk_create([
+        Modulo(curso=curso, titulo=m['titulo'], descripcion=m['descripcion'], orden=m['orden'])
+        for m in modulos
+    ])
+
+    # Nivel 2: lecciones
+    lecciones = []
+    for modulo, datos_modulo in zip(objetos_modulos, modulos):
+        for datos_leccion in datos_modulo.get('lecciones', []):
+            campos = {k: v for k, v in datos_leccion.items() if k != 'cuestionario'}
+            leccion = Leccion(modulo=modulo, curso=curso, instructor=instructor, **campos)
+            actualizar_articulo(leccion) # bulk_create no llama a save()
+            lecciones.append((leccion, datos_leccion.get('cuestionario')))
+    Leccion.objects.bulk_create([leccion for leccion, _ in lecciones])
+
+    # Nivel 3: cuestionarios
+    cuestionarios = []
+    for leccion, datos_cuestionario in lecciones:
+        if datos_cuestionario:
+            campos = {k: v for k, v in datos_cuestionario.items() if k != 'preguntas'}
+            cuestionarios.append((Cuestionario(leccion=leccion, **campos), datos_cuestionario.get('preguntas', [])))
+    Cuestionario.objects.bulk_create([cuestionario for cuestionario, _ in cuestionarios])
+
+    # Nivel 4: preguntas y su relación con el cuestionario (tabla intermedia)
+    preguntas = []
+    for cuestionario, datos_preguntas in cuestionarios:
+        for datos_pregunta in datos_preguntas:
+            campos = {k: v for k, v in datos_pregunta.items() if k != 'opciones'}
+            preguntas.append((cuestionario, Pregunta(**campos), datos_pregunta.get('opciones', [])))
+    Pregunta.objects.bulk_create([pregunta for _, pregunta, _ in preguntas])
+    Relacion = Pregunta.cuestionario.through
+    Relacion.objects.bulk_create([
+        Relacion(pregunta_id=pregunta.pk, cuestionario_id=cuestionario.pk)
+        for cuestionario, pregunta, _ in preguntas
+    ])
+
+    # Nivel 5: opciones de respuesta
+    OpcionRespuesta.objects.bulk_create([
+        OpcionRespuesta(pregunta=pregunta, **datos_opcion)
+        for _, pregunta, datos_opciones in preguntas
+        for datos_opcion in datos_opciones
+    ])
+
+    recalcular_contadores([curso.pk])
+    return curso
+
+
+def _json(datos):
+    return json.dumps(datos, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def exportar_curso(curso, tamano_lote=TAMANO_LOTE_EXPORTACION):
+    """
+    Generador con el JSON del curso en el formato de 'CursoTransferSerializer'.
+    Los módulos se leen por lotes; cada lote trae su contenido con una
+    consulta por nivel (prefetch).
+    """
+    from cursos.api.serializers import CursoTransferBaseSerializer, ModuloTransferSerializer
+
+    cabecera = _json(CursoTransferBaseSerializer(curso).data)
+    yield cabecera[:-1] + ', "modulos": ['
+
+    modulos = (
+        Modulo.objects.filter(curso=curso).order_by('orden')
+        .prefetch_related(
+            Prefetch('lecciones', queryset=Leccion.objects.order_by('orden').select_related('cuestionario')),
+            Prefetch('lecciones__cuestionario__preguntas', queryset=Pregunta.objects.order_by('pk')),
+            Prefetch('lecciones__cuestionario__preguntas__opciones', queryset=OpcionRespuesta.objects.order_by('pk')),
+        )
+    )
+    for posicion, modulo in enumerate(modulos.iterator(chunk_size=tamano_lote)):
+        separador = ', ' if posicion else ''
+        yield separador + _json(ModuloTransferSerializer(modulo).data)
+
+    yield ']}'
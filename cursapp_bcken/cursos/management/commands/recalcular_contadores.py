@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from cursos import contadores
+
+
+class Command(BaseCommand):
+    help = "Recalcula desde cero los contadores desnormalizados de cursos y categorías."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--curso', type=int, action='append', dest='cursos',
+                            help="Recalcula solo este curso (se puede repetir).")
+
+    def handle(self, *args, **options):
+        cursos, categorias = contadores.recalcular_contadores(options['cursos'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Contadores recalculados: {cursos} cursos y {categorias} categorías."
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from cursos.models import Curso
+from cursos import busqueda
+
+
+class Command(BaseCommand):
+    help = "Reconstruye desde cero el índice de búsqueda de texto completo del catálogo."
+
+    def handle(self, *args, **options):
+        if not busqueda.motor_disponible():
+            self.stderr.write("La base de datos actual no soporta el índice de búsqueda (solo SQLite o PostgreSQL).")
+            return
+        total = busqueda.reconstruir_indice(Curso.objects.all())
+        self.stdout.write(self.style.SUCCESS(f"Índice de búsqueda reconstruido: {total} cursos indexados."))
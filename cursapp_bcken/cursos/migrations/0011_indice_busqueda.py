@@ -0,0 +1,128 @@
+# Índice de búsqueda de texto completo (FTS5 en SQLite, tsvector en PostgreSQL)
+#
+# El DDL y la normalización del texto están copiados aquí (y no importados de
+# cursos.busqueda) para que la migración no cambie si cambia el módulo. Si la
+# normalización cambia después, 'manage.py reconstruir_indice_busqueda' reindexa.
+
+import re
+import unicodedata
+
+from django.db import migrations
+
+TABLA_INDICE = 'cursos_curso_busqueda'
+CAMPOS = ('titulo', 'descripcion', 'etiquetas', 'categoria', 'instructor')
+PESOS_POSTGRES = ('A', 'D', 'B', 'C', 'C')
+PALABRAS_VACIAS = {
+    'a', 'al', 'como', 'con', 'de', 'del', 'desde', 'e', 'el', 'en', 'entre', 'es',
+    'hasta', 'la', 'las', 'le', 'lo', 'los', 'mas', 'mi', 'muy', 'no', 'o', 'para',
+    'pero', 'por', 'que', 'se', 'si', 'sin', 'sobre', 'son', 'su', 'sus', 'tu', 'u',
+    'un', 'una', 'uno', 'y', 'ya',
+}
+SUFIJOS = (
+    'amientos', 'imientos', 'aciones', 'uciones', 'amiento', 'imiento', 'idades',
+    'amente', 'acion', 'ucion', 'adora', 'ador', 'ancia', 'encia', 'idad', 'ismo',
+    'ista', 'able', 'ible', 'ando', 'iendo', 'oso', 'osa', 'ivo', 'iva', 'mente',
+    'ar', 'er', 'ir',
+)
+LONGITUD_MINIMA_RAIZ = 4
+TAMANO_LOTE = 500
+
+
+def raiz(palabra):
+    for plural in ('es', 's'):
+        if palabra.endswith(plural) and len(palabra) - len(plural) >= LONGITUD_MINIMA_RAIZ:
+            palabra = palabra[:-len(plural)]
+            break
+    for sufijo in SUFIJOS:
+        if palabra.endswith(sufijo) and len(palabra) - len(sufijo) >= LONGITUD_MINIMA_RAIZ:
+            palabra = palabra[:-len(sufijo)]
+            break
+    if palabra[-1] in 'aeo' and len(palabra) > LONGITUD_MINIMA_RAIZ:
+        palabra = palabra[:-1]
+    return palabra
+
+
+def normalizar(texto):
+    texto = ''.join(
+        c for c in unicodedata.normalize('NFKD', (texto or '').lower()) if not unicodedata.combining(c)
+    )
+    return ' '.join(
+        raiz(palabra) for palabra in re.findall(r'[a-z0-9]+', texto) if palabra not in PALABRAS_VACIAS
+    )
+
+
+def documento(curso):
+    instructor = curso.instructor
+    nombre_instructor = ''
+    if instructor is not None:
+        nombre_instructor = f"{instructor.first_name} {instructor.last_name} {instructor.username}"
+    return (
+        normalizar(curso.titulo),
+        normalizar(curso.descripcion),
+        normalizar(' '.join(etiqueta.nombre for etiqueta in curso.etiquetas.all())),
+        normalizar(curso.categoria.nombre if curso.categoria else ''),
+        normalizar(nombre_instructor),
+    )
+
+
+def crear_indice(apps, schema_editor):
+    conexion = schema_editor.connection
+    if conexion.vendor == 'sqlite':
+        crear = [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_INDICE} USING fts5("
+            f"{', '.join(CAMPOS)}, tokenize='unicode61 remove_diacritics 2')"
+        ]
+        insertar = (
+            f"INSERT INTO {TABLA_INDICE} (rowid, {', '.join(CAMPOS)}) VALUES (%s, %s, %s, %s, %s, %s)"
+        )
+    elif conexion.vendor == 'postgresql':
+        crear = [
+            f"CREATE TABLE IF NOT EXISTS {TABLA_INDICE} ("
+            "curso_id bigint PRIMARY KEY REFERENCES cursos_curso(id) "
+            "ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "documento tsvector NOT NULL)",
+            f"CREATE INDEX IF NOT EXISTS {TABLA_INDICE}_gin ON {TABLA_INDICE} USING GIN (documento)",
+        ]
+        vector = ' || '.join(
+            f"setweight(to_tsvector('simple', %s), '{peso}')" for peso in PESOS_POSTGRES
+        )
+        insertar = f"INSERT INTO {TABLA_INDICE} (curso_id, documento) VALUES (%s, {vector})"
+    else:
+        return # Otros motores: la búsqueda usa el filtro icontains
+
+    Curso = apps.get_model('cursos', 'Curso')
+    cursos = (
+        Curso.objects.using(conexion.alias)
+        .select_related('instructor', 'categoria')
+        .order_by('pk')
+    )
+    with conexion.cursor() as cursor:
+        for sentencia in crear:
+            cursor.execute(sentencia)
+        cursor.execute(f"DELETE FROM {TABLA_INDICE}")
+        ultimo_id = 0
+        while True:
+            lote = list(cursos.filter(pk__gt=ultimo_id).prefetch_related('etiquetas')[:TAMANO_LOTE])
+            if not lote:
+                break
+            cursor.executemany(insertar, [[curso.pk, *documento(curso)] for curso in lote])
+            ultimo_id = lote[-1].pk
+
+
+def eliminar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor not in ('sqlite', 'postgresql'):
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLA_INDICE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cursos', '0010_alter_curso_portada'),
+        ('core', '0003_usuario_puntos_totales_usuario_xp_totales'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
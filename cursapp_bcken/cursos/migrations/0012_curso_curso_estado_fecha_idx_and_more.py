@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cursos', '0011_indice_busqueda'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='curso',
+            index=models.Index(fields=['estado', '-fecha_creacion', 'id'], name='curso_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='curso',
+            index=models.Index(fields=['estado', '-promedio_calificacion_general', 'id'], name='curso_estado_promedio_idx'),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:34
+
+from django.db import migrations, models
+from django.db.models import Count, Sum, OuterRef, Subquery, IntegerField
+from django.db.models.functions import Coalesce
+
+CURSO_PUBLICADO = 2
+INSCRIPCION_PAGADA = 2
+
+
+def _subconsulta(queryset, agrupar_por, agregado):
+    return Coalesce(
+        Subquery(
+            queryset.order_by().values(agrupar_por).annotate(total=agregado).values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def poblar_contadores(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    Curso = apps.get_model('cursos', 'Curso')
+    Categoria = apps.get_model('cursos', 'Categoria')
+    Modulo = apps.get_model('cursos', 'Modulo')
+    Leccion = apps.get_model('cursos', 'Leccion')
+    Inscripcion = apps.get_model('evaluacion', 'Inscripcion')
+
+    lecciones = Leccion.objects.using(alias).filter(modulo__curso=OuterRef('pk'))
+    Curso.objects.using(alias).update(
+        num_modulos=_subconsulta(Modulo.objects.using(alias).filter(curso=OuterRef('pk')), 'curso', Count('id')),
+        num_lecciones=_subconsulta(lecciones, 'modulo__curso', Count('id')),
+        duracion_total_minutos=_subconsulta(lecciones, 'modulo__curso', Sum('duracion_minutos')),
+        num_inscritos_pagados=_subconsulta(
+            Inscripcion.objects.using(alias).filter(curso=OuterRef('pk'), estado_pago=INSCRIPCION_PAGADA),
+            'curso', Count('id')
+        ),
+    )
+    Categoria.objects.using(alias).update(
+        num_cursos_publicados=_subconsulta(
+            Curso.objects.using(alias).filter(categoria=OuterRef('pk'), estado=CURSO_PUBLICADO),
+            'categoria', Count('id')
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cursos', '0012_curso_curso_estado_fecha_idx_and_more'),
+        ('evaluacion', '0012_resena_resena_fecha_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoria',
+            name='num_cursos_publicados',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='curso',
+            name='duracion_total_minutos',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='curso',
+            name='num_inscritos_pagados',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='curso',
+            name='num_lecciones',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='curso',
+            name='num_modulos',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(poblar_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:40
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cursos', '0013_contadores_desnormalizados'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubidaLeccion',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('nombre_archivo', models.CharField(max_length=255)),
+                ('tamano_total', models.PositiveBigIntegerField(help_text='Tamaño final del archivo en bytes.')),
+                ('offset', models.PositiveBigIntegerField(default=0, help_text='Bytes recibidos hasta ahora.')),
+                ('ruta_parcial', models.CharField(max_length=255)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True, db_index=True)),
+                ('leccion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subidas', to='cursos.leccion')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subidas_lecciones', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Subida de Lección',
+                'verbose_name_plural': 'Subidas de Lecciones',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cursos', '0014_subidaleccion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leccion',
+            name='recursos_video',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cursos', '0015_leccion_recursos_video'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='curso',
+            name='portada_original',
+            field=models.ImageField(blank=True, null=True, upload_to='portadas/originales/%Y/%m/'),
+        ),
+        migrations.AddField(
+            model_name='curso',
+            name='portada_variantes',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:54
+
+from django.db import migrations, models
+
+TIPO_ARTICULO = 5
+
+
+def renderizar_articulos(apps, schema_editor):
+    # Usa el renderizador actual: mismo resultado que al guardar la lección
+    from cursos.articulos import huella, renderizar
+    Leccion = apps.get_model('cursos', 'Leccion')
+    lecciones = (
+        Leccion.objects.using(schema_editor.connection.alias)
+        .filter(tipo_contenido=TIPO_ARTICULO).exclude(cuerpo_articulo__isnull=True).exclude(cuerpo_articulo='')
+    )
+    renders = {}
+    for leccion in lecciones.iterator():
+        clave = huella(leccion.cuerpo_articulo)
+        if clave not in renders:
+            renders[clave] = renderizar(leccion.cuerpo_articulo)
+        leccion.articulo_html, leccion.articulo_indice = renders[clave]
+        leccion.articulo_hash = clave
+        leccion.save(update_fields=['articulo_html', 'articulo_indice', 'articulo_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cursos', '0016_portada_variantes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leccion',
+            name='articulo_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='leccion',
+            name='articulo_html',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='leccion',
+            name='articulo_indice',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.RunPython(renderizar_articulos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cursos', '0017_articulos_renderizados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaqueteScorm',
+            fields=[
+                ('leccion', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='paquete_scorm', serialize=False, to='cursos.leccion')),
+                ('version', models.CharField(choices=[('1.2', 'SCORM 1.2'), ('2004', 'SCORM 2004')], max_length=10)),
+                ('titulo', models.CharField(blank=True, max_length=255)),
+                ('href_inicio', models.CharField(help_text='Archivo de inicio (con su query string, si tiene).', max_length=500)),
+                ('puntuacion_minima', models.DecimalField(blank=True, decimal_places=2, help_text='Puntuación (0-100) para aprobar, si el manifiesto la define.', max_digits=5, null=True)),
+                ('scos', models.JSONField(default=list, help_text='SCOs en orden: identificador, título, href y puntuación mínima.')),
+                ('huella', models.CharField(help_text='SHA-256 del paquete (zip) procesado.', max_length=64)),
+                ('num_archivos', models.PositiveIntegerField(default=0)),
+                ('tamano_total', models.PositiveBigIntegerField(default=0)),
+                ('fecha_procesamiento', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Paquete SCORM',
+                'verbose_name_plural': 'Paquetes SCORM',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivoPaqueteScorm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ruta', models.CharField(max_length=500)),
+                ('huella', models.CharField(max_length=64)),
+                ('tamano', models.PositiveBigIntegerField()),
+                ('paquete', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archivos', to='cursos.paquetescorm')),
+            ],
+            options={
+                'verbose_name': 'Archivo de Paquete SCORM',
+                'verbose_name_plural': 'Archivos de Paquetes SCORM',
+                'unique_together': {('paquete', 'ruta')},
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copiar_curso_instructor(apps, schema_editor):
+    # Un solo UPDATE con subconsultas para todas las lecciones
+    Leccion = apps.get_model('cursos', 'Leccion')
+    Modulo = apps.get_model('cursos', 'Modulo')
+    modulo = Modulo.objects.filter(pk=OuterRef('modulo_id'))
+    Leccion.objects.update(
+        curso_id=Subquery(modulo.values('curso_id')[:1]),
+        instructor_id=Subquery(modulo.values('curso__instructor_id')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cursos', '0018_paquetes_scorm'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leccion',
+            name='curso',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='lecciones', to='cursos.curso'),
+        ),
+        migrations.AddField(
+            model_name='leccion',
+            name='instructor',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(copiar_curso_instructor, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='leccion',
+            name='curso',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='lecciones', to='cursos.curso'),
+        ),
+    ]
@@ -1,5 +1,20 @@
+import uuid
 from django.db import models
 from core.models import Usuario
+from cursos.articulos import actualizar_articulo
+
+def excluir_contadores(instancia, kwargs):
+    """
+    Un save() completo de una instancia ya existente no debe pisar los
+    contadores desnormalizados con los valores (posiblemente viejos) que
+    tiene en memoria: solo se escriben los demás campos.
+    """
+    if instancia._state.adding or kwargs.get('update_fields') is not None or kwargs.get('force_insert'):
+        return
+    kwargs['update_fields'] = [
+        campo.name for campo in instancia._meta.concrete_fields
+        if not campo.primary_key and campo.name not in instancia.CAMPOS_CONTADORES
+    ]
 
 class Categoria(models.Model):
     """
@@ -10,6 +25,11 @@ class Categoria(models.Model):
     slug = models.SlugField(max_length=100, unique=True)
     descripcion = models.TextField(blank=True, null=True)
     
+    # Contador desnormalizado (lo mantienen las señales, ver cursos/contadores.py)
+    num_cursos_publicados = models.PositiveIntegerField(default=0, editable=False)
+    
+    CAMPOS_CONTADORES = ('num_cursos_publicados',)
+    
     class Meta:
         verbose_name = "Categoría"
         verbose_name_plural = "Categorías"
@@ -17,6 +37,10 @@ class Categoria(models.Model):
     def __str__(self):
         return self.nombre
     
+    def save(self, *args, **kwargs):
+        excluir_contadores(self, kwargs)
+        super().save(*args, **kwargs)
+    
 class Etiqueta(models.Model):
     """
     Etiquetas para granularidad y filtrado fino (Ej: REST API, VueJS).
@@ -57,6 +81,9 @@ class Curso(models.Model):
         null=True,
         verbose_name="Imagen de Portada"
     )
+    # Portada subida y sus variantes responsivas (las genera 'procesar_portada_task', ver cursos/portadas.py)
+    portada_original = models.ImageField(upload_to='portadas/originales/%Y/%m/', blank=True, null=True)
+    portada_variantes = models.JSONField(default=dict, blank=True, editable=False)
     slug = models.SlugField(max_length=255, unique=True, help_text='URL amigable')
     descripcion = models.TextField(max_length=500)
     
@@ -102,6 +129,14 @@ class Curso(models.Model):
     
     total_resenas = models.PositiveIntegerField(default=0)
     
+    # Contadores desnormalizados (los mantienen las señales, ver cursos/contadores.py)
+    num_modulos = models.PositiveIntegerField(default=0, editable=False)
+    num_lecciones = models.PositiveIntegerField(default=0, editable=False)
+    duracion_total_minutos = models.PositiveIntegerField(default=0, editable=False)
+    num_inscritos_pagados = models.PositiveIntegerField(default=0, editable=False)
+    
+    CAMPOS_CONTADORES = ('num_modulos', 'num_lecciones', 'duracion_total_minutos', 'num_inscritos_pagados')
+    
     # Promedios de las reseñas
     promedio_calificacion_general = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
     promedio_calidad_contenido = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
@@ -116,10 +151,19 @@ class Curso(models.Model):
         verbose_name = "Curso"
         verbose_name_plural = "Cursos"
         ordering = ['-fecha_creacion']
+        indexes = [
+            # Claves de la paginación por cursor del catálogo
+            models.Index(fields=['estado', '-fecha_creacion', 'id'], name='curso_estado_fecha_idx'),
+            models.Index(fields=['estado', '-promedio_calificacion_general', 'id'], name='curso_estado_promedio_idx'),
+        ]
     
     def __str__(self):
         return self.titulo
     
+    def save(self, *args, **kwargs):
+        excluir_contadores(self, kwargs)
+        super().save(*args, **kwargs)
+    
 # --- Estructura de Contenido (Módulo y Lección) ---
 class Modulo(models.Model):
     """
@@ -171,6 +215,12 @@ class Leccion(models.Model):
     )
     
     modulo = models.ForeignKey(Modulo, on_delete=models.CASCADE, related_name='lecciones')
+    # Copias de 'modulo.curso' y 'modulo.curso.instructor' para autorizar sin recorrer
+    # las FKs. Se mantienen al guardar la lección y con las señales de Modulo y Curso.
+    curso = models.ForeignKey(Curso, on_delete=models.CASCADE, related_name='lecciones', editable=False)
+    instructor = models.ForeignKey(
+        Usuario, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', editable=False
+    )
     titulo = models.CharField(max_length=255)
     orden = models.PositiveIntegerField(default=0)
     tipo_contenido = models.PositiveSmallIntegerField(choices=TIPOS_CHOICES, default=TIPO_VIDEO, verbose_name='Tipo de Contenido')
@@ -180,6 +230,12 @@ class Leccion(models.Model):
         null=True,
         help_text="Contenido en Markdown para lecciones de tipo Artículo/Código."
     )
+    # Render del artículo en el servidor (ver cursos/articulos.py), se actualiza al guardar
+    articulo_html = models.TextField(blank=True, default='', editable=False)
+    articulo_indice = models.JSONField(default=list, blank=True, editable=False)
+    articulo_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
+    
+    CAMPOS_ARTICULO = ('articulo_html', 'articulo_indice', 'articulo_hash')
     
     # Campo para almacenar la URL o el archivo del contenido.
     # Para SCORM, almacenará la ruta al paquete.
@@ -191,6 +247,9 @@ class Leccion(models.Model):
     
     duracion_minutos = models.PositiveIntegerField(default=0, help_text='Tiempo estimado de duración.')
     
+    # Póster, miniaturas WebP y sprites de la línea de tiempo (los genera 'process_video_task')
+    recursos_video = models.JSONField(default=dict, blank=True, editable=False)
+    
     class Meta:
         verbose_name = "Lección"
         verbose_name_plural = "Lecciones"
@@ -200,6 +259,118 @@ class Leccion(models.Model):
     def __str__(self):
         return f"Lección {self.orden}: {self.titulo}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Módulo con el que se cargó: 'save' solo sincroniza el curso si cambia
+        instancia._modulo_id_cargado = instancia.__dict__.get('modulo_id')
+        return instancia
+    
+    def sincronizar_curso(self):
+        """Copia curso e instructor del módulo (sin guardar)."""
+        self.curso_id, self.instructor_id = (
+            Modulo.objects.filter(pk=self.modulo_id).values_list('curso_id', 'curso__instructor_id').get()
+        )
+    
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        # Al crearla o cambiarla de módulo, el curso y el instructor siguen al módulo
+        if (update_fields is None or 'modulo' in update_fields) and (
+            self._state.adding or self.curso_id is None
+            or self.modulo_id != getattr(self, '_modulo_id_cargado', None)
+        ):
+            self.sincronizar_curso()
+            if update_fields is not None:
+                kwargs['update_fields'] = update_fields = set(update_fields).union(('curso', 'instructor'))
+        # Re-renderiza el artículo solo si cambió su Markdown (o el tipo)
+        if update_fields is None or {'cuerpo_articulo', 'tipo_contenido'}.intersection(update_fields):
+            if actualizar_articulo(self) and update_fields is not None:
+                kwargs['update_fields'] = set(update_fields).union(self.CAMPOS_ARTICULO)
+        super().save(*args, **kwargs)
+        self._modulo_id_cargado = self.__dict__.get('modulo_id')
+    
+class SubidaLeccion(models.Model):
+    """
+    Sesión de subida reanudable (estilo tus) del archivo de una Lección.
+    El archivo se recibe por partes en 'ruta_parcial' (relativa a MEDIA_ROOT);
+    'offset' es la cantidad de bytes ya escritos. Al finalizar, el archivo
+    pasa a 'Leccion.archivo' y la sesión se elimina.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    leccion = models.ForeignKey(Leccion, on_delete=models.CASCADE, related_name='subidas')
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='subidas_lecciones')
+    nombre_archivo = models.CharField(max_length=255)
+    tamano_total = models.PositiveBigIntegerField(help_text='Tamaño final del archivo en bytes.')
+    offset = models.PositiveBigIntegerField(default=0, help_text='Bytes recibidos hasta ahora.')
+    ruta_parcial = models.CharField(max_length=255)
+    
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True, db_index=True)
+    
+    class Meta:
+        verbose_name = "Subida de Lección"
+        verbose_name_plural = "Subidas de Lecciones"
+        
+    def __str__(self):
+        return f"{self.nombre_archivo} ({self.offset}/{self.tamano_total} bytes)"
+    
+    @property
+    def completa(self):
+        return self.offset >= self.tamano_total
+    
+class PaqueteScorm(models.Model):
+    """
+    Paquete SCORM ya descomprimido de una Lección (lo crea 'procesar_scorm_task').
+    Guarda lo que el reproductor necesita del imsmanifest.xml: archivo de
+    inicio, SCOs y puntuación mínima. Los archivos están en 'archivos'.
+    """
+    VERSION_12 = '1.2'
+    VERSION_2004 = '2004'
+    VERSIONES_CHOICES = (
+        (VERSION_12, 'SCORM 1.2'),
+        (VERSION_2004, 'SCORM 2004'),
+    )
+    
+    leccion = models.OneToOneField(Leccion, on_delete=models.CASCADE, primary_key=True, related_name='paquete_scorm')
+    version = models.CharField(max_length=10, choices=VERSIONES_CHOICES)
+    titulo = models.CharField(max_length=255, blank=True)
+    href_inicio = models.CharField(max_length=500, help_text='Archivo de inicio (con su query string, si tiene).')
+    puntuacion_minima = models.DecimalField(
+        max_digits=5, decimal_places=2, null=True, blank=True,
+        help_text='Puntuación (0-100) para aprobar, si el manifiesto la define.'
+    )
+    scos = models.JSONField(default=list, help_text='SCOs en orden: identificador, título, href y puntuación mínima.')
+    huella = models.CharField(max_length=64, help_text='SHA-256 del paquete (zip) procesado.')
+    num_archivos = models.PositiveIntegerField(default=0)
+    tamano_total = models.PositiveBigIntegerField(default=0)
+    fecha_procesamiento = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Paquete SCORM"
+        verbose_name_plural = "Paquetes SCORM"
+        
+    def __str__(self):
+        return f"SCORM {self.version}: {self.titulo or self.leccion_id}"
+    
+class ArchivoPaqueteScorm(models.Model):
+    """
+    Índice de archivos de un paquete SCORM: ruta dentro del paquete -> objeto
+    en el almacenamiento direccionado por contenido (SHA-256). Resolver un
+    archivo del paquete es una sola consulta por (paquete, ruta).
+    """
+    paquete = models.ForeignKey(PaqueteScorm, on_delete=models.CASCADE, related_name='archivos')
+    ruta = models.CharField(max_length=500)
+    huella = models.CharField(max_length=64)
+    tamano = models.PositiveBigIntegerField()
+    
+    class Meta:
+        verbose_name = "Archivo de Paquete SCORM"
+        verbose_name_plural = "Archivos de Paquetes SCORM"
+        unique_together = ('paquete', 'ruta')
+        
+    def __str__(self):
+        return self.ruta
+    
 class Cupon(models.Model):
     """
     Representa un cupón de descuento.
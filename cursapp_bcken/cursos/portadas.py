@@ -0,0 +1,96 @@
+"""
+Variantes responsivas de la portada de los cursos.
+
+La imagen subida ('Curso.portada_original') se procesa en segundo plano
+('procesar_portada_task') en varios anchos, en WebP y JPEG. Cada variante se
+nombra con el hash de su contenido: una URL nunca cambia de contenido, así
+que el servidor web puede servir PORTADAS_DIRECTORIO con caché inmutable
+(Cache-Control: max-age=31536000, immutable).
+"""
+import io
+import hashlib
+from PIL import Image, ImageOps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+ANCHOS = (320, 640, 960, 1280, 1920)
+# extensión, formato de Pillow, tipo MIME, opciones de codificación
+FORMATOS = (
+    ('webp', 'WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    ('jpg', 'JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+
+# Variante por defecto ('src') y ancho máximo del srcset según el uso
+USO_TARJETA = {'ancho': 640, 'ancho_maximo': 960, 'sizes': '(max-width: 600px) 100vw, 320px'}
+USO_DETALLE = {'ancho': 1280, 'ancho_maximo': 1920, 'sizes': '100vw'}
+
+
+def _codificar(imagen, formato, opciones):
+    salida = io.BytesIO()
+    imagen.save(salida, formato, **opciones)
+    return salida.getvalue()
+
+
+def generar_variantes(archivo, curso_id):
+    """
+    Genera y guarda las variantes de la imagen 'archivo'. Devuelve el valor
+    de 'Curso.portada_variantes':
+    {'ancho', 'alto', 'webp': [{'ancho', 'alto', 'ruta', 'url'}], 'jpg': [...]}
+    """
+    with archivo.open('rb') as fuente, Image.open(fuente) as original:
+        imagen = ImageOps.exif_transpose(original).convert('RGB')
+
+    # Nunca se amplía: el ancho original (hasta el máximo) es la variante mayor
+    anchos = sorted({a for a in ANCHOS if a < imagen.width} | {min(imagen.width, ANCHOS[-1])})
+    variantes = {'ancho': imagen.width, 'alto': imagen.height}
+    variantes.update({extension: [] for extension, *_ in FORMATOS})
+    for ancho in anchos:
+        alto = round(imagen.height * ancho / imagen.width)
+        redimensionada = imagen if ancho == imagen.width else imagen.resize((ancho, alto), Image.LANCZOS)
+        for extension, formato, _, opciones in FORMATOS:
+            contenido = _codificar(redimensionada, formato, opciones)
+            huella = hashlib.sha256(contenido).hexdigest()[:16]
+            ruta = f'{settings.PORTADAS_DIRECTORIO}/{curso_id}/{ancho}-{huella}.{extension}'
+            if not default_storage.exists(ruta): # Mismo contenido, mismo nombre
+                ruta = default_storage.save(ruta, ContentFile(contenido))
+            variantes[extension].append({
+                'ancho': ancho, 'alto': alto, 'ruta': ruta, 'url': default_storage.url(ruta)
+            })
+    return variantes
+
+
+def rutas(variantes):
+    return {v['ruta'] for extension, *_ in FORMATOS for v in (variantes or {}).get(extension, [])}
+
+
+def eliminar_sobrantes(anteriores, actuales):
+    """Borra los archivos de las variantes anteriores que ya no se usan."""
+    for ruta in rutas(anteriores) - rutas(actuales):
+        default_storage.delete(ruta)
+
+
+def srcset(variantes, uso):
+    """
+    Estructura lista para <picture>/<img srcset> según el uso (tarjeta del
+    catálogo o detalle). None si la portada aún no tiene variantes.
+    """
+    if not variantes or not variantes.get('jpg'):
+        return None
+    fuentes = []
+    for extension, _, tipo, _ in FORMATOS:
+        candidatas = [v for v in variantes[extension] if v['ancho'] <= uso['ancho_maximo']] or variantes[extension][:1]
+        fuentes.append({
+            'tipo': tipo,
+            'srcset': ', '.join(f"{v['url']} {v['ancho']}w" for v in candidatas),
+        })
+    # 'src' (respaldo sin srcset): el JPEG más cercano al ancho del uso
+    src = min(variantes['jpg'], key=lambda v: abs(v['ancho'] - uso['ancho']))
+    return {
+        'src': src['url'],
+        'ancho': src['ancho'],
+        'alto': src['alto'],
+        'sizes': uso['sizes'],
+        'fuentes': fuentes,
+    }
+
@@ -0,0 +1,190 @@
+"""
+Progreso del procesamiento de video de las lecciones.
+
+La tarea de transcodificación publica la etapa y el porcentaje en la caché
+compartida; el endpoint SSE ('cursos.views.progreso_procesamiento_sse') lo lee
+y lo empuja al navegador por una sola conexión abierta.
+Cada publicación lleva un 'seq' creciente que se usa como id del evento SSE.
+
+Con 'PROGRESO_REDIS_URL' cada publicación también sale por un canal pub/sub
+de Redis y el stream espera los mensajes con el cliente asíncrono de redis-py
+(sin hilos ni consultas periódicas). Sin Redis el stream consulta la caché
+cada INTERVALO_CONSULTA en el executor de hilos compartido
+('thread_sensitive=False': no se serializa con el resto de vistas síncronas).
+"""
+import json
+import time
+import asyncio
+import logging
+import threading
+import redis
+import redis.asyncio
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+PROGRESO_KEY = "leccion:{}:progreso"
+PROGRESO_TIMEOUT = 60 * 60 * 24 # 24 horas
+PROGRESO_CANAL = "leccion:{}:progreso:eventos"
+INTERVALO_CONSULTA = 0.5 # segundos entre lecturas de la caché (sin Redis)
+
+ETAPA_EN_COLA = 'en_cola'
+ETAPA_ANALIZANDO = 'analizando'
+ETAPA_TRANSCODIFICANDO = 'transcodificando'
+ETAPA_PUBLICANDO = 'publicando'
+ETAPA_COMPLETADO = 'completado'
+ETAPA_ERROR = 'error'
+ETAPAS_FINALES = (ETAPA_COMPLETADO, ETAPA_ERROR)
+
+
+def publicar_progreso(leccion_id, etapa, porcentaje=0, mensaje=''):
+    evento = {
+        'etapa': etapa,
+        'porcentaje': int(porcentaje),
+        'mensaje': mensaje,
+        'seq': time.time_ns(), # Creciente aunque publiquen procesos distintos
+    }
+    cache.set(PROGRESO_KEY.format(leccion_id), evento, PROGRESO_TIMEOUT)
+    if settings.PROGRESO_REDIS_URL:
+        try:
+            _cliente().publish(PROGRESO_CANAL.format(leccion_id), json.dumps(evento))
+        except redis.RedisError as e:
+            # El estado ya está en la caché: el stream lo leerá al reconectar
+            logger.warning("No se pudo publicar el progreso de la lección %s: %s", leccion_id, e)
+    return evento
+
+
+_clientes = {}
+
+
+def _cliente():
+    """Cliente síncrono de Redis (con su pool de conexiones) por proceso."""
+    url = settings.PROGRESO_REDIS_URL
+    if url not in _clientes:
+        _clientes[url] = redis.Redis.from_url(url)
+    return _clientes[url]
+
+
+_leer = sync_to_async(cache.get, thread_sensitive=False)
+
+
+async def aobtener_progreso(leccion_id):
+    return await _leer(PROGRESO_KEY.format(leccion_id))
+
+
+def suscribirse(leccion_id):
+    """
+    Suscripción al progreso de una lección para usar con 'async with':
+    'estado()' devuelve lo último publicado (o None) y 'esperar(segundos)'
+    la siguiente publicación (None si no llega ninguna en ese tiempo).
+    """
+    if settings.PROGRESO_REDIS_URL:
+        return SuscripcionRedis(leccion_id, settings.PROGRESO_REDIS_URL)
+    return SuscripcionCache(leccion_id)
+
+
+class SuscripcionCache:
+    """Sin Redis: consulta la caché cada INTERVALO_CONSULTA."""
+
+    def __init__(self, leccion_id):
+        self.leccion_id = leccion_id
+        self.seq = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *excepcion):
+        return False
+
+    async def estado(self):
+        actual = await aobtener_progreso(self.leccion_id)
+        if actual:
+            self.seq = actual['seq']
+        return actual
+
+    async def esperar(self, segundos):
+        limite = time.monotonic() + segundos
+        while (restante := limite - time.monotonic()) > 0:
+            await asyncio.sleep(min(INTERVALO_CONSULTA, restante))
+            actual = await aobtener_progreso(self.leccion_id)
+            if actual and actual['seq'] != self.seq:
+                self.seq = actual['seq']
+                return actual
+        return None
+
+
+class SuscripcionRedis:
+    """
+    Pub/sub de Redis con una conexión asíncrona propia. Se suscribe antes de
+    leer el estado actual para no perder lo publicado entre medias; los
+    mensajes con un 'seq' no posterior al ya entregado se descartan.
+    """
+
+    def __init__(self, leccion_id, url):
+        self.leccion_id = leccion_id
+        self.url = url
+        self.seq = 0
+
+    async def __aenter__(self):
+        self.cliente = redis.asyncio.Redis.from_url(self.url)
+        self.pubsub = self.cliente.pubsub(ignore_subscribe_messages=True)
+        try:
+            await self.pubsub.subscribe(PROGRESO_CANAL.format(self.leccion_id))
+        except BaseException:
+            await self._cerrar()
+            raise
+        return self
+
+    async def __aexit__(self, *excepcion):
+        await self._cerrar()
+        return False
+
+    async def _cerrar(self):
+        await self.pubsub.aclose()
+        await self.cliente.aclose()
+
+    async def estado(self):
+        actual = await aobtener_progreso(self.leccion_id)
+        if actual:
+            self.seq = actual['seq']
+        return actual
+
+    async def esperar(self, segundos):
+        limite = time.monotonic() + segundos
+        while (restante := limite - time.monotonic()) > 0:
+            mensaje = await self.pubsub.get_message(timeout=restante)
+            if mensaje is None or mensaje['type'] != 'message':
+                continue
+            actual = json.loads(mensaje['data'])
+            if actual['seq'] > self.seq:
+                self.seq = actual['seq']
+                return actual
+        return None
+
+
+class AgregadorProgreso:
+    """
+    Combina el avance de varias rendiciones que se codifican en paralelo en
+    un único porcentaje, y solo publica cuando cambia el entero (para no
+    escribir en la caché por cada línea de ffmpeg).
+    """
+
+    def __init__(self, leccion_id, partes, desde=0, hasta=100):
+        self.leccion_id = leccion_id
+        self.avances = [0.0] * partes
+        self.desde = desde
+        self.hasta = hasta
+        self.ultimo = None
+        self.lock = threading.Lock()
+
+    def reportar(self, parte, fraccion):
+        with self.lock:
+            self.avances[parte] = min(max(fraccion, 0.0), 1.0)
+            total = sum(self.avances) / len(self.avances)
+            porcentaje = int(self.desde + (self.hasta - self.desde) * total)
+            if porcentaje == self.ultimo:
+                return
+            self.ultimo = porcentaje
+        publicar_progreso(self.leccion_id, ETAPA_TRANSCODIFICANDO, porcentaje)
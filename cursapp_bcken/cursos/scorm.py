@@ -0,0 +1,282 @@
+"""
+Ingesta de paquetes SCORM (1.2 y 2004).
+
+- El zip se recorre miembro a miembro: cada archivo se copia por bloques a
+  un objeto direccionado por su SHA-256 (SCORM_DIRECTORIO/objetos/ab/abcd...),
+  así dos paquetes o versiones con los mismos recursos no duplican bytes.
+- Extracción segura: se rechazan rutas absolutas, con '..' o enlaces
+  simbólicos, y se limitan la cantidad de archivos y los bytes descomprimidos
+  (contados al leer, no los que declara el zip).
+- Del imsmanifest.xml (acotado a SCORM_MAX_MANIFIESTO y analizado con
+  defusedxml: sin entidades ni DTD) se obtienen la versión, los SCOs, el
+  archivo de inicio y la puntuación mínima, y se guarda el índice ruta -> objeto.
+"""
+import os
+import stat
+import uuid
+import hashlib
+import zipfile
+import posixpath
+from decimal import Decimal, InvalidOperation
+from defusedxml import DefusedXmlException, ElementTree
+from django.conf import settings
+from django.db import transaction
+from cursos.models import PaqueteScorm, ArchivoPaqueteScorm
+
+MANIFIESTO = 'imsmanifest.xml'
+TAMANO_BLOQUE = 1024 * 1024
+
+
+class ErrorScorm(Exception):
+    pass
+
+
+def ruta_objeto(huella):
+    """Ruta del objeto relativa a MEDIA_ROOT."""
+    return os.path.join(settings.SCORM_DIRECTORIO, 'objetos', huella[:2], huella)
+
+
+def ruta_segura(nombre):
+    """Ruta normalizada dentro del paquete, o None si intenta salir de él."""
+    nombre = nombre.replace('\\', '/')
+    if nombre.startswith('/') or (len(nombre) > 1 and nombre[1] == ':'):
+        return None
+    normalizada = posixpath.normpath(nombre)
+    if normalizada == '.' or normalizada.startswith('../') or normalizada == '..':
+        return None
+    return normalizada
+
+
+def _guardar_objeto(paquete_zip, miembro, restante):
+    """
+    Copia el miembro a un objeto direccionado por contenido.
+    Devuelve (huella, tamaño).
+    """
+    directorio = os.path.join(settings.MEDIA_ROOT, settings.SCORM_DIRECTORIO, 'objetos')
+    os.makedirs(directorio, exist_ok=True)
+    temporal = os.path.join(directorio, f'.tmp-{uuid.uuid4().hex}')
+    digest = hashlib.sha256()
+    tamano = 0
+    try:
+        with paquete_zip.open(miembro) as origen, open(temporal, 'wb') as destino:
+            while bloque := origen.read(TAMANO_BLOQUE):
+                tamano += len(bloque)
+                if tamano > restante:
+                    raise ErrorScorm('El paquete excede el tamaño descomprimido máximo.')
+                digest.update(bloque)
+                destino.write(bloque)
+        huella = digest.hexdigest()
+        final = os.path.join(settings.MEDIA_ROOT, ruta_objeto(huella))
+        if os.path.exists(final): # Ya existe el mismo contenido
+            os.remove(temporal)
+        else:
+            os.makedirs(os.path.dirname(final), exist_ok=True)
+            os.replace(temporal, final)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    return huella, tamano
+
+
+def extraer(paquete_zip):
+    """Extrae todos los archivos del zip. Devuelve {ruta: (huella, tamaño)}."""
+    miembros = [m for m in paquete_zip.infolist() if not m.is_dir()]
+    if len(miembros) > settings.SCORM_MAX_ARCHIVOS:
+        raise ErrorScorm(f'El paquete tiene más de {settings.SCORM_MAX_ARCHIVOS} archivos.')
+
+    # Primero se validan todas las rutas: un paquete inválido no escribe nada
+    rutas = []
+    for miembro in miembros:
+        ruta = ruta_segura(miembro.filename)
+        if ruta is None or len(ruta) > ArchivoPaqueteScorm._meta.get_field('ruta').max_length:
+            raise ErrorScorm(f'Ruta no permitida en el paquete: {miembro.filename}')
+        if stat.S_ISLNK(miembro.external_attr >> 16):
+            raise ErrorScorm(f'El paquete contiene un enlace simbólico: {miembro.filename}')
+        rutas.append(ruta)
+
+    indice = {}
+    restante = settings.SCORM_MAX_DESCOMPRIMIDO
+    for miembro, ruta in zip(miembros, rutas):
+        huella, tamano = _guardar_objeto(paquete_zip, miembro, restante)
+        restante -= tamano
+        indice[ruta] = (huella, tamano)
+    return indice
+
+
+# --- imsmanifest.xml ---
+
+def _local(etiqueta):
+    """Nombre sin espacio de nombres ('{ns}item' -> 'item')."""
+    return etiqueta.rsplit('}', 1)[-1]
+
+
+def _hijos(elemento, nombre):
+    return [e for e in elemento if _local(e.tag) == nombre]
+
+
+def _hijo(elemento, nombre):
+    return next(iter(_hijos(elemento, nombre)), None)
+
+
+def _atributo(elemento, nombre):
+    """Atributo sin importar el espacio de nombres (p. ej. 'adlcp:scormtype')."""
+    for clave, valor in elemento.attrib.items():
+        if _local(clave).lower() == nombre.lower():
+            return valor
+    return None
+
+
+def _texto(elemento):
+    return (elemento.text or '').strip() if elemento is not None else ''
+
+
+def _puntuacion(item):
+    """Puntuación mínima (0-100) del item: masteryscore (1.2) o minNormalizedMeasure (2004)."""
+    # Solo lo del propio item, no lo de sus items hijos
+    propios = [e for hijo in item if _local(hijo.tag) != 'item' for e in hijo.iter()]
+    maestria = next((e for e in propios if _local(e.tag) == 'masteryscore'), None)
+    if maestria is not None:
+        valor, escala = _texto(maestria), 1
+    else:
+        medida = next((e for e in propios if _local(e.tag) == 'minNormalizedMeasure'), None)
+        if medida is None:
+            return None
+        valor, escala = _texto(medida), 100
+    try:
+        return min(max(Decimal(valor) * escala, Decimal(0)), Decimal(100)).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        return None
+
+
+def analizar_manifiesto(contenido):
+    """
+    Devuelve {'version', 'titulo', 'scos': [...], 'href_inicio', 'puntuacion_minima'}.
+    Cada SCO: {'identificador', 'titulo', 'href', 'sco', 'puntuacion_minima'}
+    ('sco' es False para los recursos que no se comunican con el LMS).
+    """
+    try:
+        raiz = ElementTree.fromstring(contenido)
+    except (ElementTree.ParseError, DefusedXmlException) as e:
+        raise ErrorScorm(f'{MANIFIESTO} no es XML válido: {e}') from e
+
+    esquema = _texto(next((e for e in raiz.iter() if _local(e.tag) == 'schemaversion'), None))
+    version = PaqueteScorm.VERSION_12 if esquema in ('', '1.2') else PaqueteScorm.VERSION_2004
+
+    base_manifiesto = _atributo(raiz, 'base') or ''
+    recursos = {}
+    seccion = _hijo(raiz, 'resources')
+    base_recursos = posixpath.join(base_manifiesto, (_atributo(seccion, 'base') or '') if seccion is not None else '')
+    for recurso in _hijos(seccion, 'resource') if seccion is not None else []:
+        href = recurso.get('href')
+        if href:
+            href = posixpath.join(base_recursos, _atributo(recurso, 'base') or '', href)
+        recursos[recurso.get('identifier')] = {
+            'href': href,
+            'sco': (_atributo(recurso, 'scormtype') or '').lower() == 'sco',
+        }
+
+    organizaciones = _hijo(raiz, 'organizations')
+    organizacion = None
+    if organizaciones is not None:
+        todas = _hijos(organizaciones, 'organization')
+        defecto = organizaciones.get('default')
+        organizacion = next((o for o in todas if o.get('identifier') == defecto), todas[0] if todas else None)
+
+    scos = []
+
+    def recorrer(elemento):
+        for item in _hijos(elemento, 'item'):
+            recurso = recursos.get(item.get('identifierref'))
+            if recurso and recurso['href']:
+                parametros = item.get('parameters') or ''
+                scos.append({
+                    'identificador': item.get('identifier'),
+                    'titulo': _texto(_hijo(item, 'title')),
+                    'href': recurso['href'] + parametros,
+                    'sco': recurso['sco'],
+                    'puntuacion_minima': str(p) if (p := _puntuacion(item)) is not None else None,
+                })
+            recorrer(item)
+
+    if organizacion is not None:
+        recorrer(organizacion)
+    if not scos: # Sin organización: el primer recurso con href
+        primero = next((r for r in recursos.values() if r['href']), None)
+        if primero:
+            scos.append({
+                'identificador': None, 'titulo': '', 'href': primero['href'],
+                'sco': primero['sco'], 'puntuacion_minima': None,
+            })
+    if not scos:
+        raise ErrorScorm(f'{MANIFIESTO} no define ningún recurso con archivo de inicio.')
+
+    return {
+        'version': version,
+        'titulo': _texto(_hijo(organizacion, 'title')) if organizacion is not None else '',
+        'scos': scos,
+        'href_inicio': scos[0]['href'],
+        'puntuacion_minima': scos[0]['puntuacion_minima'],
+    }
+
+
+def _huella_archivo(ruta):
+    digest = hashlib.sha256()
+    with open(ruta, 'rb') as archivo:
+        while bloque := archivo.read(TAMANO_BLOQUE):
+            digest.update(bloque)
+    return digest.hexdigest()
+
+
+def _leer_manifiesto(paquete_zip):
+    """
+    Contenido de imsmanifest.xml, limitado a SCORM_MAX_MANIFIESTO bytes
+    descomprimidos (contados al leer, no los que declara el zip).
+    """
+    maximo = settings.SCORM_MAX_MANIFIESTO
+    try:
+        with paquete_zip.open(MANIFIESTO) as archivo:
+            contenido = archivo.read(maximo + 1)
+    except KeyError:
+        raise ErrorScorm(f'El paquete no tiene {MANIFIESTO} en la raíz.')
+    if len(contenido) > maximo:
+        raise ErrorScorm(f'{MANIFIESTO} excede el máximo permitido ({maximo} bytes).')
+    return contenido
+
+
+def ingerir_paquete(leccion, origen):
+    """
+    Extrae el zip 'origen' (ruta local) de la lección y guarda su
+    PaqueteScorm con el índice de archivos. Devuelve el paquete.
+    """
+    try:
+        paquete_zip = zipfile.ZipFile(origen)
+    except (zipfile.BadZipFile, OSError) as e:
+        raise ErrorScorm(f'El archivo no es un zip válido: {e}') from e
+
+    with paquete_zip:
+        datos = analizar_manifiesto(_leer_manifiesto(paquete_zip))
+        indice = extraer(paquete_zip)
+
+    inicio = datos['href_inicio'].split('?', 1)[0].split('#', 1)[0]
+    if ruta_segura(inicio) not in indice:
+        raise ErrorScorm(f'El archivo de inicio "{inicio}" no está en el paquete.')
+
+    with transaction.atomic():
+        paquete, _ = PaqueteScorm.objects.update_or_create(leccion=leccion, defaults={
+            'version': datos['version'],
+            'titulo': datos['titulo'][:255],
+            'href_inicio': datos['href_inicio'],
+            'puntuacion_minima': datos['puntuacion_minima'],
+            'scos': datos['scos'],
+            'huella': _huella_archivo(origen),
+            'num_archivos': len(indice),
+            'tamano_total': sum(tamano for _, tamano in indice.values()),
+        })
+        # Los objetos no se borran: otros paquetes pueden compartirlos
+        paquete.archivos.all().delete()
+        ArchivoPaqueteScorm.objects.bulk_create([
+            ArchivoPaqueteScorm(paquete=paquete, ruta=ruta, huella=huella, tamano=tamano)
+            for ruta, (huella, tamano) in indice.items()
+        ], batch_size=1000)
+    return paquete
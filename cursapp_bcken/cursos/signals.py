@@ -0,0 +1,314 @@
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from .models import Curso, Modulo, Leccion, Categoria, Etiqueta
+from core.models import Usuario
+from cursos import busqueda, snapshots, facetas, contadores
+
+# -------------------------------------------------------------
+# Índice de búsqueda del catálogo
+# -------------------------------------------------------------
+
+# Campos del usuario que aparecen en el índice (nombre del instructor)
+CAMPOS_INSTRUCTOR_INDEXADOS = {'first_name', 'last_name', 'username'}
+
+@receiver(post_save, sender=Curso)
+def indexar_curso_on_save(sender, instance, **kwargs):
+    """
+    Reindexa el curso cuando se crea o se edita.
+    """
+    busqueda.indexar_cursos_por_id([instance.pk])
+    
+@receiver(post_delete, sender=Curso)
+def desindexar_curso_on_delete(sender, instance, **kwargs):
+    """
+    Quita el curso del índice cuando se elimina.
+    """
+    busqueda.eliminar_curso(instance.pk)
+    
+@receiver(m2m_changed, sender=Curso.etiquetas.through)
+def indexar_curso_on_etiquetas(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Reindexa cuando cambian las etiquetas de un curso (desde el curso o desde la etiqueta).
+    """
+    if action == 'pre_clear' and reverse:
+        # Vaciar una etiqueta: después del clear ya no se sabe qué cursos la tenían
+        instance._cursos_indexados = list(instance.cursos.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        busqueda.indexar_cursos_por_id([instance.pk])
+    elif pk_set:
+        busqueda.indexar_cursos_por_id(pk_set)
+    else:
+        # Puede tocar muchos cursos: en segundo plano
+        busqueda.programar_indexacion(getattr(instance, '_cursos_indexados', []))
+        
+@receiver(post_save, sender=Categoria)
+@receiver(post_save, sender=Etiqueta)
+def indexar_cursos_on_taxonomia(sender, instance, created, **kwargs):
+    """
+    Si se renombra una categoría o etiqueta, reindexa los cursos que la usan.
+    """
+    if created:
+        return # Aún no tiene cursos
+    busqueda.indexar_cursos_por_id(instance.cursos.values_list('pk', flat=True))
+    
+@receiver(post_save, sender=Usuario)
+def indexar_cursos_on_instructor(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Si un instructor cambia su nombre, reindexa sus cursos.
+    Ignora guardados parciales que no tocan el nombre (ej: last_login, xp_totales).
+    """
+    if created or not instance.es_instructor:
+        return
+    if update_fields is not None and not CAMPOS_INSTRUCTOR_INDEXADOS.intersection(update_fields):
+        return
+    busqueda.indexar_cursos_por_id(Curso.objects.filter(instructor=instance).values_list('pk', flat=True))
+
+# -------------------------------------------------------------
+# Snapshots cacheados del detalle del curso
+# -------------------------------------------------------------
+
+# Campos del instructor que aparecen en el detalle del curso ('InstructorSerializer')
+CAMPOS_INSTRUCTOR_DETALLE = {
+    'first_name', 'last_name', 'username', 'bio', 'verificado', 'entidad_verificada'
+}
+
+@receiver(post_save, sender=Curso)
+@receiver(post_delete, sender=Curso)
+def invalidar_snapshot_curso(sender, instance, **kwargs):
+    snapshots.invalidar_cursos([instance.pk])
+    
+@receiver(post_save, sender=Modulo)
+@receiver(post_delete, sender=Modulo)
+def invalidar_snapshot_modulo(sender, instance, **kwargs):
+    snapshots.invalidar_cursos([instance.curso_id])
+    
+@receiver(post_save, sender=Leccion)
+@receiver(post_delete, sender=Leccion)
+def invalidar_snapshot_leccion(sender, instance, **kwargs):
+    snapshots.invalidar_cursos([instance.curso_id])
+    
+@receiver(m2m_changed, sender=Curso.etiquetas.through)
+def invalidar_snapshot_etiquetas(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        snapshots.invalidar_cursos([instance.pk])
+    elif action == 'pre_clear':
+        # Desde la etiqueta: aún se pueden consultar los cursos que la tenían
+        snapshots.invalidar_cursos(instance.cursos.values_list('pk', flat=True))
+    else:
+        snapshots.invalidar_cursos(pk_set or [])
+        
+@receiver(post_save, sender=Categoria)
+@receiver(post_save, sender=Etiqueta)
+def invalidar_snapshot_taxonomia(sender, instance, created, **kwargs):
+    if not created:
+        snapshots.invalidar_cursos(instance.cursos.values_list('pk', flat=True))
+        
+@receiver(post_save, sender=Usuario)
+def invalidar_snapshot_instructor(sender, instance, created, update_fields=None, **kwargs):
+    """
+    El perfil del instructor se muestra en el detalle de sus cursos.
+    """
+    if created or not instance.es_instructor:
+        return
+    if update_fields is not None and not CAMPOS_INSTRUCTOR_DETALLE.intersection(update_fields):
+        return
+    snapshots.invalidar_cursos(Curso.objects.filter(instructor=instance).values_list('pk', flat=True))
+
+# -------------------------------------------------------------
+# Conteo de facetas cacheado del catálogo
+# -------------------------------------------------------------
+
+@receiver(post_save, sender=Curso)
+@receiver(post_delete, sender=Curso)
+def invalidar_facetas_curso(sender, **kwargs):
+    facetas.invalidar_catalogo()
+    
+@receiver(m2m_changed, sender=Curso.etiquetas.through)
+def invalidar_facetas_etiquetas(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        facetas.invalidar_catalogo()
+        
+@receiver(post_save, sender=Categoria)
+@receiver(post_save, sender=Etiqueta)
+def invalidar_facetas_taxonomia(sender, instance, created, **kwargs):
+    if not created:
+        facetas.invalidar_catalogo()
+
+
+# -------------------------------------------------------------
+# Contadores desnormalizados (ver cursos/contadores.py)
+# -------------------------------------------------------------
+
+def _toca(update_fields, campos):
+    """False si es un guardado parcial que no incluye ninguno de 'campos'."""
+    return update_fields is None or bool(set(campos).intersection(update_fields))
+
+def _curso_de_modulo(modulo_id):
+    return Modulo.objects.filter(pk=modulo_id).values_list('curso_id', flat=True).first()
+
+@receiver(pre_save, sender=Curso)
+def recordar_estado_curso(sender, instance, update_fields=None, **kwargs):
+    """
+    Guarda el estado y la categoría anteriores para saber, al guardar,
+    si el curso entra o sale de los publicados de una categoría (y el
+    instructor, copiado en sus lecciones).
+    """
+    instance._contadores_anterior = None
+    if not instance._state.adding and _toca(update_fields, ('estado', 'categoria', 'instructor')):
+        instance._contadores_anterior = (
+            Curso.objects.filter(pk=instance.pk).values('estado', 'categoria_id', 'instructor_id').first()
+        )
+
+@receiver(post_save, sender=Curso)
+def contar_curso_publicado(sender, instance, created, **kwargs):
+    anterior = getattr(instance, '_contadores_anterior', None)
+    if not created and anterior is None:
+        return
+    publicado_antes = (
+        anterior is not None and anterior['estado'] == Curso.ESTADO_PUBLICADO
+    )
+    categoria_antes = anterior['categoria_id'] if anterior else None
+    publicado_ahora = instance.estado == Curso.ESTADO_PUBLICADO
+
+    if publicado_antes and (not publicado_ahora or categoria_antes != instance.categoria_id):
+        contadores.ajustar_categoria(categoria_antes, num_cursos_publicados=-1)
+    if publicado_ahora and (not publicado_antes or categoria_antes != instance.categoria_id):
+        contadores.ajustar_categoria(instance.categoria_id, num_cursos_publicados=1)
+
+@receiver(post_delete, sender=Curso)
+def descontar_curso_publicado(sender, instance, **kwargs):
+    if instance.estado == Curso.ESTADO_PUBLICADO:
+        contadores.ajustar_categoria(instance.categoria_id, num_cursos_publicados=-1)
+
+@receiver(pre_save, sender=Modulo)
+def recordar_curso_modulo(sender, instance, update_fields=None, **kwargs):
+    instance._curso_anterior_id = None
+    if not instance._state.adding and _toca(update_fields, ('curso',)):
+        instance._curso_anterior_id = _curso_de_modulo(instance.pk)
+
+@receiver(post_save, sender=Modulo)
+def contar_modulo(sender, instance, created, **kwargs):
+    if created:
+        contadores.ajustar_curso(instance.curso_id, num_modulos=1)
+        return
+    curso_anterior_id = getattr(instance, '_curso_anterior_id', None)
+    if curso_anterior_id is None or curso_anterior_id == instance.curso_id:
+        return
+    # El módulo se movió de curso: se lleva sus lecciones y su duración
+    totales = instance.lecciones.aggregate(
+        lecciones=Count('id'), duracion=Sum('duracion_minutos')
+    )
+    lecciones, duracion = totales['lecciones'], totales['duracion'] or 0
+    contadores.ajustar_curso(
+        curso_anterior_id, num_modulos=-1, num_lecciones=-lecciones, duracion_total_minutos=-duracion
+    )
+    contadores.ajustar_curso(
+        instance.curso_id, num_modulos=1, num_lecciones=lecciones, duracion_total_minutos=duracion
+    )
+
+@receiver(post_delete, sender=Modulo)
+def descontar_modulo(sender, instance, **kwargs):
+    # Las lecciones borradas en cascada se descuentan en su propia señal
+    contadores.ajustar_curso(instance.curso_id, num_modulos=-1)
+
+@receiver(pre_save, sender=Leccion)
+def recordar_leccion(sender, instance, update_fields=None, **kwargs):
+    """
+    Guarda curso y duración anteriores. Los guardados parciales del
+    procesamiento de video (estado_procesamiento) no hacen la consulta.
+    """
+    instance._contadores_anterior = None
+    if not instance._state.adding and _toca(update_fields, ('modulo', 'duracion_minutos')):
+        instance._contadores_anterior = (
+            Leccion.objects.filter(pk=instance.pk).values('curso_id', 'duracion_minutos').first()
+        )
+
+@receiver(post_save, sender=Leccion)
+def contar_leccion(sender, instance, created, **kwargs):
+    if created:
+        contadores.ajustar_curso(
+            instance.curso_id, num_lecciones=1, duracion_total_minutos=instance.duracion_minutos
+        )
+        return
+    anterior = getattr(instance, '_contadores_anterior', None)
+    if anterior is None:
+        return
+    curso_anterior_id = anterior['curso_id']
+    curso_id = instance.curso_id # Ya sincronizado con el módulo en Leccion.save()
+
+    if curso_id == curso_anterior_id:
+        contadores.ajustar_curso(
+            curso_id, duracion_total_minutos=instance.duracion_minutos - anterior['duracion_minutos']
+        )
+    else:
+        contadores.ajustar_curso(
+            curso_anterior_id, num_lecciones=-1, duracion_total_minutos=-anterior['duracion_minutos']
+        )
+        contadores.ajustar_curso(
+            curso_id, num_lecciones=1, duracion_total_minutos=instance.duracion_minutos
+        )
+
+@receiver(post_delete, sender=Leccion)
+def descontar_leccion(sender, instance, **kwargs):
+    contadores.ajustar_curso(
+        instance.curso_id, num_lecciones=-1, duracion_total_minutos=-instance.duracion_minutos
+    )
+
+# -------------------------------------------------------------
+# Curso e instructor copiados en Leccion (autorización sin recorrer FKs)
+# -------------------------------------------------------------
+
+@receiver(post_save, sender=Modulo)
+def mover_lecciones_modulo(sender, instance, created, **kwargs):
+    """Si el módulo cambió de curso, sus lecciones lo siguen (un solo UPDATE)."""
+    curso_anterior_id = getattr(instance, '_curso_anterior_id', None)
+    if created or curso_anterior_id is None or curso_anterior_id == instance.curso_id:
+        return
+    instance.lecciones.update(
+        curso_id=instance.curso_id,
+        instructor_id=Curso.objects.filter(pk=instance.curso_id).values('instructor_id')[:1]
+    )
+
+@receiver(post_save, sender=Curso)
+def copiar_instructor_lecciones(sender, instance, created, **kwargs):
+    anterior = getattr(instance, '_contadores_anterior', None)
+    if created or anterior is None or anterior['instructor_id'] == instance.instructor_id:
+        return
+    Leccion.objects.filter(curso=instance).update(instructor_id=instance.instructor_id)
+
+# -------------------------------------------------------------
+# Variantes responsivas de la portada (ver cursos/portadas.py)
+# -------------------------------------------------------------
+
+@receiver(pre_save, sender=Curso)
+def detectar_portada_nueva(sender, instance, **kwargs):
+    """
+    Un archivo recién asignado aún no está guardado ('_committed' es False
+    hasta que el FileField lo escribe): así se detecta sin consultar la BD.
+    """
+    portada = instance.portada_original
+    instance._portada_nueva = bool(portada) and not portada._committed
+    instance._variantes_descartadas = None
+    if not portada and instance.portada_variantes: # Portada eliminada
+        instance._variantes_descartadas = instance.portada_variantes
+        instance.portada_variantes = {}
+
+@receiver(post_save, sender=Curso)
+def procesar_portada_nueva(sender, instance, **kwargs):
+    from cursos.tasks import procesar_portada_task
+    from cursos.portadas import eliminar_sobrantes
+    
+    if getattr(instance, '_portada_nueva', False):
+        instance._portada_nueva = False
+        transaction.on_commit(lambda: procesar_portada_task.delay(instance.pk))
+    descartadas = getattr(instance, '_variantes_descartadas', None)
+    if descartadas:
+        instance._variantes_descartadas = None
+        transaction.on_commit(lambda: eliminar_sobrantes(descartadas, {}))
@@ -0,0 +1,72 @@
+"""
+Snapshots cacheados del detalle de un curso ('CursoDetailSerializer').
+
+Cada curso tiene un número de versión en la caché compartida. El JSON ya
+renderizado se guarda bajo (curso, versión), así que invalidar es solo subir
+la versión: los snapshots viejos quedan huérfanos y expiran solos.
+"""
+import time
+import hashlib
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = "curso:{}:version"
+SNAPSHOT_KEY = "curso:{}:detalle:v{}"
+SNAPSHOT_TIMEOUT = 60 * 60 * 24 # 24 horas
+
+
+def _nueva_version():
+    # Basada en el reloj: si la caché desaloja la clave de versión, la nueva
+    # versión nunca coincide con la de un snapshot viejo que siga en caché.
+    return time.time_ns()
+
+
+def obtener_version(curso_id):
+    clave = VERSION_KEY.format(curso_id)
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, _nueva_version(), None)
+        version = cache.get(clave)
+    return version
+
+
+def obtener_snapshot(curso_id):
+    """
+    Devuelve (version, snapshot). 'snapshot' es None si no está en caché;
+    en ese caso hay que construirlo y guardarlo con esa misma 'version'.
+    """
+    version = obtener_version(curso_id)
+    return version, cache.get(SNAPSHOT_KEY.format(curso_id, version))
+
+
+def guardar_snapshot(curso, version, contenido):
+    """
+    Guarda el JSON renderizado del curso junto con lo necesario para decidir
+    la visibilidad sin tocar el ORM (estado e instructor).
+    """
+    snapshot = {
+        'contenido': contenido,
+        'etag': '"%s"' % hashlib.sha1(contenido).hexdigest(),
+        'estado': curso.estado,
+        'instructor_id': curso.instructor_id,
+    }
+    cache.set(SNAPSHOT_KEY.format(curso.pk, version), snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+def _subir_versiones(curso_ids):
+    version = _nueva_version()
+    cache.set_many(
+        {VERSION_KEY.format(curso_id): version for curso_id in curso_ids},
+        None
+    )
+
+
+def invalidar_cursos(curso_ids):
+    """
+    Sube la versión de los cursos al confirmar la transacción actual (así un
+    request concurrente no puede guardar datos viejos bajo la versión nueva).
+    """
+    curso_ids = {curso_id for curso_id in curso_ids if curso_id is not None}
+    if curso_ids:
+        transaction.on_commit(lambda: _subir_versiones(curso_ids))
@@ -0,0 +1,178 @@
+"""
+Subidas reanudables por partes (estilo tus) de los archivos de las lecciones.
+
+1. Crear la sesión: se reserva un archivo parcial vacío bajo MEDIA_ROOT.
+2. PATCH con los bytes a partir de 'offset': el cuerpo se lee del stream por
+   bloques y se escribe directo al archivo (memoria constante, sin archivos
+   temporales intermedios). Si la conexión se corta se conservan los bytes
+   recibidos y el cliente reanuda desde el último offset.
+3. Finalizar: el archivo se mueve (sin copiarlo) a 'Leccion.archivo' y se
+   encola su procesamiento.
+"""
+import os
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from cursos.models import Leccion, SubidaLeccion
+
+TAMANO_BLOQUE = 1024 * 1024 # 1 MB por lectura del stream
+LOCK_KEY = "subida:{}:lock"
+LOCK_TIMEOUT = 60 * 60 # Un PATCH muy largo no debe quedar bloqueado para siempre
+
+# Tipos de lección que tienen un archivo subido
+TIPOS_CON_ARCHIVO = (Leccion.TIPO_VIDEO, Leccion.TIPO_DOCUMENTO, Leccion.TIPO_SCORM)
+# Tipos cuyo archivo se procesa en segundo plano al finalizar la subida
+TIPOS_PROCESADOS = (Leccion.TIPO_VIDEO, Leccion.TIPO_SCORM)
+
+
+class ConflictoSubida(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'La subida no está en el estado esperado.'
+    default_code = 'conflicto_subida'
+
+
+def ruta_absoluta(subida):
+    return os.path.join(settings.MEDIA_ROOT, subida.ruta_parcial)
+
+
+def crear_subida(leccion, usuario, nombre_archivo, tamano_total):
+    """Crea la sesión y su archivo parcial vacío."""
+    subida = SubidaLeccion(
+        leccion=leccion,
+        usuario=usuario,
+        nombre_archivo=os.path.basename(nombre_archivo),
+        tamano_total=tamano_total,
+    )
+    subida.ruta_parcial = os.path.join(settings.SUBIDAS_DIRECTORIO, f'{subida.pk}.part')
+    ruta = ruta_absoluta(subida)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    open(ruta, 'wb').close()
+    subida.save()
+    return subida
+
+
+class _Bloqueo:
+    """Un solo PATCH/finalización a la vez por subida (lock en la caché compartida)."""
+
+    def __init__(self, subida):
+        self.clave = LOCK_KEY.format(subida.pk)
+
+    def __enter__(self):
+        if not cache.add(self.clave, 1, LOCK_TIMEOUT):
+            raise ConflictoSubida('Hay otra operación en curso para esta subida.')
+
+    def __exit__(self, *args):
+        cache.delete(self.clave)
+
+
+def escribir_bloque(subida, offset, stream):
+    """
+    Escribe el cuerpo de un PATCH en el archivo parcial a partir de 'offset'
+    (que debe coincidir con lo ya recibido). Devuelve el nuevo offset.
+    """
+    with _Bloqueo(subida):
+        subida.refresh_from_db(fields=['offset'])
+        if offset != subida.offset:
+            raise ConflictoSubida(f'El offset actual es {subida.offset}.')
+
+        restante = subida.tamano_total - offset
+        escritos = 0
+        try:
+            with open(ruta_absoluta(subida), 'r+b') as archivo:
+                archivo.seek(offset)
+                archivo.truncate() # Descarta bytes de un intento anterior sin confirmar
+                while stream is not None and escritos < restante:
+                    bloque = stream.read(min(TAMANO_BLOQUE, restante - escritos))
+                    if not bloque:
+                        break
+                    archivo.write(bloque)
+                    escritos += len(bloque)
+        finally:
+            # Aunque la conexión se haya cortado, lo escrito queda confirmado
+            if escritos:
+                SubidaLeccion.objects.filter(pk=subida.pk).update(
+                    offset=F('offset') + escritos, fecha_actualizacion=timezone.now()
+                )
+                subida.offset += escritos
+
+        if stream is not None and escritos == restante and stream.read(1):
+            raise ConflictoSubida(f'El archivo excede el tamaño declarado ({subida.tamano_total} bytes).')
+    return subida.offset
+
+
+def _mover_a_almacenamiento(subida, nombre):
+    """
+    Mueve el archivo parcial al almacenamiento con el nombre dado y devuelve
+    el nombre definitivo. En disco local es un rename (no se copian los bytes);
+    con almacenamientos remotos se sube por streaming.
+    """
+    origen = ruta_absoluta(subida)
+    nombre = default_storage.get_available_name(nombre)
+    try:
+        destino = default_storage.path(nombre)
+    except NotImplementedError:
+        with open(origen, 'rb') as archivo:
+            nombre = default_storage.save(nombre, File(archivo))
+        os.remove(origen)
+        return nombre
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    os.replace(origen, destino)
+    return nombre
+
+
+def finalizar_subida(subida):
+    """
+    Adjunta el archivo completo a la lección, elimina la sesión y, si es un
+    video o un paquete SCORM, encola su procesamiento al confirmar la transacción.
+    """
+    from cursos.tasks import encolar_procesamiento
+
+    with _Bloqueo(subida):
+        subida.refresh_from_db(fields=['offset'])
+        if not subida.completa:
+            raise ConflictoSubida(f'Faltan bytes: se recibieron {subida.offset} de {subida.tamano_total}.')
+
+        leccion = subida.leccion
+        anterior = leccion.archivo.name
+        nombre = _mover_a_almacenamiento(
+            subida, leccion.archivo.field.generate_filename(leccion, subida.nombre_archivo)
+        )
+
+        with transaction.atomic():
+            leccion.archivo.name = nombre
+            campos = ['archivo']
+            if leccion.tipo_contenido in TIPOS_PROCESADOS:
+                leccion.estado_procesamiento = Leccion.ESTADO_PROCESANDO
+                campos.append('estado_procesamiento')
+                transaction.on_commit(lambda: encolar_procesamiento(leccion))
+            leccion.save(update_fields=campos)
+            subida.delete()
+            if anterior and anterior != nombre:
+                transaction.on_commit(lambda: default_storage.delete(anterior))
+    return leccion
+
+
+def cancelar_subida(subida):
+    """Elimina la sesión y su archivo parcial."""
+    try:
+        os.remove(ruta_absoluta(subida))
+    except FileNotFoundError:
+        pass
+    subida.delete()
+
+
+def limpiar_subidas_abandonadas():
+    """Elimina las sesiones sin actividad reciente. Devuelve cuántas eliminó."""
+    limite = timezone.now() - timedelta(hours=settings.SUBIDAS_CADUCIDAD_HORAS)
+    total = 0
+    for subida in SubidaLeccion.objects.filter(fecha_actualizacion__lt=limite).iterator():
+        cancelar_subida(subida)
+        total += 1
+    return total
@@ -1,50 +1,187 @@
+import math
+import logging
 from celery import shared_task
-from .models import Leccion
-import time # Para simular el procesamiento
-import subprocess # (Opcional) Para llamar a FFMPEG en el futuro
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import transaction
+from .models import Curso, Leccion
+from .transcodificacion import transcodificar, archivo_local
+from . import progreso
 
-@shared_task
-def process_video_task(leccion_id):
+logger = logging.getLogger(__name__)
+
+# Lock por lección: la misma lección nunca se transcodifica dos veces a la vez
+LOCK_TRANSCODIFICACION_KEY = "leccion:{}:transcodificando"
+LOCK_TRANSCODIFICACION_TIMEOUT = 60 * 60 * 6 # Si el worker muere, el lock expira solo
+REINTENTO_LOCK_SEGUNDOS = 60 * 5
+
+def _recursos_video(vista_previa):
+    """Rutas de la vista previa -> URLs públicas (formato de 'Leccion.recursos_video')."""
+    sprites = dict(vista_previa['sprites'])
+    sprites['vtt'] = default_storage.url(sprites['vtt'])
+    return {
+        'poster': default_storage.url(vista_previa['poster']),
+        'miniaturas': [
+            {'url': default_storage.url(m['ruta']), 'ancho': m['ancho'], 'alto': m['alto']}
+            for m in vista_previa['miniaturas']
+        ],
+        'sprites': sprites,
+    }
+
+@shared_task(
+    bind=True,
+    acks_late=True, # Si el worker muere a mitad, el broker la reentrega
+    reject_on_worker_lost=True,
+    max_retries=LOCK_TRANSCODIFICACION_TIMEOUT // REINTENTO_LOCK_SEGUNDOS + 1,
+)
+def process_video_task(self, leccion_id):
     """
-    Tarea asíncrona robusta para "procesar" un video subido.
-    (Simulación de FFMPEG)
+    Transcodifica el video de la lección a HLS adaptativo (240p/480p/720p) y
+    guarda la lista maestra en 'archivo_url', la duración en 'duracion_minutos'
+    y el póster, miniaturas y sprites en 'recursos_video'.
+    Es idempotente ante reentregas:
+    - Si otra ejecución tiene el lock de la lección, se reintenta más tarde
+      (cuando termine verá la lección COMPLETADA, o el lock habrá expirado).
+    - Si la lección ya está COMPLETADA no vuelve a transcodificar.
     """
-    # 1. Marcar como "Procesando"
-    try:
-        leccion = Leccion.objects.get(id=leccion_id)
-        leccion.estado_procesamiento = Leccion.ESTADO_PROCESANDO
-        leccion.save(update_fields=['estado_procesamiento']) # 👈 Actualización eficiente
-    except Leccion.DoesNotExist:
-        print(f"Error Tarea: Lección ID {leccion_id} no encontrada.")
-        return f"Error: Lección {leccion_id} no encontrada."
+    clave = LOCK_TRANSCODIFICACION_KEY.format(leccion_id)
+    if not cache.add(clave, self.request.id or 'directo', LOCK_TRANSCODIFICACION_TIMEOUT):
+        raise self.retry(countdown=REINTENTO_LOCK_SEGUNDOS)
     
-    # 2. Iniciar procesamiento
     try:
-        # --- INICIO DE LÓGICA DE PROCESAMIENTO (Simulación) ---
-        # (Aquí iría la lógica pesada de FFMPEG)
-        time.sleep(30) # Simulacion
-        url_simulada = f"{leccion.archivo.url}.m3u8" # Simulado
-        # --- FIN DE LA LÓGICA DE PROCESAMIENTO ---
+        # 1. Marcar como "Procesando"
+        try:
+            leccion = Leccion.objects.get(id=leccion_id)
+        except Leccion.DoesNotExist:
+            logger.warning("Lección %s no encontrada para procesar su video.", leccion_id)
+            return f"Error: Lección {leccion_id} no encontrada."
+        
+        if leccion.estado_procesamiento == Leccion.ESTADO_COMPLETADO:
+            progreso.publicar_progreso(leccion_id, progreso.ETAPA_COMPLETADO, 100)
+            return f"Video {leccion_id} ya estaba procesado."
+        if leccion.estado_procesamiento != Leccion.ESTADO_PROCESANDO:
+            leccion.estado_procesamiento = Leccion.ESTADO_PROCESANDO
+            leccion.save(update_fields=['estado_procesamiento'])
         
-        # 3. 🚨 CORRECCIÓN DE ROBUSTEZ (Evitar Race Conditions)
-        # Volvemos a obtener el objeto FRESCO de la BD antes de guardar
-        leccion_actualizada = Leccion.objects.get(id=leccion_id)
+        # 2. Transcodificar (el avance se publica para el endpoint SSE)
+        progreso.publicar_progreso(leccion_id, progreso.ETAPA_ANALIZANDO)
+        agregador = None
         
-        leccion_actualizada.archivo_url = url_simulada
+        def al_iniciar(rendiciones):
+            nonlocal agregador
+            agregador = progreso.AgregadorProgreso(leccion_id, len(rendiciones), desde=5, hasta=95)
+            agregador.reportar(0, 0)
+        
+        try:
+            if not leccion.archivo:
+                raise ValueError("La lección no tiene un archivo de video.")
+            with archivo_local(leccion.archivo) as origen:
+                resultado = transcodificar(
+                    origen, leccion_id,
+                    al_iniciar=al_iniciar,
+                    al_avanzar=lambda parte, fraccion: agregador.reportar(parte, fraccion),
+                )
+        except Exception as e:
+            logger.exception("Error procesando el video de la lección %s", leccion_id)
+            # Marcar la lección como fallida
+            Leccion.objects.filter(id=leccion_id).update(estado_procesamiento=Leccion.ESTADO_ERROR)
+            progreso.publicar_progreso(leccion_id, progreso.ETAPA_ERROR, mensaje=str(e)[:500])
+            return f"Error procesando {leccion_id}: {e}"
+        
+        progreso.publicar_progreso(leccion_id, progreso.ETAPA_PUBLICANDO, 95)
+        
+        # 3. Volvemos a obtener el objeto FRESCO de la BD antes de guardar (evita race conditions)
+        try:
+            leccion_actualizada = Leccion.objects.get(id=leccion_id)
+        except Leccion.DoesNotExist:
+            return f"Lección {leccion_id} eliminada durante el procesamiento."
+        leccion_actualizada.archivo_url = default_storage.url(resultado['lista_maestra'])
+        leccion_actualizada.duracion_minutos = max(1, math.ceil(resultado['duracion'] / 60))
+        leccion_actualizada.recursos_video = _recursos_video(resultado['vista_previa'])
         leccion_actualizada.estado_procesamiento = Leccion.ESTADO_COMPLETADO
         leccion_actualizada.save(
-            update_fields=['archivo_url', 'estado_procesamiento']
+            update_fields=['archivo_url', 'duracion_minutos', 'recursos_video', 'estado_procesamiento']
         )
-        
-        return f"Video {leccion_id} procesado exitosamente."
+        progreso.publicar_progreso(leccion_id, progreso.ETAPA_COMPLETADO, 100)
+        return f"Video {leccion_id} procesado exitosamente ({', '.join(resultado['rendiciones'])})."
+    finally:
+        cache.delete(clave)
 
+def encolar_procesamiento_video(leccion_id):
+    """Publica la etapa 'en_cola' y encola la transcodificación de la lección."""
+    progreso.publicar_progreso(leccion_id, progreso.ETAPA_EN_COLA)
+    process_video_task.delay(leccion_id)
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def procesar_scorm_task(leccion_id):
+    """
+    Descomprime el paquete SCORM de la lección en el almacenamiento
+    direccionado por contenido e indexa su imsmanifest.xml. Es idempotente:
+    repetirla reemplaza el índice con el mismo contenido.
+    """
+    from .scorm import ingerir_paquete
+    leccion = Leccion.objects.filter(pk=leccion_id).first()
+    if leccion is None:
+        return f"Error: Lección {leccion_id} no encontrada."
+    try:
+        if not leccion.archivo:
+            raise ValueError("La lección no tiene un paquete SCORM.")
+        with archivo_local(leccion.archivo) as origen:
+            paquete = ingerir_paquete(leccion, origen)
     except Exception as e:
-        print(f"Error Tarea procesando {leccion_id}: {e}")
-        # Marcar la lección como fallida
-        try:
-            leccion_fallida = Leccion.objects.get(id=leccion_id)
-            leccion_fallida.estado_procesamiento = Leccion.ESTADO_ERROR
-            leccion_fallida.save(update_fields=['estado_procesamiento'])
-        except Leccion.DoesNotExist:
-            pass # No se puede hacer nada si ya fue borrada
-        return f"Error procesando {leccion_id}."
\ No newline at end of file
+        logger.exception("Error procesando el paquete SCORM de la lección %s", leccion_id)
+        Leccion.objects.filter(id=leccion_id).update(estado_procesamiento=Leccion.ESTADO_ERROR)
+        return f"Error procesando {leccion_id}: {e}"
+    
+    leccion.estado_procesamiento = Leccion.ESTADO_COMPLETADO
+    leccion.save(update_fields=['estado_procesamiento'])
+    return f"Paquete SCORM {leccion_id} procesado ({paquete.num_archivos} archivos)."
+
+def encolar_procesamiento(leccion):
+    """Encola el procesamiento del archivo de la lección según su tipo."""
+    if leccion.tipo_contenido == Leccion.TIPO_VIDEO:
+        encolar_procesamiento_video(leccion.pk)
+    elif leccion.tipo_contenido == Leccion.TIPO_SCORM:
+        procesar_scorm_task.delay(leccion.pk)
+
+@shared_task
+def indexar_cursos_task(curso_ids):
+    """Reindexa en el índice de búsqueda los cursos dados (ver busqueda.programar_indexacion)."""
+    from .busqueda import indexar_cursos_por_id
+    indexar_cursos_por_id(curso_ids)
+    return f"{len(curso_ids)} cursos reindexados."
+
+@shared_task
+def limpiar_subidas_abandonadas_task():
+    """
+    Tarea periódica (Celery beat): elimina las subidas reanudables sin
+    actividad reciente y sus archivos parciales.
+    """
+    from .subidas import limpiar_subidas_abandonadas
+    total = limpiar_subidas_abandonadas()
+    return f"{total} subidas abandonadas eliminadas."
+
+@shared_task
+def procesar_portada_task(curso_id):
+    """
+    Genera las variantes responsivas (WebP y JPEG en varios anchos) de la
+    portada subida del curso y borra las de la portada anterior.
+    """
+    from .portadas import generar_variantes, eliminar_sobrantes
+    curso = Curso.objects.filter(pk=curso_id).first()
+    if curso is None or not curso.portada_original:
+        return f"Curso {curso_id} sin portada que procesar."
+    nombre = curso.portada_original.name
+    variantes = generar_variantes(curso.portada_original, curso_id)
+    
+    with transaction.atomic():
+        curso = Curso.objects.select_for_update().get(pk=curso_id)
+        if curso.portada_original.name != nombre:
+            # Se subió otra portada mientras tanto: su propia tarea la procesa
+            eliminar_sobrantes(variantes, curso.portada_variantes)
+            return f"Portada del curso {curso_id} reemplazada durante el procesamiento."
+        anteriores = curso.portada_variantes
+        curso.portada_variantes = variantes
+        curso.save(update_fields=['portada_variantes'])
+        transaction.on_commit(lambda: eliminar_sobrantes(anteriores, variantes))
+    return f"Portada del curso {curso_id} procesada ({len(variantes['jpg'])} anchos)."
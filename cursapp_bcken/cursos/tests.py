@@ -1,3 +1,1309 @@
-from django.test import TestCase
+import os
+import json
+import time
+import shutil
+import tempfile
+import zipfile
+import subprocess
+from unittest import mock, skipUnless
+from io import BytesIO
+from PIL import Image
+from celery.exceptions import Retry
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.core.cache import cache
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from core.models import Usuario
+from cursos.models import Curso, Modulo, Leccion, Categoria, Etiqueta, PaqueteScorm, SubidaLeccion
+from evaluacion.models import Inscripcion
+from cursos.contadores import recalcular_contadores
+from cursos import portadas, busqueda, transcodificacion, firmas
+from cursos.api.serializers import CursoListSerializer, CursoDetailSerializer
+from cursos.tasks import (
+    process_video_task, procesar_portada_task, procesar_scorm_task, indexar_cursos_task,
+    LOCK_TRANSCODIFICACION_KEY
+)
+from cursos.progreso import (
+    PROGRESO_KEY, ETAPA_TRANSCODIFICANDO, ETAPA_COMPLETADO, ETAPA_ERROR, publicar_progreso
+)
+from utils.paginacion import PaginacionCursorCompuesto
+from utils.pruebas import DatosCursoMixin
 
-# Create your tests here.
+
+class CatalogoConsultasTests(DatosCursoMixin, TestCase):
+    """
+    El número de queries del catálogo (listado y detalle) no debe crecer
+    con la cantidad de cursos, módulos o lecciones.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.categoria = Categoria.objects.create(nombre='Python', slug='python')
+        self.etiquetas = [
+            Etiqueta.objects.create(nombre=f'Etiqueta {i}', slug=f'etiqueta-{i}') for i in range(3)
+        ]
+
+    def crear_curso(self, numero, modulos=2, lecciones=3):
+        curso = Curso.objects.create(
+            titulo=f'Curso {numero}',
+            slug=f'curso-{numero}',
+            descripcion='Descripción',
+            instructor=self.instructor,
+            categoria=self.categoria,
+            estado=Curso.ESTADO_PUBLICADO,
+            precio_usd=10,
+        )
+        curso.etiquetas.set(self.etiquetas)
+        for m in range(modulos):
+            modulo = Modulo.objects.create(curso=curso, titulo=f'Módulo {m}', descripcion='-', orden=m)
+            for l in range(lecciones):
+                Leccion.objects.create(modulo=modulo, titulo=f'Lección {l}', orden=l)
+        return curso
+
+    def test_listado_queries_constantes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                self.crear_curso(i)
+        # COUNT de la paginación + SELECT con instructor (los conteos son columnas)
+        # + una consulta agrupada por faceta (5) mientras no están en caché
+        with self.assertNumQueries(7):
+            respuesta = self.client.get('/api/v1/cursos/catalogo/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['results'][0]['num_modulos'], 2)
+        self.assertEqual(respuesta.data['results'][0]['precio_ves'], 400)
+        with self.assertNumQueries(2):
+            self.client.get('/api/v1/cursos/catalogo/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3, 15):
+                self.crear_curso(i, modulos=4)
+        with self.assertNumQueries(7):
+            respuesta = self.client.get('/api/v1/cursos/catalogo/')
+        self.assertEqual(respuesta.data['count'], 15)
+        self.assertEqual(respuesta.data['facetas']['categoria'][0]['total'], 15)
+        with self.assertNumQueries(2):
+            self.client.get('/api/v1/cursos/catalogo/')
+
+    def test_detalle_queries_constantes(self):
+        pequeno = self.crear_curso(1, modulos=1, lecciones=1)
+        grande = self.crear_curso(2, modulos=8, lecciones=10)
+
+        # Curso + módulos + lecciones + etiquetas
+        with self.assertNumQueries(4):
+            respuesta = self.client.get(f'/api/v1/cursos/catalogo/{pequeno.pk}/')
+        self.assertEqual(respuesta.status_code, 200)
+
+        with self.assertNumQueries(4):
+            respuesta = self.client.get(f'/api/v1/cursos/catalogo/{grande.pk}/')
+        datos = respuesta.json()
+        self.assertEqual(len(datos['modulos']), 8)
+        self.assertEqual(len(datos['modulos'][0]['lecciones']), 10)
+        self.assertEqual(datos['categoria']['slug'], 'python')
+        self.assertEqual(len(datos['etiquetas']), 3)
+
+        # Con el snapshot en caché el detalle no toca la base de datos
+        with self.assertNumQueries(0):
+            respuesta = self.client.get(f'/api/v1/cursos/catalogo/{grande.pk}/')
+        self.assertEqual(respuesta.json(), datos)
+
+
+class BusquedaTests(DatosCursoMixin, TestCase):
+    """Índice de texto completo: normalización, relevancia y reindexación por señales."""
+
+    def setUp(self):
+        super().setUp()
+        self.categoria = Categoria.objects.create(nombre='Desarrollo', slug='desarrollo')
+        self.etiqueta = Etiqueta.objects.create(nombre='Backend', slug='backend')
+        self.en_titulo = self.crear('Programación en Python', 'Curso práctico.')
+        self.en_descripcion = self.crear('Curso de datos', 'Aprende a programar análisis de datos.')
+        self.en_titulo.etiquetas.add(self.etiqueta)
+
+    def crear(self, titulo, descripcion):
+        return Curso.objects.create(
+            titulo=titulo, slug=titulo.lower().replace(' ', '-'), descripcion=descripcion,
+            instructor=self.instructor, categoria=self.categoria,
+            estado=Curso.ESTADO_PUBLICADO, precio_usd=0
+        )
+
+    def test_normalizacion(self):
+        self.assertEqual(busqueda.normalizar_terminos('Programación en PYTHON'), ['program', 'python'])
+        for palabra in ('programas', 'programacion', 'programar'):
+            self.assertEqual(busqueda.raiz(palabra), 'program')
+        self.assertEqual(busqueda.raiz('sol'), 'sol') # No deja raíces demasiado cortas
+
+    def test_relevancia_y_prefijos(self):
+        respuesta = APIClient().get('/api/v1/cursos/catalogo/', {'search': 'programar'})
+        # El título pesa más que la descripción
+        self.assertEqual(
+            [curso['id'] for curso in respuesta.data['results']], [self.en_titulo.pk, self.en_descripcion.pk]
+        )
+        self.assertEqual(busqueda.buscar_cursos('pyth'), [self.en_titulo.pk])
+        self.assertEqual(busqueda.buscar_cursos('de la'), []) # Solo palabras vacías
+
+    def test_limite_de_relevancia_visible(self):
+        url = '/api/v1/cursos/catalogo/'
+        with mock.patch.object(busqueda, 'MAX_RESULTADOS', 1):
+            datos = APIClient().get(url, {'search': 'programar'}).data
+            self.assertEqual([curso['id'] for curso in datos['results']], [self.en_titulo.pk])
+            self.assertEqual(datos['busqueda'], {'truncado': True, 'total': 2, 'maximo': 1})
+            # Las facetas cuentan todas las coincidencias
+            self.assertEqual(datos['facetas']['categoria'][0]['total'], 2)
+
+            # Con ?ordering= no hay límite
+            datos = APIClient().get(url, {'search': 'programar', 'ordering': 'fecha_creacion'}).data
+            self.assertEqual(datos['count'], 2)
+            self.assertNotIn('busqueda', datos)
+
+        self.assertNotIn('busqueda', APIClient().get(url, {'search': 'programar'}).data)
+
+    def test_reindexacion_por_senales(self):
+        self.categoria.nombre = 'Ingeniería'
+        self.categoria.save()
+        self.assertCountEqual(busqueda.buscar_cursos('ingenieria'), [self.en_titulo.pk, self.en_descripcion.pk])
+
+        # Vaciar la etiqueta reindexa en segundo plano solo los cursos que la tenían
+        with mock.patch('cursos.tasks.indexar_cursos_task.delay') as encolar:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.etiqueta.cursos.clear()
+        encolar.assert_called_once_with([self.en_titulo.pk])
+        self.assertEqual(busqueda.buscar_cursos('backend'), [self.en_titulo.pk]) # Aún sin reindexar
+        indexar_cursos_task(*encolar.call_args.args)
+        self.assertEqual(busqueda.buscar_cursos('backend'), [])
+
+        self.en_titulo.delete()
+        self.assertEqual(busqueda.buscar_cursos('python'), [])
+
+
+class PaginacionCursorTests(DatosCursoMixin, TestCase):
+    """Paginación por cursor del catálogo: recorrido en ambos sentidos, cursores manipulados y búsquedas."""
+
+    def setUp(self):
+        super().setUp()
+        for i, promedio in enumerate(['4.50', '3.00', '4.50', '5.00', '1.25']):
+            Curso.objects.create(
+                titulo=f'Python {i}', slug=f'python-{i}', descripcion='-', instructor=self.instructor,
+                estado=Curso.ESTADO_PUBLICADO, precio_usd=0, promedio_calificacion_general=promedio
+            )
+        self.client = APIClient()
+        self.url = '/api/v1/cursos/catalogo/'
+
+    def recorrer(self, url, enlace='next'):
+        paginas = []
+        while url:
+            respuesta = self.client.get(url)
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertNotIn('count', respuesta.data) # Nunca hace COUNT(*)
+            paginas.append([curso['id'] for curso in respuesta.data['results']])
+            url = respuesta.data[enlace]
+        return paginas
+
+    def test_recorrido_en_ambos_sentidos(self):
+        for ordering, clave in (('', '-fecha_creacion'), ('-promedio_calificacion_general', None)):
+            clave = clave or ordering
+            esperado = list(Curso.objects.order_by(clave, 'id').values_list('id', flat=True))
+            paginas = self.recorrer(f'{self.url}?paginacion=cursor&limit=2&ordering={ordering}')
+            self.assertEqual([pk for pagina in paginas for pk in pagina], esperado)
+            self.assertEqual([len(pagina) for pagina in paginas], [2, 2, 1])
+
+            # Desde la última página, 'previous' devuelve las mismas páginas al revés
+            ultima = self.client.get(f'{self.url}?paginacion=cursor&limit=2&ordering={ordering}')
+            while ultima.data['next']:
+                ultima = self.client.get(ultima.data['next'])
+            self.assertEqual(self.recorrer(ultima.data['previous'], 'previous'), paginas[-2::-1])
+
+    def test_cursores_manipulados(self):
+        paginador = PaginacionCursorCompuesto()
+        for token in (
+            'no-es-base64!',
+            paginador.codificar_cursor(['no-es-fecha', 1], False),
+            paginador.codificar_cursor([[1], {'a': 1}], False),
+            paginador.codificar_cursor([1], False), # Longitud distinta a la clave
+        ):
+            self.assertEqual(self.client.get(self.url, {'cursor': token}).status_code, 404)
+
+    def test_busqueda_conserva_la_relevancia(self):
+        respuesta = self.client.get(self.url, {'search': 'python', 'paginacion': 'cursor', 'limit': 2})
+        # Con búsqueda se pagina con offset (orden de relevancia)
+        self.assertEqual(respuesta.data['count'], 5)
+        self.assertEqual(
+            [curso['id'] for curso in respuesta.data['results']], busqueda.buscar_cursos('python')[:2]
+        )
+        token = PaginacionCursorCompuesto().codificar_cursor(['2026-01-01T00:00:00+00:00', 1], False)
+        respuesta = self.client.get(self.url, {'search': 'python', 'cursor': token})
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class FacetasTests(DatosCursoMixin, TestCase):
+    """Cada faceta ignora su propio filtro, aplica los demás y coincide con el listado filtrado."""
+
+    def setUp(self):
+        super().setUp()
+        python = Categoria.objects.create(nombre='Python', slug='python')
+        diseno = Categoria.objects.create(nombre='Diseño', slug='diseno')
+        rest = Etiqueta.objects.create(nombre='REST', slug='rest')
+        web = Etiqueta.objects.create(nombre='Web', slug='web')
+        for i, (categoria, etiquetas, precio, certificado, promedio) in enumerate([
+            (python, [rest], 0, True, '4.50'),
+            (python, [web, rest], 15, False, '3.20'),
+            (diseno, [rest], 30, True, '4.10'),
+            (diseno, [], 120, False, '2.00'),
+            (None, [web], 60, True, '0'),
+        ]):
+            curso = Curso.objects.create(
+                titulo=f'Curso {i}', slug=f'curso-{i}', descripcion='-', instructor=self.instructor,
+                categoria=categoria, estado=Curso.ESTADO_PUBLICADO, precio_usd=precio,
+                req_certificado=certificado, promedio_calificacion_general=promedio
+            )
+            curso.etiquetas.set(etiquetas)
+        self.client = APIClient()
+
+    def listado(self, filtros):
+        respuesta = self.client.get('/api/v1/cursos/catalogo/', {**filtros, 'limit': 100})
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.data
+
+    def test_facetas_coinciden_con_el_listado(self):
+        for filtros in (
+            {},
+            {'categoria': 'python'},
+            {'categoria': 'python', 'certificado': 'true'},
+            {'etiquetas': 'rest', 'precio': 'gratis,20_50'},
+            {'calificacion_min': '4', 'etiquetas': 'rest,web'},
+        ):
+            datos = self.listado(filtros)
+            for faceta, opciones in datos['facetas'].items():
+                for opcion in opciones:
+                    with self.subTest(filtros=filtros, faceta=faceta, valor=opcion['valor']):
+                        # Elegir esta opción en lugar del filtro propio da exactamente 'total' cursos
+                        otra = self.listado({**filtros, faceta: str(opcion['valor'])})
+                        self.assertEqual(otra['count'], opcion['total'])
+                        self.assertEqual(opcion['activo'], str(opcion['valor']) in filtros.get(faceta, '').split(','))
+
+    def test_faceta_ignora_su_filtro_y_aplica_los_demas(self):
+        datos = self.listado({'categoria': 'python', 'certificado': 'true'})
+        self.assertEqual(datos['count'], 1)
+        categorias = {o['valor']: o['total'] for o in datos['facetas']['categoria']}
+        self.assertEqual(categorias, {'python': 1, 'diseno': 1}) # Sin su filtro, con el de certificado
+        certificado = {o['valor']: o['total'] for o in datos['facetas']['certificado']}
+        self.assertEqual(certificado, {'true': 1, 'false': 1}) # Sin su filtro, con el de categoría
+
+
+class ImportacionTests(DatosCursoMixin, TestCase):
+    """Importar/exportar el árbol del curso: ida y vuelta sin pérdidas y con consultas fijas."""
+
+    def setUp(self):
+        super().setUp()
+        Categoria.objects.create(nombre='Python', slug='python')
+        Etiqueta.objects.create(nombre='REST', slug='rest')
+        self.client = APIClient()
+        self.client.force_authenticate(self.instructor)
+
+    def arbol(self, slug, modulos=2, lecciones=2):
+        return {
+            'titulo': f'Curso {slug}', 'slug': slug, 'descripcion': 'Descripción', 'precio_usd': '10.00',
+            'req_certificado': True, 'categoria': 'python', 'etiquetas': ['rest'],
+            'modulos': [{
+                'titulo': f'Módulo {m}', 'descripcion': '-', 'orden': m + 1,
+                'lecciones': [{
+                    'titulo': f'Lección {m}.{l}', 'orden': l + 1, 'tipo_contenido': Leccion.TIPO_ARTICULO,
+                    'cuerpo_articulo': f'# Tema {l}', 'duracion_minutos': 5,
+                    'cuestionario': {
+                        'titulo': 'Repaso', 'calificacion_minima': '70.00', 'maximo_intentos': 3,
+                        'preguntas': [{
+                            'texto_pregunta': '¿Sí?', 'tipo_pregunta': 2, 'puntuacion': 1,
+                            'opciones': [
+                                {'texto_opcion': 'Sí', 'es_correcta': True},
+                                {'texto_opcion': 'No', 'es_correcta': False},
+                            ],
+                        }],
+                    },
+                } for l in range(lecciones)],
+            } for m in range(modulos)],
+        }
+
+    def importar(self, datos):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.post('/api/v1/cursos/catalogo/importar/', datos, format='json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.data)
+        return respuesta.data['id'], len(consultas)
+
+    def exportar(self, curso_id):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(f'/api/v1/cursos/catalogo/{curso_id}/exportar/')
+            datos = json.loads(b''.join(respuesta.streaming_content))
+        return datos, len(consultas)
+
+    def test_ida_y_vuelta(self):
+        curso_id, consultas_pequeno = self.importar(self.arbol('pequeno', modulos=1, lecciones=1))
+        _, exportacion_pequeno = self.exportar(curso_id)
+
+        curso_id, consultas_grande = self.importar(self.arbol('grande', modulos=4, lecciones=5))
+        self.assertEqual(consultas_grande, consultas_pequeno) # Un INSERT por nivel
+        exportado, exportacion_grande = self.exportar(curso_id)
+        self.assertEqual(exportacion_grande, exportacion_pequeno) # Una consulta por nivel
+        self.assertEqual(Leccion.objects.filter(curso_id=curso_id).count(), 20)
+        self.assertEqual(Curso.objects.get(pk=curso_id).num_lecciones, 20)
+
+        # Exportar -> importar -> exportar da el mismo árbol
+        copia_id, _ = self.importar({**exportado, 'titulo': 'Copia', 'slug': 'copia'})
+        copia, _ = self.exportar(copia_id)
+        self.assertEqual({**copia, 'titulo': 'Curso grande', 'slug': 'grande'}, exportado)
+        self.assertEqual(exportado['modulos'][3]['lecciones'][4]['cuestionario']['preguntas'][0]['opciones'][0],
+                         {'texto_opcion': 'Sí', 'es_correcta': True})
+
+    def test_rechaza_ordenes_invalidos(self):
+        datos = self.arbol('repetido')
+        datos['modulos'][1]['orden'] = datos['modulos'][0]['orden']
+        self.assertEqual(self.client.post('/api/v1/cursos/catalogo/importar/', datos, format='json').status_code, 400)
+
+        datos = self.arbol('negativo')
+        datos['modulos'][0]['lecciones'][0]['orden'] = -1
+        self.assertEqual(self.client.post('/api/v1/cursos/catalogo/importar/', datos, format='json').status_code, 400)
+
+        datos = self.arbol('leccion-repetida')
+        datos['modulos'][0]['lecciones'][1]['orden'] = 1
+        self.assertEqual(self.client.post('/api/v1/cursos/catalogo/importar/', datos, format='json').status_code, 400)
+        self.assertFalse(Curso.objects.exists()) # Nada a medias
+
+
+class ReordenarTests(DatosCursoMixin, TestCase):
+    """Reordenar módulos y lecciones: número fijo de queries y listas completas del contenedor."""
+
+    def setUp(self):
+        super().setUp()
+        self.curso = Curso.objects.create(
+            titulo='Curso', slug='curso', descripcion='-', instructor=self.instructor, precio_usd=0
+        )
+        self.modulos = [
+            Modulo.objects.create(curso=self.curso, titulo=f'M{i}', descripcion='-', orden=i + 1) for i in range(2)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.instructor)
+
+    def url(self, modulo):
+        return f'/api/v1/cursos/catalogo/{self.curso.pk}/modulos/{modulo.pk}/lecciones/reordenar/'
+
+    def ordenes(self, modulo):
+        return list(modulo.lecciones.order_by('orden').values_list('pk', flat=True))
+
+    def test_queries_constantes(self):
+        for modulo, cantidad in zip(self.modulos, (3, 30)):
+            for i in range(cantidad):
+                Leccion.objects.create(modulo=modulo, titulo=f'L{i}', orden=i + 1)
+            # Al revés: cada posición nueva choca con el orden actual de otra lección
+            nuevo = self.ordenes(modulo)[::-1]
+            # Módulo/curso + hermanos (FOR UPDATE) + desplazamiento + bulk_update + savepoint
+            with self.assertNumQueries(6):
+                respuesta = self.client.post(self.url(modulo), {'orden': nuevo}, format='json')
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertEqual(self.ordenes(modulo), nuevo)
+            self.assertEqual(list(modulo.lecciones.order_by('orden').values_list('orden', flat=True)),
+                             list(range(1, cantidad + 1)))
+
+    def test_intercambio_y_listas_invalidas(self):
+        a, b, c = [Leccion.objects.create(modulo=self.modulos[0], titulo=f'L{i}', orden=i + 1) for i in range(3)]
+        ajena = Leccion.objects.create(modulo=self.modulos[1], titulo='Ajena', orden=1)
+
+        # Intercambio de dos vecinos (mismo unique_together en medio)
+        self.assertEqual(self.client.post(self.url(self.modulos[0]), {'orden': [b.pk, a.pk, c.pk]}, format='json').status_code, 200)
+        self.assertEqual(self.ordenes(self.modulos[0]), [b.pk, a.pk, c.pk])
+
+        for orden in ([b.pk, a.pk], [b.pk, a.pk, c.pk, ajena.pk], [b.pk, a.pk, ajena.pk], [a.pk, a.pk, b.pk, c.pk], 'a,b'):
+            with self.subTest(orden=orden):
+                respuesta = self.client.post(self.url(self.modulos[0]), {'orden': orden}, format='json')
+                self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(self.ordenes(self.modulos[0]), [b.pk, a.pk, c.pk]) # Sin cambios a medias
+
+        otro = Usuario.objects.create_user(username='otro', password='clave', rol=Usuario.ROL_INSTRUCTOR)
+        self.client.force_authenticate(otro)
+        respuesta = self.client.post(self.url(self.modulos[0]), {'orden': [a.pk, b.pk, c.pk]}, format='json')
+        self.assertEqual(respuesta.status_code, 403)
+
+        # Módulos del curso
+        self.client.force_authenticate(self.instructor)
+        respuesta = self.client.post(
+            f'/api/v1/cursos/catalogo/{self.curso.pk}/modulos/reordenar/',
+            {'orden': [self.modulos[1].pk, self.modulos[0].pk]}, format='json'
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(list(self.curso.modulos.order_by('orden').values_list('pk', flat=True)),
+                         [self.modulos[1].pk, self.modulos[0].pk])
+
+
+class ContadoresTests(DatosCursoMixin, TestCase):
+    """
+    Los contadores desnormalizados deben coincidir con un recálculo completo.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.alumno = Usuario.objects.create_user(username='alumno', password='clave')
+        self.python = Categoria.objects.create(nombre='Python', slug='python')
+        self.diseno = Categoria.objects.create(nombre='Diseño', slug='diseno')
+        self.curso = Curso.objects.create(
+            titulo='Curso A', slug='curso-a', descripcion='-', instructor=self.instructor,
+            categoria=self.python, precio_usd=0
+        )
+        self.otro = Curso.objects.create(
+            titulo='Curso B', slug='curso-b', descripcion='-', instructor=self.instructor, precio_usd=0
+        )
+
+    def contadores(self, curso):
+        curso.refresh_from_db()
+        return [getattr(curso, campo) for campo in Curso.CAMPOS_CONTADORES]
+
+    def assertCoincideConRecalculo(self):
+        antes = [self.contadores(c) for c in (self.curso, self.otro)]
+        categorias = list(Categoria.objects.order_by('pk').values_list('num_cursos_publicados', flat=True))
+        recalcular_contadores()
+        self.assertEqual([self.contadores(c) for c in (self.curso, self.otro)], antes)
+        self.assertEqual(
+            list(Categoria.objects.order_by('pk').values_list('num_cursos_publicados', flat=True)), categorias
+        )
+
+    def test_contenido(self):
+        modulo = Modulo.objects.create(curso=self.curso, titulo='M1', descripcion='-')
+        leccion = Leccion.objects.create(modulo=modulo, titulo='L1', orden=1, duracion_minutos=10)
+        Leccion.objects.create(modulo=modulo, titulo='L2', orden=2, duracion_minutos=5)
+        self.assertEqual(self.contadores(self.curso)[:3], [1, 2, 15])
+
+        leccion.duracion_minutos = 30
+        leccion.save()
+        self.assertEqual(self.contadores(self.curso)[:3], [1, 2, 35])
+
+        # Mover el módulo se lleva sus lecciones
+        modulo.curso = self.otro
+        modulo.save()
+        self.assertEqual(self.contadores(self.curso)[:3], [0, 0, 0])
+        self.assertEqual(self.contadores(self.otro)[:3], [1, 2, 35])
+        self.assertCoincideConRecalculo()
+
+        modulo.delete()
+        self.assertEqual(self.contadores(self.otro)[:3], [0, 0, 0])
+        self.assertCoincideConRecalculo()
+
+    def test_save_completo_no_pisa_contadores(self):
+        curso = Curso.objects.get(pk=self.curso.pk) # Copia en memoria con contadores en 0
+        Modulo.objects.create(curso=self.curso, titulo='M1', descripcion='-')
+        curso.titulo = 'Curso A editado'
+        curso.save()
+        self.assertEqual(self.contadores(self.curso)[0], 1)
+
+    def test_curso_e_instructor_en_lecciones(self):
+        modulo = Modulo.objects.create(curso=self.curso, titulo='M1', descripcion='-')
+        leccion = Leccion.objects.create(modulo=modulo, titulo='L1', orden=1)
+        self.assertEqual((leccion.curso_id, leccion.instructor_id), (self.curso.pk, self.instructor.pk))
+
+        # El módulo cambia de curso (de otro instructor): sus lecciones lo siguen
+        otro_instructor = Usuario.objects.create_user(
+            username='otro', password='clave', rol=Usuario.ROL_INSTRUCTOR
+        )
+        self.otro.instructor = otro_instructor
+        self.otro.save()
+        modulo.curso = self.otro
+        modulo.save()
+        leccion.refresh_from_db()
+        self.assertEqual((leccion.curso_id, leccion.instructor_id), (self.otro.pk, otro_instructor.pk))
+
+        # La lección cambia de módulo
+        destino = Modulo.objects.create(curso=self.curso, titulo='M2', descripcion='-')
+        leccion.modulo = destino
+        leccion.save(update_fields=['modulo'])
+        leccion.refresh_from_db()
+        self.assertEqual((leccion.curso_id, leccion.instructor_id), (self.curso.pk, self.instructor.pk))
+
+        # Sin cambiar de módulo no se vuelve a consultar el curso: solo los
+        # valores anteriores para los contadores y el UPDATE
+        leccion = Leccion.objects.get(pk=leccion.pk)
+        leccion.titulo = 'L1 editada'
+        with self.assertNumQueries(2):
+            leccion.save()
+        leccion.modulo = modulo
+        leccion.save()
+        self.assertEqual(leccion.curso_id, self.otro.pk)
+
+        # El curso cambia de instructor
+        self.curso.instructor = otro_instructor
+        self.curso.save(update_fields=['instructor'])
+        leccion.refresh_from_db()
+        self.assertEqual(leccion.instructor_id, otro_instructor.pk)
+
+    def test_publicados_e_inscritos(self):
+        self.curso.estado = Curso.ESTADO_PUBLICADO
+        self.curso.save()
+        self.python.refresh_from_db()
+        self.assertEqual(self.python.num_cursos_publicados, 1)
+
+        self.curso.categoria = self.diseno
+        self.curso.save()
+        self.python.refresh_from_db()
+        self.diseno.refresh_from_db()
+        self.assertEqual((self.python.num_cursos_publicados, self.diseno.num_cursos_publicados), (0, 1))
+
+        inscripcion = Inscripcion.objects.create(alumno=self.alumno, curso=self.curso, precio_pagado_usd=0)
+        self.assertEqual(self.contadores(self.curso)[3], 0)
+        inscripcion.estado_pago = Inscripcion.ESTADO_PAGADO
+        inscripcion.save()
+        self.assertEqual(self.contadores(self.curso)[3], 1)
+        self.assertCoincideConRecalculo()
+
+        inscripcion.delete()
+        self.curso.delete()
+        self.diseno.refresh_from_db()
+        self.assertEqual(self.diseno.num_cursos_publicados, 0)
+
+    def test_recalculo_acotado_a_los_cursos(self):
+        Curso.objects.filter(pk=self.curso.pk).update(estado=Curso.ESTADO_PUBLICADO, num_modulos=7)
+        Curso.objects.filter(pk=self.otro.pk).update(num_modulos=7)
+        Categoria.objects.update(num_cursos_publicados=9)
+
+        # Solo el curso indicado y su categoría
+        with CaptureQueriesContext(connection) as consultas:
+            recalcular_contadores([self.curso.pk])
+        self.assertEqual(len(consultas), 2)
+        self.assertEqual((self.contadores(self.curso)[0], self.contadores(self.otro)[0]), (0, 7))
+        self.assertEqual(
+            dict(Categoria.objects.values_list('slug', 'num_cursos_publicados')), {'python': 1, 'diseno': 9}
+        )
+
+
+class MediaTemporalMixin(DatosCursoMixin):
+    """Además de los datos base, un MEDIA_ROOT temporal que se borra al terminar."""
+    ajustes_media = {} # Ajustes extra mientras dura el test
+
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=self.media, **self.ajustes_media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+
+class SubidasTests(MediaTemporalMixin, TestCase):
+    """Subidas reanudables por partes: offsets, reanudación y finalización."""
+
+    def setUp(self):
+        super().setUp()
+        self.crear_leccion(titulo='Video')
+        self.client = APIClient()
+        self.client.force_authenticate(self.instructor)
+        self.base = (
+            f'/api/v1/cursos/catalogo/{self.curso.pk}/modulos/{self.modulo.pk}'
+            f'/lecciones/{self.leccion.pk}/subidas/'
+        )
+
+    def crear(self, tamano):
+        respuesta = self.client.post(self.base, {'nombre_archivo': 'clase.mp4', 'tamano_total': tamano}, format='json')
+        self.assertEqual(respuesta.status_code, 201)
+        return f"{self.base}{respuesta.data['id']}/"
+
+    def enviar(self, url, datos, offset, tipo='application/offset+octet-stream'):
+        return self.client.patch(url, datos, content_type=tipo, HTTP_UPLOAD_OFFSET=str(offset))
+
+    def test_subida_reanudada_y_finalizada(self):
+        datos = os.urandom(3 * 1024 * 1024 + 17) # Varios bloques de lectura
+        url = self.crear(len(datos))
+
+        respuesta = self.enviar(url, datos[:1000], 0, 'application/offset+octet-stream; charset=binary')
+        self.assertEqual((respuesta.status_code, respuesta['Upload-Offset']), (204, '1000'))
+        # Offset que no coincide con lo recibido (reintento de un bloque ya confirmado)
+        self.assertEqual(self.enviar(url, datos[:10], 0).status_code, 409)
+        self.assertEqual(self.client.post(f'{url}finalizar/').status_code, 409) # Incompleta
+
+        # Reanudar desde el offset que informa el servidor
+        offset = int(self.client.head(url)['Upload-Offset'])
+        self.assertEqual(offset, 1000)
+        self.assertEqual(self.enviar(url, datos[offset:], offset)['Upload-Offset'], str(len(datos)))
+
+        with mock.patch('cursos.tasks.process_video_task.delay') as encolar, \
+                self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.post(f'{url}finalizar/')
+        self.assertEqual(respuesta.status_code, 200)
+        encolar.assert_called_once_with(self.leccion.pk)
+        self.leccion.refresh_from_db()
+        with open(self.leccion.archivo.path, 'rb') as archivo:
+            self.assertEqual(archivo.read(), datos)
+        self.assertFalse(SubidaLeccion.objects.exists())
+
+    def test_rechazos(self):
+        url = self.crear(5)
+        self.assertEqual(self.enviar(url, b'12345', 0, 'application/json').status_code, 415)
+        self.assertEqual(self.enviar(url, b'123456', 0).status_code, 409) # Excede el tamaño declarado
+
+        otro = APIClient()
+        otro.force_authenticate(Usuario.objects.create_user(
+            username='otro', password='clave', rol=Usuario.ROL_INSTRUCTOR
+        ))
+        self.assertEqual(otro.post(self.base, {'nombre_archivo': 'a.mp4', 'tamano_total': 5}, format='json').status_code, 403)
+        self.assertEqual(otro.head(url).status_code, 404)
+
+
+class TranscodificacionTests(MediaTemporalMixin, TestCase):
+    """
+    Transcodificación HLS: con ffprobe/ffmpeg simulados (escalera, publicación
+    atómica, idempotencia y lock) y, si están instalados, con un clip real.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.crear_leccion(titulo='Video', estado_procesamiento=Leccion.ESTADO_PROCESANDO)
+        self.directorio = os.path.join(self.media, 'hls', str(self.leccion.pk))
+
+    def subir_archivo(self, nombre='clip.mp4', contenido=b'mp4'):
+        os.makedirs(os.path.join(self.media, 'lecciones'), exist_ok=True)
+        with open(os.path.join(self.media, 'lecciones', nombre), 'wb') as archivo:
+            archivo.write(contenido)
+        self.leccion.archivo.name = f'lecciones/{nombre}'
+        self.leccion.save(update_fields=['archivo'])
+
+    def ffprobe(self, ancho, alto, duracion=30.0):
+        """subprocess.run simulado: ffprobe describe un video con audio."""
+        salida = json.dumps({
+            'format': {'duration': str(duracion)},
+            'streams': [{'codec_type': 'video', 'width': ancho, 'height': alto}, {'codec_type': 'audio'}],
+        }).encode()
+        return mock.patch(
+            'cursos.transcodificacion.subprocess.run',
+            return_value=subprocess.CompletedProcess([], 0, stdout=salida, stderr=b'')
+        )
+
+    def ffmpeg(self, falla=None):
+        """
+        subprocess.Popen simulado: escribe las salidas que ffmpeg generaría
+        (lista, segmento, póster y sprite) o falla en la rendición 'falla'.
+        Devuelve (patch, comandos ejecutados).
+        """
+        comandos = []
+
+        def popen(comando, stdout=None, stderr=None):
+            comandos.append(comando)
+            proceso = mock.MagicMock(returncode=0)
+            proceso.__enter__.return_value = proceso
+            proceso.__exit__.return_value = False
+            proceso.stdout = [b'out_time_us=15000000\n', b'progress=end\n']
+            if falla and f'{falla}.m3u8' in map(os.path.basename, comando):
+                proceso.returncode = 1
+                stderr.write(b'Conversion failed!')
+                return proceso
+            for argumento in comando:
+                if argumento.endswith('.m3u8'):
+                    with open(argumento, 'w') as archivo:
+                        archivo.write('#EXTM3U\n')
+                elif argumento.endswith('%04d.ts'):
+                    open(argumento % 0, 'wb').close()
+                elif argumento.endswith(transcodificacion.POSTER):
+                    Image.new('RGB', (1280, 720), 'blue').save(argumento, 'JPEG')
+                elif argumento.endswith(transcodificacion.SPRITE_PATRON):
+                    open(argumento % 1, 'wb').close()
+            return proceso
+
+        return mock.patch('cursos.transcodificacion.subprocess.Popen', side_effect=popen), comandos
+
+    def test_escalera_segun_resolucion(self):
+        nombres = lambda alto: [r[0] for r in transcodificacion.escalera(alto)]
+        self.assertEqual(nombres(1080), ['240p', '480p', '720p'])
+        self.assertEqual(nombres(480), ['240p', '480p'])
+        self.assertEqual(nombres(144), ['240p']) # Al menos la menor
+
+    def test_transcodificacion_simulada(self):
+        self.subir_archivo()
+        popen, comandos = self.ffmpeg()
+        with self.ffprobe(1280, 720), popen:
+            self.assertIn('(240p, 480p, 720p)', process_video_task(self.leccion.pk))
+
+        # Una rendición por proceso; solo la primera genera la vista previa
+        self.assertEqual(len(comandos), 3)
+        self.assertEqual(sum(transcodificacion.SPRITE_PATRON in ' '.join(c) for c in comandos), 1)
+        with open(os.path.join(self.directorio, 'master.m3u8')) as archivo:
+            maestra = archivo.read()
+        self.assertIn('RESOLUTION=1280x720', maestra)
+        self.assertIn('RESOLUTION=854x480', maestra)
+
+        self.leccion.refresh_from_db()
+        self.assertEqual(self.leccion.estado_procesamiento, Leccion.ESTADO_COMPLETADO)
+        self.assertEqual(self.leccion.duracion_minutos, 1)
+        self.assertEqual([m['ancho'] for m in self.leccion.recursos_video['miniaturas']], [320, 640, 1280])
+        self.assertIsNone(cache.get(LOCK_TRANSCODIFICACION_KEY.format(self.leccion.pk)))
+        self.assertEqual(cache.get(PROGRESO_KEY.format(self.leccion.pk))['etapa'], ETAPA_COMPLETADO)
+
+        # Una reentrega con la lección COMPLETADA no vuelve a ejecutar ffmpeg
+        with self.ffprobe(1280, 720) as probe, popen:
+            self.assertIn('ya estaba procesado', process_video_task(self.leccion.pk))
+        probe.assert_not_called()
+        self.assertEqual(len(comandos), 3)
+
+    def test_publicacion_atomica(self):
+        # Escalera anterior ya publicada
+        os.makedirs(self.directorio)
+        with open(os.path.join(self.directorio, 'viejo_0000.ts'), 'wb') as archivo:
+            archivo.write(b'viejo')
+        self.subir_archivo()
+
+        # Falla una rendición: la escalera anterior sigue intacta y no quedan temporales
+        popen, _ = self.ffmpeg(falla='480p')
+        with self.ffprobe(854, 480), popen:
+            self.assertIn('Conversion failed!', process_video_task(self.leccion.pk))
+        self.leccion.refresh_from_db()
+        self.assertEqual(self.leccion.estado_procesamiento, Leccion.ESTADO_ERROR)
+        self.assertEqual(os.listdir(os.path.join(self.media, 'hls')), [str(self.leccion.pk)])
+        self.assertEqual(os.listdir(self.directorio), ['viejo_0000.ts'])
+
+        # Un reintento correcto reemplaza el directorio entero con un rename
+        Leccion.objects.filter(pk=self.leccion.pk).update(estado_procesamiento=Leccion.ESTADO_PROCESANDO)
+        popen, _ = self.ffmpeg()
+        with self.ffprobe(854, 480), popen:
+            process_video_task(self.leccion.pk)
+        self.assertEqual(os.listdir(os.path.join(self.media, 'hls')), [str(self.leccion.pk)])
+        archivos = os.listdir(self.directorio)
+        self.assertNotIn('viejo_0000.ts', archivos)
+        self.assertIn('480p_0000.ts', archivos)
+        self.assertNotIn('720p.m3u8', archivos)
+
+    def generar_clip(self, segundos=3, tamano='854x480'):
+        os.makedirs(os.path.join(self.media, 'lecciones'))
+        subprocess.run([
+            settings.FFMPEG_BINARIO, '-v', 'error', '-y',
+            '-f', 'lavfi', '-i', f'testsrc=size={tamano}:rate=24',
+            '-f', 'lavfi', '-i', 'sine=frequency=440',
+            '-t', str(segundos), '-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-c:a', 'aac',
+            os.path.join(self.media, 'lecciones', 'clip.mp4'),
+        ], check=True)
+        self.leccion.archivo.name = 'lecciones/clip.mp4'
+        self.leccion.save(update_fields=['archivo'])
+
+    @skipUnless(
+        shutil.which(settings.FFMPEG_BINARIO) and shutil.which(settings.FFPROBE_BINARIO),
+        "Requiere ffmpeg y ffprobe"
+    )
+    def test_escalera_hls(self):
+        self.generar_clip()
+        process_video_task(self.leccion.pk)
+
+        self.leccion.refresh_from_db()
+        self.assertEqual(self.leccion.estado_procesamiento, Leccion.ESTADO_COMPLETADO)
+        self.assertEqual(self.leccion.duracion_minutos, 1)
+        self.assertTrue(self.leccion.archivo_url.endswith(f'hls/{self.leccion.pk}/master.m3u8'))
+
+        # Solo las rendiciones que no superan los 480p del original
+        directorio = os.path.join(self.media, 'hls', str(self.leccion.pk))
+        with open(os.path.join(directorio, 'master.m3u8')) as archivo:
+            maestra = archivo.read()
+        self.assertIn('RESOLUTION=854x480', maestra)
+        self.assertIn('240p.m3u8', maestra)
+        self.assertNotIn('720p', maestra)
+        for rendicion in ('240p', '480p'):
+            self.assertTrue(os.path.exists(os.path.join(directorio, f'{rendicion}_0000.ts')))
+        self.assertEqual(os.listdir(os.path.join(self.media, 'hls')), [str(self.leccion.pk)])
+        self.assertEqual(cache.get(PROGRESO_KEY.format(self.leccion.pk))['etapa'], ETAPA_COMPLETADO)
+
+        # Vista previa generada en la misma pasada: póster, miniaturas y sprites
+        recursos = self.leccion.recursos_video
+        self.assertTrue(recursos['poster'].endswith(f'hls/{self.leccion.pk}/poster.jpg'))
+        self.assertEqual([m['ancho'] for m in recursos['miniaturas']], [320, 640])
+        self.assertEqual((recursos['sprites']['ancho'], recursos['sprites']['alto']), (160, 90))
+        for nombre in ('poster.jpg', 'miniatura_320.webp', 'sprite_001.jpg'):
+            self.assertTrue(os.path.exists(os.path.join(directorio, nombre)))
+        with open(os.path.join(directorio, 'sprite.vtt')) as archivo:
+            self.assertIn('00:00:00.000 --> 00:00:03.000\nsprite_001.jpg#xywh=0,0,160,90', archivo.read())
+
+        # Una reentrega de la tarea no vuelve a transcodificar
+        self.assertIn('ya estaba procesado', process_video_task(self.leccion.pk))
+
+    def test_lock_evita_transcodificacion_simultanea(self):
+        self.subir_archivo()
+        clave = LOCK_TRANSCODIFICACION_KEY.format(self.leccion.pk)
+        cache.add(clave, 'otra-tarea')
+        popen, comandos = self.ffmpeg()
+        with self.ffprobe(854, 480) as probe, popen:
+            with self.assertRaises(Retry):
+                process_video_task(self.leccion.pk)
+        probe.assert_not_called()
+        self.assertEqual(comandos, [])
+        self.leccion.refresh_from_db()
+        self.assertEqual(self.leccion.estado_procesamiento, Leccion.ESTADO_PROCESANDO)
+        # El lock es de la otra tarea: no se libera
+        self.assertEqual(cache.get(clave), 'otra-tarea')
+
+    def test_archivo_invalido_marca_error(self):
+        self.subir_archivo('roto.mp4', b'no es un video')
+        error = subprocess.CalledProcessError(1, ['ffprobe'], stderr=b'Invalid data found when processing input')
+        with mock.patch('cursos.transcodificacion.subprocess.run', side_effect=error):
+            process_video_task(self.leccion.pk)
+        self.leccion.refresh_from_db()
+        self.assertEqual(self.leccion.estado_procesamiento, Leccion.ESTADO_ERROR)
+        self.assertFalse(os.path.exists(os.path.join(self.media, 'hls')))
+        progreso = cache.get(PROGRESO_KEY.format(self.leccion.pk))
+        self.assertEqual(progreso['etapa'], ETAPA_ERROR)
+        self.assertIn('Invalid data', progreso['mensaje'])
+
+    async def test_progreso_sse(self):
+        url = reverse('leccion-progreso', args=[self.leccion.pk])
+        token = str(AccessToken.for_user(self.instructor))
+        respuesta = await self.async_client.get(url)
+        self.assertEqual(respuesta.status_code, 401)
+        # El JWT no se acepta en la URL
+        for parametro in ('token', 't'):
+            respuesta = await self.async_client.get(url, {parametro: token})
+            self.assertEqual(respuesta.status_code, 401)
+        otro = await sync_to_async(Usuario.objects.create_user)(username='otro', password='clave')
+        respuesta = await self.async_client.get(
+            url, headers={'Authorization': f'Bearer {AccessToken.for_user(otro)}'}
+        )
+        self.assertEqual(respuesta.status_code, 404)
+
+        # Sin nada publicado todavía el estado inicial sale de la BD; el
+        # stream termina al llegar a una etapa final
+        publicar_progreso(self.leccion.pk, ETAPA_TRANSCODIFICANDO, 40)
+        respuesta = await self.async_client.get(url, headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(respuesta['Content-Type'], 'text/event-stream')
+        eventos = []
+        async for parte in respuesta.streaming_content:
+            eventos.append(parte.decode())
+            if len(eventos) == 2:
+                await sync_to_async(publicar_progreso)(self.leccion.pk, ETAPA_COMPLETADO, 100)
+        self.assertTrue(eventos[0].startswith('retry:'))
+        self.assertIn('event: transcodificando', eventos[1])
+        self.assertIn('"porcentaje": 40', eventos[1])
+        self.assertIn('event: completado', eventos[-1])
+
+    async def test_progreso_sse_url_firmada(self):
+        acceso = reverse('modulo-lecciones-progreso-url', kwargs={
+            'curso_pk': self.curso.pk, 'modulo_pk': self.modulo.pk, 'pk': self.leccion.pk
+        })
+
+        def pedir_url(usuario):
+            client = APIClient()
+            client.force_authenticate(usuario)
+            return client.get(acceso)
+
+        otro = await sync_to_async(Usuario.objects.create_user)(
+            username='otro', password='clave', rol=Usuario.ROL_INSTRUCTOR
+        )
+        self.assertEqual((await sync_to_async(pedir_url)(otro)).status_code, 403)
+        datos = (await sync_to_async(pedir_url)(self.instructor)).data
+        self.assertLessEqual(datos['expira'], time.time() + firmas.DURACION_PROGRESO)
+
+        publicar_progreso(self.leccion.pk, ETAPA_COMPLETADO, 100)
+        respuesta = await self.async_client.get(datos['url'])
+        self.assertEqual(respuesta.status_code, 200)
+        eventos = [parte async for parte in respuesta.streaming_content]
+        self.assertIn(b'event: completado', eventos[-1])
+
+        # Solo sirve para esta lección y con la sal del progreso
+        otra = reverse('leccion-progreso', args=[self.leccion.pk + 1])
+        token = datos['url'].partition('?t=')[2]
+        self.assertEqual((await self.async_client.get(otra, {'t': token})).status_code, 401)
+        de_media, _ = firmas.firmar(self.instructor.pk, self.leccion.pk)
+        url = reverse('leccion-progreso', args=[self.leccion.pk])
+        self.assertEqual((await self.async_client.get(url, {'t': de_media})).status_code, 401)
+
+    async def test_progreso_sse_limite_conexiones(self):
+        url = reverse('leccion-progreso', args=[self.leccion.pk])
+        autorizacion = {'Authorization': f'Bearer {AccessToken.for_user(self.instructor)}'}
+        with override_settings(SSE_MAX_CONEXIONES=0):
+            respuesta = await self.async_client.get(url, headers=autorizacion)
+        self.assertEqual(respuesta.status_code, 503)
+        self.assertIn('Retry-After', respuesta)
+
+        # El lugar se libera al terminar el stream o, si nunca se recorre,
+        # al cerrar la respuesta
+        publicar_progreso(self.leccion.pk, ETAPA_COMPLETADO, 100)
+        with override_settings(SSE_MAX_CONEXIONES=1):
+            for _ in range(2):
+                respuesta = await self.async_client.get(url, headers=autorizacion)
+                self.assertEqual(respuesta.status_code, 200)
+                eventos = [parte async for parte in respuesta.streaming_content]
+                self.assertIn(b'event: completado', eventos[-1])
+
+            respuesta = await self.async_client.get(url, headers=autorizacion)
+            self.assertEqual((await self.async_client.get(url, headers=autorizacion)).status_code, 503)
+            respuesta.close()
+            respuesta = await self.async_client.get(url, headers=autorizacion)
+            self.assertEqual(respuesta.status_code, 200)
+            respuesta.close()
+
+
+class VistaPreviaTests(TestCase):
+    """Póster, miniaturas WebP e índice de sprites, sin ffmpeg."""
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+
+    def test_indice_sprites(self):
+        vtt = transcodificacion.indice_sprites({'duracion': 12.5, 'ancho': 1280, 'alto': 720})
+        self.assertEqual(vtt, '\n'.join([
+            'WEBVTT', '',
+            '00:00:00.000 --> 00:00:05.000', 'sprite_001.jpg#xywh=0,0,160,90', '',
+            '00:00:05.000 --> 00:00:10.000', 'sprite_001.jpg#xywh=160,0,160,90', '',
+            '00:00:10.000 --> 00:00:12.500', 'sprite_001.jpg#xywh=320,0,160,90', '',
+        ]))
+
+    def test_indice_sprites_varias_hojas(self):
+        # Alto impar redondeado a par; 10x10 cuadros por hoja
+        lineas = transcodificacion.indice_sprites({'duracion': 3700, 'ancho': 1280, 'alto': 728}).split('\n')
+        cues = [(lineas[i], lineas[i + 1]) for i in range(2, len(lineas), 3)]
+        self.assertEqual(len(cues), 740)
+        self.assertEqual(cues[99], ('00:08:15.000 --> 00:08:20.000', 'sprite_001.jpg#xywh=1440,828,160,92'))
+        self.assertEqual(cues[100], ('00:08:20.000 --> 00:08:25.000', 'sprite_002.jpg#xywh=0,0,160,92'))
+        self.assertEqual(cues[-1], ('01:01:35.000 --> 01:01:40.000', 'sprite_008.jpg#xywh=1440,276,160,92'))
+
+        # Sin duración conocida queda un único cuadro
+        vtt = transcodificacion.indice_sprites({'duracion': 0, 'ancho': 1280, 'alto': 720})
+        self.assertIn('00:00:00.000 --> 00:00:00.001\nsprite_001.jpg#xywh=0,0,160,90', vtt)
+
+    def test_salidas_vista_previa(self):
+        salidas = transcodificacion.salidas_vista_previa(self.directorio, {'duracion': 30, 'ancho': 1920, 'alto': 1080})
+        poster = salidas.index(os.path.join(self.directorio, 'poster.jpg'))
+        self.assertEqual(salidas[:poster], [
+            '-map', '0:v:0', '-vf', 'scale=-2:720', '-ss', '3.000', '-frames:v', '1', '-q:v', '3'
+        ])
+        self.assertIn('fps=1/5,scale=160:90,tile=10x10', salidas)
+        self.assertEqual(salidas[-1], os.path.join(self.directorio, 'sprite_%03d.jpg'))
+        # Póster como mucho a los 10 s
+        salidas = transcodificacion.salidas_vista_previa(self.directorio, {'duracion': 600, 'ancho': 640, 'alto': 360})
+        self.assertIn('10.000', salidas)
+        self.assertIn('scale=-2:360', salidas)
+
+    def test_miniaturas_webp(self):
+        Image.new('RGB', (1280, 720), 'green').save(os.path.join(self.directorio, 'poster.jpg'), 'JPEG')
+        miniaturas = transcodificacion.miniaturas_webp(self.directorio)
+        self.assertEqual(miniaturas, [
+            ('miniatura_320.webp', 320, 180),
+            ('miniatura_640.webp', 640, 360),
+            ('miniatura_1280.webp', 1280, 720),
+        ])
+        for nombre, ancho, alto in miniaturas:
+            with Image.open(os.path.join(self.directorio, nombre)) as imagen:
+                self.assertEqual((imagen.format, imagen.size), ('WEBP', (ancho, alto)))
+
+    def test_miniaturas_de_un_poster_pequeno(self):
+        # Nunca se amplía: un póster más angosto que todos los anchos da una sola miniatura
+        Image.new('RGB', (200, 150), 'green').save(os.path.join(self.directorio, 'poster.jpg'), 'JPEG')
+        self.assertEqual(transcodificacion.miniaturas_webp(self.directorio), [('miniatura_200.webp', 200, 150)])
+
+
+class MediaLeccionTests(MediaTemporalMixin, TestCase):
+    """
+    Entrega de los archivos de la lección: solo con inscripción pagada,
+    con rangos y GET condicionales, y delegada al proxy si está configurado.
+    """
+    ajustes_media = {'MEDIA_ENTREGA': 'python'}
+
+    def setUp(self):
+        super().setUp()
+        self.crear_leccion(
+            precio_usd=10, titulo='Video',
+            estado_procesamiento=Leccion.ESTADO_COMPLETADO, recursos_video={'poster': '-'}
+        )
+        self.alumno = Usuario.objects.create_user(username='alumno', password='clave')
+        self.inscripcion = Inscripcion.objects.create(alumno=self.alumno, curso_id=self.curso.pk, precio_pagado_usd=10)
+
+        directorio = os.path.join(self.media, 'hls', str(self.leccion.pk))
+        os.makedirs(directorio)
+        with open(os.path.join(directorio, '240p_0000.ts'), 'wb') as archivo:
+            archivo.write(bytes(range(100)))
+        with open(os.path.join(directorio, 'master.m3u8'), 'w') as archivo:
+            archivo.write('#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=664000\n240p.m3u8\n')
+        with open(os.path.join(directorio, '240p.m3u8'), 'w') as archivo:
+            archivo.write('#EXTM3U\n#EXTINF:6.0,\n240p_0000.ts\n#EXT-X-ENDLIST\n')
+        self.acceso = reverse('modulo-lecciones-acceso', kwargs={
+            'curso_pk': self.curso.pk, 'modulo_pk': self.modulo.pk, 'pk': self.leccion.pk
+        })
+        self.url = reverse('leccion-media-archivo', args=[self.leccion.pk, '240p_0000.ts'])
+        self.client = APIClient()
+        self.client.force_authenticate(self.alumno)
+
+    def pagar(self):
+        # La caché de accesos se invalida al confirmar la transacción
+        with self.captureOnCommitCallbacks(execute=True):
+            self.inscripcion.estado_pago = Inscripcion.ESTADO_PAGADO
+            self.inscripcion.save(update_fields=['estado_pago'])
+
+    def test_requiere_inscripcion_pagada(self):
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.pagar()
+        respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['Content-Type'], 'video/mp2t')
+        self.assertEqual(b''.join(respuesta.streaming_content), bytes(range(100)))
+
+        # No se puede salir del directorio de la lección
+        otra = reverse('leccion-media-archivo', args=[self.leccion.pk, '../../settings.py'])
+        self.assertEqual(self.client.get(otra).status_code, 404)
+
+    def test_serializers_no_exponen_el_contenido(self):
+        modulo = self.leccion.modulo
+        Curso.objects.filter(pk=modulo.curso_id).update(estado=Curso.ESTADO_PUBLICADO)
+        Leccion.objects.filter(pk=self.leccion.pk).update(
+            archivo='lecciones/clip.mp4', archivo_url='/media/hls/clip/master.m3u8'
+        )
+        detalle = reverse('curso-catalogo-detail', args=[modulo.curso_id])
+        leccion = reverse('modulo-lecciones-detail', kwargs={
+            'curso_pk': modulo.curso_id, 'modulo_pk': modulo.pk, 'pk': self.leccion.pk
+        })
+        for cliente in (APIClient(), self.client):
+            datos = [
+                cliente.get(detalle).json()['modulos'][0]['lecciones'][0],
+                cliente.get(leccion).json(),
+            ]
+            for campos in datos:
+                self.assertEqual(campos['id'], self.leccion.pk)
+                for campo in ('archivo', 'archivo_url', 'recursos_video'):
+                    self.assertNotIn(campo, campos)
+
+        # Las URLs salen solo de 'acceso', con la inscripción pagada
+        self.assertEqual(self.client.get(self.acceso).status_code, 403)
+        self.pagar()
+        self.assertIsNotNone(self.client.get(self.acceso).data['hls'])
+
+    def test_rangos_y_condicionales(self):
+        self.pagar()
+        respuesta = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(respuesta.status_code, 206)
+        self.assertEqual(respuesta['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(b''.join(respuesta.streaming_content), bytes(range(10, 20)))
+
+        respuesta = self.client.get(self.url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(respuesta.streaming_content), bytes(range(95, 100)))
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=200-').status_code, 416)
+
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    @override_settings(MEDIA_ENTREGA='x-accel', MEDIA_ACCEL_PREFIJO='/protegido/')
+    def test_x_accel_redirect(self):
+        self.pagar()
+        respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta['X-Accel-Redirect'], f'/protegido/hls/{self.leccion.pk}/240p_0000.ts')
+        self.assertEqual(respuesta.content, b'')
+
+    def test_urls_firmadas_sin_consultas(self):
+        self.assertEqual(self.client.get(self.acceso).status_code, 403)
+        self.pagar()
+        hls = self.client.get(self.acceso).data['hls']
+
+        # Las peticiones con token no autentican ni consultan la BD
+        anonimo = APIClient()
+        with self.assertNumQueries(0):
+            maestra = anonimo.get(hls)
+        self.assertEqual(maestra.status_code, 200)
+        variante = maestra.content.decode().splitlines()[-1]
+        self.assertTrue(variante.startswith('240p.m3u8?t='))
+
+        with self.assertNumQueries(0):
+            lista = anonimo.get(hls.replace('master.m3u8', variante))
+            segmento = lista.content.decode().splitlines()[2]
+            respuesta = anonimo.get(hls.replace('master.m3u8', segmento))
+        self.assertEqual(b''.join(respuesta.streaming_content), bytes(range(100)))
+
+        # Token alterado o de otra lección
+        self.assertEqual(anonimo.get(hls[:-3] + 'xyz').status_code, 403)
+        otra = hls.replace(f'lecciones/{self.leccion.pk}/', f'lecciones/{self.leccion.pk + 1}/')
+        self.assertEqual(anonimo.get(otra).status_code, 403)
+
+
+class PortadasTests(MediaTemporalMixin, TestCase):
+    """Variantes responsivas de la portada subida (WebP y JPEG con hash)."""
+
+    def setUp(self):
+        super().setUp()
+        self.curso = Curso.objects.create(titulo='Curso', slug='curso', descripcion='-', precio_usd=0)
+
+    def subir(self, ancho, alto, color):
+        salida = BytesIO()
+        Image.new('RGB', (ancho, alto), color).save(salida, 'JPEG')
+        self.curso.portada_original = SimpleUploadedFile('portada.jpg', salida.getvalue(), 'image/jpeg')
+        with mock.patch('cursos.tasks.procesar_portada_task.delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.curso.save()
+        delay.assert_called_once_with(self.curso.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            procesar_portada_task(self.curso.pk)
+        self.curso.refresh_from_db()
+
+    def test_variantes_y_srcset(self):
+        self.subir(1000, 500, 'red')
+        variantes = self.curso.portada_variantes
+        self.assertEqual([v['ancho'] for v in variantes['webp']], [320, 640, 960, 1000])
+        self.assertEqual(variantes['jpg'][0]['alto'], 160)
+        with Image.open(os.path.join(self.media, variantes['webp'][1]['ruta'])) as imagen:
+            self.assertEqual((imagen.format, imagen.size), ('WEBP', (640, 320)))
+
+        tarjeta = CursoListSerializer(self.curso).data['portada_responsiva']
+        self.assertEqual(tarjeta['src'], variantes['jpg'][1]['url'])
+        self.assertEqual(tarjeta['fuentes'][0]['tipo'], 'image/webp')
+        self.assertNotIn(' 1000w', tarjeta['fuentes'][0]['srcset'])
+        self.assertIn(' 1000w', CursoDetailSerializer(self.curso).data['portada_responsiva']['fuentes'][1]['srcset'])
+
+        # Otra imagen: otros nombres (hash del contenido) y las anteriores se borran
+        anteriores = portadas.rutas(variantes)
+        self.subir(400, 200, 'blue')
+        self.assertTrue(anteriores.isdisjoint(portadas.rutas(self.curso.portada_variantes)))
+        self.assertFalse(any(os.path.exists(os.path.join(self.media, r)) for r in anteriores))
+
+
+class ArticulosTests(DatosCursoMixin, TestCase):
+    """Markdown de los artículos renderizado al guardar (saneado, con resaltado e índice)."""
+
+    TEXTO = (
+        "## Introducción\n\nTexto <script>alert(1)</script> [enlace](javascript:alert(1))\n\n"
+        "### Ejemplo\n\n```python\nprint('hola')\n```\n"
+    )
+
+    def test_render_al_guardar(self):
+        leccion = self.crear_leccion(
+            titulo='Artículo', tipo_contenido=Leccion.TIPO_ARTICULO, cuerpo_articulo=self.TEXTO
+        )
+        self.assertIn('<div class="highlight">', leccion.articulo_html)
+        self.assertIn('<h2 id="introduccion">', leccion.articulo_html)
+        self.assertNotIn('<script', leccion.articulo_html)
+        self.assertNotIn('javascript:', leccion.articulo_html)
+        self.assertEqual(leccion.articulo_indice[0]['titulo'], 'Introducción')
+        self.assertEqual(leccion.articulo_indice[0]['hijos'][0]['id'], 'ejemplo')
+
+        # Sin cambios en el Markdown no se vuelve a renderizar
+        with mock.patch('cursos.articulos.renderizar') as renderizar:
+            leccion.titulo = 'Otro título'
+            leccion.save()
+            Leccion.objects.create(
+                modulo=self.modulo, titulo='Copia', orden=2,
+                tipo_contenido=Leccion.TIPO_ARTICULO, cuerpo_articulo=self.TEXTO
+            )
+        renderizar.assert_not_called()
+
+        leccion.cuerpo_articulo = '# Nuevo'
+        leccion.save(update_fields=['cuerpo_articulo'])
+        leccion.refresh_from_db()
+        self.assertEqual(leccion.articulo_html, '<h1 id="nuevo">Nuevo</h1>')
+
+        url = reverse('modulo-lecciones-detail', kwargs={
+            'curso_pk': self.curso.pk, 'modulo_pk': self.modulo.pk, 'pk': leccion.pk
+        })
+        datos = APIClient().get(url, {'formato': 'html'}).data
+        self.assertEqual(datos['articulo_html'], leccion.articulo_html)
+        self.assertNotIn('cuerpo_articulo', datos)
+
+
+class ScormTests(MediaTemporalMixin, TestCase):
+    """Ingesta de paquetes SCORM: extracción segura, manifiesto e índice de archivos."""
+
+    MANIFIESTO = """<?xml version="1.0"?>
+<manifest identifier="m" xmlns="http://www.imsproject.org/xsd/imscp_rootv1p1p2"
+          xmlns:adlcp="http://www.adlnet.org/xsd/adlcp_rootv1p2">
+  <metadata><schema>ADL SCORM</schema><schemaversion>1.2</schemaversion></metadata>
+  <organizations default="org">
+    <organization identifier="org">
+      <title>Curso de prueba</title>
+      <item identifier="i1" identifierref="r1">
+        <title>Inicio</title>
+        <adlcp:masteryscore>80</adlcp:masteryscore>
+      </item>
+    </organization>
+  </organizations>
+  <resources>
+    <resource identifier="r1" type="webcontent" adlcp:scormtype="sco" href="sco/index.html">
+      <file href="sco/index.html"/>
+    </resource>
+  </resources>
+</manifest>"""
+
+    def setUp(self):
+        super().setUp()
+        self.crear_leccion(titulo='SCORM', tipo_contenido=Leccion.TIPO_SCORM)
+
+    def subir_zip(self, archivos):
+        salida = BytesIO()
+        with zipfile.ZipFile(salida, 'w') as paquete:
+            for nombre, contenido in archivos.items():
+                paquete.writestr(nombre, contenido)
+        os.makedirs(os.path.join(self.media, 'lecciones'), exist_ok=True)
+        with open(os.path.join(self.media, 'lecciones', 'paquete.zip'), 'wb') as archivo:
+            archivo.write(salida.getvalue())
+        self.leccion.archivo.name = 'lecciones/paquete.zip'
+        self.leccion.save(update_fields=['archivo'])
+
+    def test_ingesta_y_entrega(self):
+        self.subir_zip({
+            'imsmanifest.xml': self.MANIFIESTO,
+            'sco/index.html': '<html>hola</html>',
+            'sco/copia.html': '<html>hola</html>',
+        })
+        procesar_scorm_task(self.leccion.pk)
+        self.leccion.refresh_from_db()
+        self.assertEqual(self.leccion.estado_procesamiento, Leccion.ESTADO_COMPLETADO)
+
+        paquete = self.leccion.paquete_scorm
+        self.assertEqual((paquete.version, paquete.titulo, paquete.href_inicio), ('1.2', 'Curso de prueba', 'sco/index.html'))
+        self.assertEqual(paquete.puntuacion_minima, 80)
+        self.assertEqual(paquete.num_archivos, 3)
+        # Mismo contenido, un solo objeto
+        huellas = set(paquete.archivos.values_list('huella', flat=True))
+        self.assertEqual(len(huellas), 2)
+
+        url = reverse('modulo-lecciones-acceso', kwargs={
+            'curso_pk': self.curso.pk, 'modulo_pk': self.modulo.pk, 'pk': self.leccion.pk
+        })
+        cliente = APIClient()
+        cliente.force_authenticate(self.instructor)
+        inicio = cliente.get(url).data['scorm']['url']
+        with self.assertNumQueries(1):
+            respuesta = APIClient().get(inicio)
+        self.assertEqual(respuesta['Content-Type'], 'text/html')
+        self.assertEqual(b''.join(respuesta.streaming_content), b'<html>hola</html>')
+        # Los scripts del paquete corren en un origen opaco
+        self.assertIn('sandbox allow-scripts', respuesta['Content-Security-Policy'])
+        self.assertNotIn('allow-same-origin', respuesta['Content-Security-Policy'])
+        self.assertEqual(APIClient().get(inicio.replace('index.html', 'otro.html')).status_code, 404)
+
+    @override_settings(
+        SCORM_ORIGEN='http://scorm.example', ALLOWED_HOSTS=['testserver', 'scorm.example'],
+        SCORM_FRAME_ANCESTORS=['http://app.example']
+    )
+    def test_origen_separado(self):
+        self.subir_zip({'imsmanifest.xml': self.MANIFIESTO, 'sco/index.html': '<html>hola</html>'})
+        procesar_scorm_task(self.leccion.pk)
+        url = reverse('modulo-lecciones-acceso', kwargs={
+            'curso_pk': self.curso.pk, 'modulo_pk': self.modulo.pk, 'pk': self.leccion.pk
+        })
+        cliente = APIClient()
+        cliente.force_authenticate(self.instructor)
+        inicio = cliente.get(url).data['scorm']['url']
+        self.assertTrue(inicio.startswith('http://scorm.example/api/'))
+
+        ruta = inicio.removeprefix('http://scorm.example')
+        respuesta = APIClient().get(ruta)
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertEqual(respuesta['Location'], inicio)
+        respuesta = APIClient().get(ruta, HTTP_HOST='scorm.example')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('frame-ancestors http://app.example', respuesta['Content-Security-Policy'])
+
+    def test_manifiesto_acotado_y_sin_entidades(self):
+        entidades = (
+            '<?xml version="1.0"?><!DOCTYPE manifest [<!ENTITY a "aaaaaaaaaa">'
+            '<!ENTITY b "&a;&a;&a;&a;&a;&a;&a;&a;&a;&a;">]><manifest>&b;</manifest>'
+        )
+        for manifiesto in (entidades, self.MANIFIESTO + ' ' * 1024):
+            with self.subTest(manifiesto=manifiesto[:40]), override_settings(SCORM_MAX_MANIFIESTO=len(self.MANIFIESTO)):
+                self.subir_zip({'imsmanifest.xml': manifiesto, 'sco/index.html': '-'})
+                procesar_scorm_task(self.leccion.pk)
+                self.leccion.refresh_from_db()
+                self.assertEqual(self.leccion.estado_procesamiento, Leccion.ESTADO_ERROR)
+                self.assertFalse(PaqueteScorm.objects.exists())
+
+    def test_rechaza_rutas_fuera_del_paquete(self):
+        self.subir_zip({'imsmanifest.xml': self.MANIFIESTO, 'sco/index.html': '-', '../../fuera.txt': '-'})
+        procesar_scorm_task(self.leccion.pk)
+        self.leccion.refresh_from_db()
+        self.assertEqual(self.leccion.estado_procesamiento, Leccion.ESTADO_ERROR)
+        self.assertFalse(PaqueteScorm.objects.exists())
+        self.assertFalse(os.path.exists(os.path.join(os.path.dirname(self.media), 'fuera.txt')))
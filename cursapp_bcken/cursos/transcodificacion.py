@@ -0,0 +1,326 @@
+"""
+Transcodificación de los videos de las lecciones a HLS adaptativo con ffmpeg.
+
+- ffprobe obtiene duración, resolución y si hay audio.
+- Cada rendición de la escalera (240p/480p/720p, sin superar la resolución
+  original) es un proceso ffmpeg; se ejecutan en paralelo repartiendo los
+  CPUs del worker (TRANSCODIFICACION_CPUS) entre ellos.
+- Los keyframes se fuerzan cada SEGUNDOS_SEGMENTO para que los segmentos de
+  todas las rendiciones queden alineados (cambio de calidad sin saltos).
+- El proceso de la primera rendición también genera, con el mismo decodificado,
+  el póster, las hojas de sprites para la línea de tiempo (índice WebVTT) y,
+  a partir del póster, las miniaturas WebP (Pillow).
+- Todo se escribe en un directorio temporal que reemplaza al definitivo con
+  un rename al final: un reintento nunca deja una escalera a medias publicada.
+"""
+import os
+import json
+import uuid
+import shutil
+import tempfile
+import math
+import subprocess
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from django.conf import settings
+
+# nombre, alto, bitrate de video, bitrate máximo, bitrate de audio (bps)
+RENDICIONES = (
+    ('240p', 240, 400_000, 600_000, 64_000),
+    ('480p', 480, 1_000_000, 1_500_000, 96_000),
+    ('720p', 720, 2_800_000, 4_200_000, 128_000),
+)
+SEGUNDOS_SEGMENTO = 6
+LISTA_MAESTRA = 'master.m3u8'
+CODEC_VIDEO = 'avc1.4d401f' # H.264 Main, nivel 3.1
+CODEC_AUDIO = 'mp4a.40.2' # AAC-LC
+TIMEOUT_PROBE = 120 # segundos
+
+# Imágenes de vista previa (junto a las rendiciones)
+POSTER = 'poster.jpg'
+POSTER_ALTO_MAXIMO = 720
+MINIATURAS_ANCHOS = (320, 640, 1280)
+SPRITE_PATRON = 'sprite_%03d.jpg'
+SPRITE_VTT = 'sprite.vtt'
+SPRITE_INTERVALO = 5 # segundos entre cuadros
+SPRITE_ANCHO = 160
+SPRITE_COLUMNAS = 10
+SPRITE_FILAS = 10
+
+
+class ErrorTranscodificacion(Exception):
+    pass
+
+
+def _ejecutar(comando, timeout=None):
+    try:
+        return subprocess.run(comando, capture_output=True, check=True, timeout=timeout)
+    except subprocess.CalledProcessError as e:
+        detalle = e.stderr.decode('utf-8', 'replace').strip()[-2000:]
+        raise ErrorTranscodificacion(f"{os.path.basename(comando[0])} falló: {detalle}") from e
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise ErrorTranscodificacion(f"No se pudo ejecutar {comando[0]}: {e}") from e
+
+
+def _ejecutar_con_progreso(comando, duracion, al_avanzar):
+    """
+    Ejecuta ffmpeg con '-progress pipe:1' y llama a al_avanzar(fraccion)
+    a medida que avanza el tiempo codificado (out_time_us / duración).
+    """
+    comando = comando[:1] + ['-progress', 'pipe:1', '-nostats'] + comando[1:]
+    with tempfile.TemporaryFile() as errores:
+        try:
+            proceso = subprocess.Popen(comando, stdout=subprocess.PIPE, stderr=errores)
+        except OSError as e:
+            raise ErrorTranscodificacion(f"No se pudo ejecutar {comando[0]}: {e}") from e
+        with proceso:
+            for linea in proceso.stdout:
+                clave, _, valor = linea.decode('ascii', 'replace').strip().partition('=')
+                if clave == 'out_time_us' and valor.isdigit() and duracion > 0:
+                    al_avanzar(int(valor) / 1_000_000 / duracion)
+                elif clave == 'progress' and valor == 'end':
+                    al_avanzar(1.0)
+        if proceso.returncode != 0:
+            errores.seek(0)
+            detalle = errores.read().decode('utf-8', 'replace').strip()[-2000:]
+            raise ErrorTranscodificacion(f"{os.path.basename(comando[0])} falló: {detalle}")
+
+
+def probar_video(ruta):
+    """Devuelve {'duracion' (segundos), 'ancho', 'alto', 'tiene_audio'}."""
+    salida = _ejecutar([
+        settings.FFPROBE_BINARIO, '-v', 'error', '-print_format', 'json',
+        '-show_format', '-show_streams', ruta
+    ], timeout=TIMEOUT_PROBE)
+    datos = json.loads(salida.stdout)
+    video = next((s for s in datos.get('streams', []) if s.get('codec_type') == 'video'), None)
+    if video is None:
+        raise ErrorTranscodificacion("El archivo no contiene una pista de video.")
+    return {
+        'duracion': float(datos.get('format', {}).get('duration') or 0),
+        'ancho': int(video['width']),
+        'alto': int(video['height']),
+        'tiene_audio': any(s.get('codec_type') == 'audio' for s in datos.get('streams', [])),
+    }
+
+
+def escalera(alto_origen):
+    """Rendiciones que no superan la resolución original (al menos la menor)."""
+    return [r for r in RENDICIONES if r[1] <= alto_origen] or [RENDICIONES[0]]
+
+
+def _ancho_escalado(info, alto):
+    ancho = round(info['ancho'] * alto / info['alto'])
+    return ancho + ancho % 2 # H.264 requiere dimensiones pares
+
+
+def _alto_sprite(info):
+    alto = round(SPRITE_ANCHO * info['alto'] / info['ancho'])
+    return alto + alto % 2
+
+
+def salidas_vista_previa(directorio, info):
+    """
+    Salidas extra de ffmpeg para el póster (un cuadro al 10% del video, máx.
+    a los 10 s) y las hojas de sprites (un cuadro cada SPRITE_INTERVALO).
+    """
+    segundo_poster = min(info['duracion'] * 0.1, 10)
+    alto_poster = min(info['alto'], POSTER_ALTO_MAXIMO)
+    return [
+        '-map', '0:v:0', '-vf', f'scale=-2:{alto_poster}',
+        '-ss', f'{segundo_poster:.3f}', '-frames:v', '1', '-q:v', '3',
+        os.path.join(directorio, POSTER),
+        '-map', '0:v:0',
+        '-vf', (
+            f'fps=1/{SPRITE_INTERVALO},scale={SPRITE_ANCHO}:{_alto_sprite(info)},'
+            f'tile={SPRITE_COLUMNAS}x{SPRITE_FILAS}'
+        ),
+        '-q:v', '5',
+        os.path.join(directorio, SPRITE_PATRON),
+    ]
+
+
+def _tiempo_vtt(segundos):
+    milisegundos = round(segundos * 1000)
+    horas, milisegundos = divmod(milisegundos, 3_600_000)
+    minutos, milisegundos = divmod(milisegundos, 60_000)
+    segundos, milisegundos = divmod(milisegundos, 1000)
+    return f'{horas:02d}:{minutos:02d}:{segundos:02d}.{milisegundos:03d}'
+
+
+def indice_sprites(info):
+    """WebVTT que asocia cada intervalo del video con su recorte del sprite."""
+    alto = _alto_sprite(info)
+    por_hoja = SPRITE_COLUMNAS * SPRITE_FILAS
+    lineas = ['WEBVTT', '']
+    for i in range(max(1, math.ceil(info['duracion'] / SPRITE_INTERVALO))):
+        hoja, posicion = divmod(i, por_hoja)
+        fila, columna = divmod(posicion, SPRITE_COLUMNAS)
+        inicio = i * SPRITE_INTERVALO
+        fin = max(min(inicio + SPRITE_INTERVALO, info['duracion']), inicio + 0.001)
+        lineas.append(f'{_tiempo_vtt(inicio)} --> {_tiempo_vtt(fin)}')
+        lineas.append(
+            f'{SPRITE_PATRON % (hoja + 1)}'
+            f'#xywh={columna * SPRITE_ANCHO},{fila * alto},{SPRITE_ANCHO},{alto}'
+        )
+        lineas.append('')
+    return '\n'.join(lineas)
+
+
+def miniaturas_webp(directorio):
+    """Miniaturas WebP del póster. Devuelve [(nombre, ancho, alto)]."""
+    miniaturas = []
+    with Image.open(os.path.join(directorio, POSTER)) as poster:
+        anchos = [a for a in MINIATURAS_ANCHOS if a <= poster.width] or [poster.width]
+        for ancho in anchos:
+            alto = round(poster.height * ancho / poster.width)
+            nombre = f'miniatura_{ancho}.webp'
+            poster.resize((ancho, alto), Image.LANCZOS).save(
+                os.path.join(directorio, nombre), 'WEBP', quality=80, method=4
+            )
+            miniaturas.append((nombre, ancho, alto))
+    return miniaturas
+
+
+def comando_rendicion(origen, directorio, rendicion, info, hilos):
+    nombre, alto, bitrate, maximo, bitrate_audio = rendicion
+    comando = [
+        settings.FFMPEG_BINARIO, '-hide_banner', '-nostdin', '-y', '-v', 'error',
+        '-i', origen,
+        '-map', '0:v:0', '-map', '0:a:0?',
+        '-vf', f'scale=-2:{alto}',
+        '-c:v', 'libx264', '-preset', 'veryfast', '-profile:v', 'main', '-level', '3.1',
+        '-pix_fmt', 'yuv420p',
+        '-b:v', str(bitrate), '-maxrate', str(maximo), '-bufsize', str(maximo * 2),
+        '-force_key_frames', f'expr:gte(t,n_forced*{SEGUNDOS_SEGMENTO})', '-sc_threshold', '0',
+        '-threads', str(hilos),
+    ]
+    if info['tiene_audio']:
+        comando += ['-c:a', 'aac', '-b:a', str(bitrate_audio), '-ac', '2']
+    comando += [
+        '-f', 'hls', '-hls_time', str(SEGUNDOS_SEGMENTO), '-hls_playlist_type', 'vod',
+        '-hls_segment_filename', os.path.join(directorio, f'{nombre}_%04d.ts'),
+        os.path.join(directorio, f'{nombre}.m3u8'),
+    ]
+    return comando
+
+
+def lista_maestra(rendiciones, info):
+    codecs = f'{CODEC_VIDEO},{CODEC_AUDIO}' if info['tiene_audio'] else CODEC_VIDEO
+    lineas = ['#EXTM3U', '#EXT-X-VERSION:3']
+    for nombre, alto, _, maximo, bitrate_audio in rendiciones:
+        ancho_banda = maximo + (bitrate_audio if info['tiene_audio'] else 0)
+        lineas.append(
+            f'#EXT-X-STREAM-INF:BANDWIDTH={ancho_banda},'
+            f'RESOLUTION={_ancho_escalado(info, alto)}x{alto},CODECS="{codecs}"'
+        )
+        lineas.append(f'{nombre}.m3u8')
+    return '\n'.join(lineas) + '\n'
+
+
+def directorio_hls(leccion_id):
+    """Directorio de la escalera HLS de la lección, relativo a MEDIA_ROOT."""
+    return os.path.join(settings.HLS_DIRECTORIO, str(leccion_id))
+
+
+def _ruta_publicada(leccion_id, nombre):
+    return os.path.join(directorio_hls(leccion_id), nombre).replace(os.sep, '/')
+
+
+def _publicar(temporal, final):
+    """Reemplaza el directorio final por el temporal con renames."""
+    viejo = None
+    if os.path.exists(final):
+        viejo = f'{final}.old-{uuid.uuid4().hex}'
+        os.rename(final, viejo)
+    os.rename(temporal, final)
+    if viejo:
+        shutil.rmtree(viejo, ignore_errors=True)
+
+
+def transcodificar(origen, leccion_id, cpus=None, al_iniciar=None, al_avanzar=None):
+    """
+    Genera la escalera HLS de la lección a partir del archivo 'origen', junto
+    con sus imágenes de vista previa. Devuelve {'lista_maestra', 'duracion',
+    'rendiciones', 'vista_previa'} con las rutas relativas a MEDIA_ROOT.
+    'al_iniciar(rendiciones)' se llama antes de codificar y
+    'al_avanzar(indice_rendicion, fraccion)' durante la codificación.
+    """
+    info = probar_video(origen)
+    rendiciones = escalera(info['alto'])
+    if al_iniciar:
+        al_iniciar(rendiciones)
+
+    cpus = max(1, cpus or settings.TRANSCODIFICACION_CPUS)
+    procesos = min(len(rendiciones), cpus)
+    hilos = max(1, cpus // procesos)
+
+    final = os.path.join(settings.MEDIA_ROOT, directorio_hls(leccion_id))
+    temporal = f'{final}.tmp-{uuid.uuid4().hex}'
+    os.makedirs(temporal)
+    try:
+        def codificar(indice):
+            comando = comando_rendicion(origen, temporal, rendiciones[indice], info, hilos)
+            if indice == 0:
+                # Un solo decodificado para la rendición y la vista previa
+                comando += salidas_vista_previa(temporal, info)
+            if al_avanzar is None:
+                _ejecutar(comando)
+            else:
+                _ejecutar_con_progreso(comando, info['duracion'], lambda f: al_avanzar(indice, f))
+
+        with ThreadPoolExecutor(max_workers=procesos) as ejecutor:
+            # list() propaga la primera excepción de cualquier rendición
+            list(ejecutor.map(codificar, range(len(rendiciones))))
+        with open(os.path.join(temporal, LISTA_MAESTRA), 'w') as archivo:
+            archivo.write(lista_maestra(rendiciones, info))
+        with open(os.path.join(temporal, SPRITE_VTT), 'w') as archivo:
+            archivo.write(indice_sprites(info))
+        miniaturas = miniaturas_webp(temporal)
+        _publicar(temporal, final)
+    except BaseException:
+        shutil.rmtree(temporal, ignore_errors=True)
+        raise
+
+    return {
+        'lista_maestra': _ruta_publicada(leccion_id, LISTA_MAESTRA),
+        'duracion': info['duracion'],
+        'rendiciones': [r[0] for r in rendiciones],
+        'vista_previa': {
+            'poster': _ruta_publicada(leccion_id, POSTER),
+            'miniaturas': [
+                {'ruta': _ruta_publicada(leccion_id, nombre), 'ancho': ancho, 'alto': alto}
+                for nombre, ancho, alto in miniaturas
+            ],
+            'sprites': {
+                'vtt': _ruta_publicada(leccion_id, SPRITE_VTT),
+                'intervalo': SPRITE_INTERVALO,
+                'ancho': SPRITE_ANCHO,
+                'alto': _alto_sprite(info),
+            },
+        },
+    }
+
+
+@contextmanager
+def archivo_local(archivo):
+    """
+    Ruta local del archivo subido. Con almacenamientos remotos se descarga
+    por bloques a un archivo temporal.
+    """
+    try:
+        ruta = archivo.path
+    except NotImplementedError:
+        ruta = None
+    if ruta is not None:
+        yield ruta
+        return
+
+    sufijo = os.path.splitext(archivo.name)[1]
+    with tempfile.NamedTemporaryFile(suffix=sufijo) as temporal:
+        with archivo.open('rb') as fuente:
+            for bloque in fuente.chunks():
+                temporal.write(bloque)
+        temporal.flush()
+        yield temporal.name
@@ -1,3 +1,276 @@
-from django.shortcuts import render
+import os
+import json
+import time
+import threading
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404, HttpResponse, HttpResponseForbidden, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils._os import safe_join
+from django.views.decorators.http import require_safe
+from rest_framework import permissions
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from cursos.models import Leccion, ArchivoPaqueteScorm
+from cursos import progreso, entrega, firmas, scorm
+from cursos.transcodificacion import directorio_hls
+from evaluacion import accesos
 
-# Create your views here.
+INTERVALO_LATIDO = 15 # comentario SSE para que proxies no cierren la conexión
+DURACION_MAXIMA = 60 * 30 # el cliente reconecta solo (EventSource) pasado este tiempo
+REINTENTO_MS = 3000
+
+# Estado en la BD -> evento inicial cuando la caché no tiene nada publicado
+EVENTO_POR_ESTADO = {
+    Leccion.ESTADO_PENDIENTE: (progreso.ETAPA_EN_COLA, 0),
+    Leccion.ESTADO_PROCESANDO: (progreso.ETAPA_EN_COLA, 0),
+    Leccion.ESTADO_COMPLETADO: (progreso.ETAPA_COMPLETADO, 100),
+    Leccion.ESTADO_ERROR: (progreso.ETAPA_ERROR, 0),
+}
+
+
+async def _usuario(request, leccion_pk):
+    """
+    Usuario del JWT de la cabecera Authorization o, como EventSource no
+    permite enviar cabeceras, del token firmado de la lección en '?t='
+    (ver 'cursos.firmas'). El JWT nunca se acepta en la URL: quedaría en
+    los logs y en el historial.
+    """
+    tipo, _, valor = request.headers.get('Authorization', '').partition(' ')
+    if valor and tipo in jwt_settings.AUTH_HEADER_TYPES:
+        try:
+            filtro = {jwt_settings.USER_ID_FIELD: AccessToken(valor.strip())[jwt_settings.USER_ID_CLAIM]}
+        except (TokenError, KeyError):
+            return None
+    elif firmas.PARAMETRO in request.GET:
+        try:
+            filtro = {'pk': firmas.verificar(request.GET[firmas.PARAMETRO], leccion_pk, salt=firmas.SALT_PROGRESO)}
+        except firmas.TokenInvalido:
+            return None
+    else:
+        return None
+    try:
+        return await get_user_model().objects.aget(**filtro, is_active=True)
+    except get_user_model().DoesNotExist:
+        return None
+
+
+def _evento(datos):
+    return (
+        f"id: {datos['seq']}\n"
+        f"event: {datos['etapa']}\n"
+        f"data: {json.dumps(datos, ensure_ascii=False)}\n\n"
+    )
+
+
+class _Conexiones:
+    """Streams SSE abiertos en este proceso, con tope SSE_MAX_CONEXIONES."""
+
+    def __init__(self):
+        self.abiertas = 0
+        self.lock = threading.Lock() # response.close() puede llegar desde otro hilo
+
+    def reservar(self):
+        """
+        Ocupa un lugar y devuelve la función que lo libera (liberar dos veces
+        no descuenta de más), o None si no quedan lugares.
+        """
+        with self.lock:
+            if self.abiertas >= settings.SSE_MAX_CONEXIONES:
+                return None
+            self.abiertas += 1
+        liberada = threading.Event()
+
+        def liberar():
+            with self.lock:
+                if not liberada.is_set():
+                    liberada.set()
+                    self.abiertas -= 1
+        return liberar
+
+
+_conexiones = _Conexiones()
+
+
+async def _flujo(leccion_id, estado_inicial, liberar):
+    try:
+        yield f"retry: {REINTENTO_MS}\n\n"
+
+        async with progreso.suscribirse(leccion_id) as suscripcion:
+            ultimo = await suscripcion.estado()
+            if ultimo is None:
+                etapa, porcentaje = EVENTO_POR_ESTADO.get(estado_inicial, (progreso.ETAPA_EN_COLA, 0))
+                ultimo = {'etapa': etapa, 'porcentaje': porcentaje, 'mensaje': '', 'seq': 0}
+            yield _evento(ultimo)
+
+            fin = time.monotonic() + DURACION_MAXIMA
+            while ultimo['etapa'] not in progreso.ETAPAS_FINALES:
+                restante = fin - time.monotonic()
+                if restante <= 0:
+                    return
+                actual = await suscripcion.esperar(min(INTERVALO_LATIDO, restante))
+                if actual:
+                    ultimo = actual
+                    yield _evento(actual)
+                elif restante > INTERVALO_LATIDO:
+                    yield ": latido\n\n"
+    finally:
+        liberar()
+
+
+async def progreso_procesamiento_sse(request, leccion_pk):
+    """
+    Server-Sent Events con el avance del procesamiento del video de una
+    lección (etapa y porcentaje), solo para el instructor del curso.
+    Vista asíncrona: bajo ASGI cada conexión abierta es una corrutina que
+    espera en el event loop, no un hilo/worker bloqueado. Con más de
+    SSE_MAX_CONEXIONES streams abiertos en el proceso responde 503 con
+    'Retry-After' (EventSource no reintenta solo ante un error HTTP).
+    """
+    if request.method != 'GET':
+        return HttpResponse(status=405, headers={'Allow': 'GET'})
+
+    usuario = await _usuario(request, leccion_pk)
+    if usuario is None:
+        return JsonResponse({'detail': 'Credenciales no válidas.'}, status=401)
+
+    lecciones = Leccion.objects.filter(pk=leccion_pk)
+    if not usuario.is_staff:
+        lecciones = lecciones.filter(instructor=usuario)
+    estado = await lecciones.values_list('estado_procesamiento', flat=True).afirst()
+    if estado is None:
+        return JsonResponse({'detail': 'No encontrado.'}, status=404)
+
+    # Sin 'await' entre la reserva y el return: la vista no puede cancelarse
+    # con el lugar ocupado. Lo libera el fin del stream o, si nunca se
+    # recorre, response.close(), que el servidor llama siempre.
+    liberar = _conexiones.reservar()
+    if liberar is None:
+        return JsonResponse(
+            {'detail': 'Demasiadas conexiones abiertas.'}, status=503,
+            headers={'Retry-After': str(REINTENTO_MS // 1000)}
+        )
+    respuesta = StreamingHttpResponse(_flujo(leccion_pk, estado, liberar), content_type='text/event-stream')
+    respuesta._resource_closers.append(liberar)
+    respuesta['Cache-Control'] = 'no-cache'
+    respuesta['X-Accel-Buffering'] = 'no' # Nginx: no acumular el stream
+    return respuesta
+
+
+class MediaLeccionView(APIView):
+    """
+    Entrega el archivo de una lección ('media/') o los archivos de su escalera
+    HLS y vista previa ('media/<ruta>') solo al instructor del curso, al staff
+    y a los alumnos con la inscripción pagada.
+    - Con '?t=<token>' (ver 'cursos.firmas') el acceso se valida solo con la
+      firma: sin autenticar ni consultar la inscripción en la BD.
+    - Las listas .m3u8 y el índice .vtt se devuelven reescritos para que cada
+      URL lleve el token (si la petición no traía uno, se emite).
+    El archivo lo envía el proxy (X-Accel-Redirect / X-Sendfile) o, sin
+    proxy, Django con soporte de rangos (ver 'cursos.entrega').
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    REESCRITURAS = {'.m3u8': firmas.reescribir_lista, '.vtt': firmas.reescribir_vtt}
+
+    def con_token(self, request):
+        return firmas.PARAMETRO in request.query_params
+
+    def perform_authentication(self, request):
+        if not self.con_token(request):
+            super().perform_authentication(request)
+
+    def get_permissions(self):
+        if self.con_token(self.request):
+            return []
+        return super().get_permissions()
+
+    def get(self, request, leccion_pk, ruta=None):
+        leccion = None
+        token = request.query_params.get(firmas.PARAMETRO)
+        if token is not None:
+            try:
+                firmas.verificar(token, leccion_pk)
+            except firmas.TokenInvalido as e:
+                raise PermissionDenied(str(e))
+        else:
+            leccion = get_object_or_404(Leccion, pk=leccion_pk)
+            if not accesos.tiene_acceso(request.user, leccion.curso_id, leccion.instructor_id):
+                # 404 y no 403: no se revela qué lecciones tienen archivos
+                raise Http404
+
+        if ruta is None:
+            if leccion is None:
+                leccion = get_object_or_404(Leccion.objects.only('archivo'), pk=leccion_pk)
+            if not leccion.archivo:
+                raise Http404
+            try:
+                absoluta = leccion.archivo.path
+            except NotImplementedError:
+                # Almacenamiento remoto: el propio almacenamiento entrega el archivo
+                return HttpResponseRedirect(leccion.archivo.url)
+        else:
+            # Solo dentro del directorio HLS de esta lección (sin '..' hacia otras)
+            try:
+                absoluta = safe_join(os.path.join(settings.MEDIA_ROOT, directorio_hls(leccion_pk)), ruta)
+            except SuspiciousFileOperation:
+                raise Http404
+
+        if not os.path.isfile(absoluta):
+            raise Http404
+
+        reescribir = self.REESCRITURAS.get(os.path.splitext(absoluta)[1].lower())
+        if reescribir is not None:
+            if token is None:
+                token, _ = firmas.firmar(request.user.pk, leccion_pk)
+            with open(absoluta, encoding='utf-8') as archivo:
+                contenido = reescribir(archivo.read(), token)
+            respuesta = HttpResponse(contenido, content_type=entrega.tipo_contenido(absoluta))
+            respuesta['Cache-Control'] = 'private, no-store' # Lleva el token del usuario
+            return respuesta
+        return entrega.entregar_archivo(request, absoluta, os.path.relpath(absoluta, settings.MEDIA_ROOT))
+
+
+def _politica_scorm():
+    """
+    CSP de los archivos SCORM: 'sandbox' sin 'allow-same-origin' ejecuta los
+    scripts del paquete en un origen opaco (sin cookies ni almacenamiento del
+    dominio) y 'frame-ancestors' limita qué páginas pueden incrustarlo
+    (los navegadores la aplican en lugar de X-Frame-Options).
+    """
+    ancestros = ' '.join(settings.SCORM_FRAME_ANCESTORS) or "'none'"
+    return f"sandbox allow-scripts allow-forms allow-popups; frame-ancestors {ancestros}"
+
+
+@require_safe
+def archivo_scorm(request, leccion_pk, token, ruta):
+    """
+    Archivos del paquete SCORM de la lección. El token firmado va en la ruta
+    (no en '?t='), así las URLs relativas dentro del paquete lo conservan.
+    Se valida con la firma y se resuelve con una consulta al índice.
+    El paquete es HTML y JavaScript subido por el instructor: con SCORM_ORIGEN
+    solo se sirve desde ese origen (sin las cookies de la API) y siempre con
+    la política de '_politica_scorm'.
+    """
+    if settings.SCORM_ORIGEN and request.get_host() != urlsplit(settings.SCORM_ORIGEN).netloc:
+        return HttpResponseRedirect(settings.SCORM_ORIGEN.rstrip('/') + request.get_full_path())
+    try:
+        firmas.verificar(token, leccion_pk)
+    except firmas.TokenInvalido as e:
+        return HttpResponseForbidden(str(e))
+
+    ruta = scorm.ruta_segura(ruta)
+    huella = ArchivoPaqueteScorm.objects.filter(paquete_id=leccion_pk, ruta=ruta).values_list('huella', flat=True).first()
+    if huella is None:
+        raise Http404
+    nombre = scorm.ruta_objeto(huella)
+    absoluta = os.path.join(settings.MEDIA_ROOT, nombre)
+    if not os.path.isfile(absoluta):
+        raise Http404
+    respuesta = entrega.entregar_archivo(request, absoluta, nombre, tipo=entrega.tipo_contenido(ruta))
+    respuesta['Content-Security-Policy'] = _politica_scorm()
+    return respuesta
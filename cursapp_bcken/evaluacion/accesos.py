@@ -0,0 +1,76 @@
+"""
+Caché de accesos: los cursos pagados de cada usuario.
+
+Los permisos ("¿está inscrito y pagó este curso?") se resuelven contra un
+diccionario {curso_id: inscripcion_id} por usuario, cargado con una sola
+consulta y guardado en la caché compartida. Con la caché caliente un chequeo
+de acceso no toca la BD.
+
+Igual que los snapshots de cursos, el diccionario se guarda bajo
+(usuario, versión): invalidar es subir la versión al confirmar la
+transacción, así un request concurrente que cargó datos viejos los guarda
+bajo una versión que ya nadie lee. Las señales de Inscripcion invalidan en
+cada alta, cambio de estado de pago o baja (incluido el webhook de pagos).
+"""
+import time
+from django.core.cache import cache
+from django.db import transaction
+from evaluacion.models import Inscripcion
+
+VERSION_KEY = "accesos:{}:version"
+CURSOS_KEY = "accesos:{}:cursos:v{}"
+CURSOS_TIMEOUT = 60 * 60 * 24 # 24 horas
+
+
+def _nueva_version():
+    return time.time_ns()
+
+
+def _version(usuario_id):
+    clave = VERSION_KEY.format(usuario_id)
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, _nueva_version(), None)
+        version = cache.get(clave)
+    return version
+
+
+def cursos_pagados(usuario_id):
+    """{curso_id: inscripcion_id} de las inscripciones pagadas del usuario."""
+    version = _version(usuario_id)
+    clave = CURSOS_KEY.format(usuario_id, version)
+    cursos = cache.get(clave)
+    if cursos is None:
+        cursos = dict(Inscripcion.objects.filter(
+            alumno_id=usuario_id, estado_pago=Inscripcion.ESTADO_PAGADO
+        ).values_list('curso_id', 'pk'))
+        cache.set(clave, cursos, CURSOS_TIMEOUT)
+    return cursos
+
+
+def inscripcion_pagada(usuario, curso_id):
+    """Id de la inscripción pagada del usuario en el curso, o None."""
+    if not usuario.is_authenticated:
+        return None
+    return cursos_pagados(usuario.pk).get(curso_id)
+
+
+def esta_inscrito(usuario, curso_id):
+    return inscripcion_pagada(usuario, curso_id) is not None
+
+
+def tiene_acceso(usuario, curso_id, instructor_id=None):
+    """Instructor del curso, staff o alumno con la inscripción pagada."""
+    if usuario.is_staff or (instructor_id is not None and instructor_id == usuario.pk):
+        return True
+    return esta_inscrito(usuario, curso_id)
+
+
+def invalidar(usuario_ids):
+    """Sube la versión de los usuarios al confirmar la transacción actual."""
+    usuario_ids = {usuario_id for usuario_id in usuario_ids if usuario_id is not None}
+    if usuario_ids:
+        transaction.on_commit(lambda: cache.set_many(
+            {VERSION_KEY.format(usuario_id): _nueva_version() for usuario_id in usuario_ids},
+            None
+        ))
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from .models import (
     Inscripcion, Transaccion, Resena, Cuestionario, Pregunta,
-    ProgresoLeccion, Certificado, Insignia, PuntosAlumno
+    ProgresoLeccion, Certificado, Insignia, PuntosAlumno, TasaCambio
 )
 
 @admin.register(Inscripcion)
@@ -15,14 +15,35 @@ class InscripcionAdmin(admin.ModelAdmin):
         'curso',
         'estado_pago',
         'precio_pagado_usd',
+        'monto_pagado_ves',
+        'tasa_cambio',
         'fecha_inscripcion'
     )
     list_filter = ('estado_pago', 'curso')
     search_fields = ('alumno__username', 'curso__titulo', 'referencia_pago')
     list_editable = ('estado_pago',) # Permite editar el estado desde la DB, cambiar luego!!
-    readonly_fields = ('fecha_inscripcion',)
+    list_select_related = ('alumno', 'curso', 'tasa_cambio')
+    readonly_fields = ('fecha_inscripcion', 'tasa_cambio', 'monto_pagado_ves')
     autocomplete_fields = ('alumno', 'curso') # Optimiza la búsqueda
     
+@admin.register(TasaCambio)
+class TasaCambioAdmin(admin.ModelAdmin):
+    """
+    Historial de tasas BCV (solo lectura): lo alimenta la tarea de refresco.
+    """
+    list_display = ('fecha_obtenida', 'tasa', 'fuente')
+    date_hierarchy = 'fecha_obtenida'
+    readonly_fields = ('tasa', 'fuente', 'fecha_obtenida')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+    
 @admin.register(Transaccion)
 class TransaccionAdmin(admin.ModelAdmin):
     """
@@ -1,8 +1,10 @@
+from django.conf import settings
 from rest_framework import serializers
 from evaluacion.models import Inscripcion, ProgresoLeccion, Resena, InteraccionLeccion
 from core.api.serializers import PerfilUsuarioSerializer
 from cursos.api.serializers import CursoListSerializer
 from core.models import Usuario
+from evaluacion import accesos, latidos
 
 class InscripcionSerializer(serializers.ModelSerializer):
     """
@@ -14,10 +16,13 @@ class InscripcionSerializer(serializers.ModelSerializer):
         model = Inscripcion
         fields = (
             'id', 'curso', 'curso_titulo', 'alumno',
-            'precio_pagado_usd', 'estado_pago', 'referencia_pago',
-            'fecha_inscripcion'
+            'precio_pagado_usd', 'monto_pagado_ves', 'tasa_cambio',
+            'estado_pago', 'referencia_pago', 'fecha_inscripcion'
+        )
+        read_only_fields = (
+            'alumno', 'precio_pagado_usd', 'monto_pagado_ves', 'tasa_cambio',
+            'estado_pago', 'referencia_pago'
         )
-        read_only_fields = ('alumno', 'precio_pagado_usd', 'estado_pago', 'referencia_pago')
         
 class InscripcionCrearSerializer(serializers.ModelSerializer):
     """
@@ -54,8 +59,16 @@ class ScormProgresoSerializer(serializers.ModelSerializer):
     """
     Serializer específico para la comunicación SCORM.
     Maneja los campos CMI (Computer-Managed Instruction) que guardamos
-    en el modelo ProgresoLeccion
+    en el modelo ProgresoLeccion (suspend_data, comprimido en EstadoCmi).
+    Un commit que no cambia nada no escribe en la BD.
     """
+    suspend_data = serializers.CharField(
+        required=False,
+        allow_blank=True,
+        allow_null=True,
+        max_length=settings.SCORM_SUSPEND_DATA_MAXIMO
+    )
+    
     class Meta:
         model = ProgresoLeccion
         
@@ -70,6 +83,34 @@ class ScormProgresoSerializer(serializers.ModelSerializer):
             'completado'
         )
         read_only_fields = ('id', 'leccion')
+    
+    def update(self, instance, validated_data):
+        if 'suspend_data' in validated_data:
+            instance.suspend_data = validated_data.pop('suspend_data')
+        # Campos que cambian respecto a la BD (incluido el estado diferido aún sin volcar)
+        cambios = set(getattr(instance, '_campos_pendientes', ()))
+        for campo, valor in validated_data.items():
+            if getattr(instance, campo) != valor:
+                setattr(instance, campo, valor)
+                cambios.add(campo)
+        if cambios:
+            instance.save(update_fields=sorted(cambios))
+        # Solo si llegó en el commit o estaba pendiente (el de la BD no se lee)
+        if '_suspend_data' in instance.__dict__:
+            instance.guardar_suspend_data(instance.suspend_data)
+        return instance
+        
+class LatidoSerializer(serializers.Serializer):
+    """
+    Latido del reproductor (ver evaluacion/latidos.py).
+    'sesion' identifica la reproducción y 'seq' numera sus latidos.
+    """
+    sesion = serializers.CharField(max_length=64)
+    seq = serializers.IntegerField(min_value=0)
+    segundos = serializers.IntegerField(min_value=0, max_value=latidos.SEGUNDOS_MAXIMO)
+    porcentaje_visto = serializers.DecimalField(
+        max_digits=5, decimal_places=2, min_value=0, max_value=100, required=False
+    )
         
 class ResenaSerializer(serializers.ModelSerializer):
     """
@@ -111,7 +152,7 @@ class ResenaSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Contexto de request no disponible.")
         if inscripcion.alumno != request.user:
             raise serializers.ValidationError("No puedes dejar una reseña para una inscripción que no te pertenece.")
-        if inscripcion.estado_pago != Inscripcion.ESTADO_PAGADO:
+        if not accesos.esta_inscrito(request.user, inscripcion.curso_id):
             raise serializers.ValidationError("Solo puedes dejar reseñas de cursos que hayas pagado.")
         if Resena.objects.filter(inscripcion=inscripcion).exists():
             raise serializers.ValidationError("Ya has enviado una reseña para este curso.")
@@ -4,6 +4,7 @@ from .viewsets import (
     InscripcionViewSet, 
     LeaderboardAPIView, 
     ScormProgresoAPIView, 
+    LatidoAPIView,
     InstructorDashboardAPIView,
     MiAprendizajeViewSet,
     PagoWebhookAPIView,
@@ -22,6 +23,9 @@ urlpatterns = router.urls + [
     # Endpoint para SCORM: api/v1/evaluacion/scorm/commit/<id_de_leccion>/
     path('scorm/commit/<int:leccion_pk>/', ScormProgresoAPIView.as_view(), name='scorm-commit'),
     
+    # Latidos del reproductor (tiempo dedicado y porcentaje visto)
+    path('latido/<int:leccion_pk>/', LatidoAPIView.as_view(), name='latido'),
+    
     # Endpoint para el Dashboard del Instructor
     path('instructor/dashboard/', InstructorDashboardAPIView.as_view(), name='instructor-dashboard'),
     
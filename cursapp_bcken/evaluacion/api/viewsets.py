@@ -2,19 +2,23 @@ from rest_framework import viewsets, permissions, status, generics
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.exceptions import PermissionDenied, ValidationError
-from django.db.models import Sum, F, Q, DecimalField
+from django.db.models import Sum, Count, F, Q, DecimalField
 from django.views.decorators.csrf import csrf_exempt
 from decimal import Decimal
 from django.shortcuts import get_object_or_404
+from django.http import Http404
 from evaluacion.models import Inscripcion, PuntosAlumno, ProgresoLeccion, Resena, Transaccion, InteraccionLeccion
 from cursos.models import Curso, Leccion, Cupon
 from core.models import Usuario
-from utils.monetizacion import obtener_tasa_bcv
+from utils.monetizacion import obtener_tasa_vigente
+from utils.paginacion import PaginacionHibrida
+from evaluacion import cmi, accesos, latidos
 from .serializers import (
     InscripcionSerializer, 
     InscripcionCrearSerializer, 
     LeaderboardSerializer,
     ScormProgresoSerializer,
+    LatidoSerializer,
     ResenaSerializer,
     MiAprendizajeSerializer,
     UltimaLeccionSerializer
@@ -100,12 +104,20 @@ class InscripcionViewSet(viewsets.ModelViewSet):
                 # Captura cualquier otra validación
                 return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
+        # Obtener la tasa del BCV vigente (None si aún no hay ninguna tasa conocida).
+        # La tasa y el monto en VES quedan registrados en la inscripción.
+        tasa_vigente = obtener_tasa_vigente()
+        tasa_bcv = tasa_vigente['tasa'] if tasa_vigente else None
+        monto_ves = round(precio_final * tasa_bcv, 2) if tasa_bcv is not None else None
+        
         # Creación de la Inscripción Pendiente
         inscripcion = Inscripcion.objects.create(
             alumno=alumno,
             curso=curso,
             precio_pagado_usd=precio_final,
-            estado_pago=Inscripcion.ESTADO_PENDIENTE
+            estado_pago=Inscripcion.ESTADO_PENDIENTE,
+            tasa_cambio_id=tasa_vigente['id'] if tasa_vigente else None,
+            monto_pagado_ves=monto_ves
         )
         
         # Incrementar uso del cupón (si se usó)
@@ -113,10 +125,6 @@ class InscripcionViewSet(viewsets.ModelViewSet):
             cupon_aplicado.usos_actuales += 1
             cupon_aplicado.save(update_fields=['usos_actuales'])
         
-        # Obtener la tasa del BCV y preparar la respuesta de pago
-        tasa_bcv = obtener_tasa_bcv()
-        monto_ves = curso.precio_usd * tasa_bcv
-        
         
         # Preparación para la Pasarela de Pago
         # Aquí se integraría la lógica para generar una URL de pago, o una factura.
@@ -131,8 +139,8 @@ class InscripcionViewSet(viewsets.ModelViewSet):
                     "precio_original_usd": str(curso.precio_usd),
                     "precio_final_usd": str(round(precio_final, 2)), # Precio con descuento (Si aplica)
                     "cupon_aplicado": codigo_cupon if cupon_aplicado else None,
-                    "tasa_bcv": str(tasa_bcv),
-                    "monto_ves": str(round(monto_ves, 2)),
+                    "tasa_bcv": str(tasa_bcv) if tasa_bcv is not None else None,
+                    "monto_ves": str(monto_ves) if monto_ves is not None else None,
                     "metodos": ["Pago Movil", "Transferencia", "TDC/TDD"],
                     "referencia_pago": inscripcion.id
                 }
@@ -149,59 +157,85 @@ class LeaderboardAPIView(generics.ListAPIView):
     # Permitir que el Leaderboard sea visible públicamente para fomentar la competencia
     permission_classes = [permissions.AllowAny]
     
+    # ?paginacion=cursor para scroll infinito sin OFFSET ni COUNT
+    pagination_class = PaginacionHibrida
+    cursor_ordering = ('-xp_totales', 'id')
+    
     def get_queryset(self):
         # Ordena los usuarios por el campo 'xp_totales'
         # Esto siempre será instantaneo, incluso con miles de usuarios.
         return Usuario.objects.filter(
             rol=Usuario.ROL_ALUMNO,
             xp_totales__gt=0
-        ).order_by('-xp_totales')
+        ).order_by('-xp_totales', 'id')
         
 class ScormProgresoAPIView(generics.RetrieveUpdateAPIView):
     """
     API Endpoint para la comunicación SCORM (LMSInitialize y LMSCommit).
     
     - GET (LMSInitialize):
-      Recupera el estado actual del progreso SCORM (suspend_data, estado, puntuacion).
+      Recupera el estado actual del progreso SCORM (suspend_data, estado, puntuacion),
+      incluido el que aún espera en el buffer de commits diferidos.
       
     - PUT/PATCH (LMSCommit):
       Guarda (Commitea) el nuevo estado SCORM enviado desde el player de Vue.js.
+      Con '?modo=diferido' solo se guarda en la caché (202) y se vuelca a la BD
+      por lotes (ver evaluacion/cmi.py); las finalizaciones se guardan al momento.
     """
     serializer_class = ScormProgresoSerializer
     permission_classes = [permissions.IsAuthenticated] # Solo alumnos autenticados
     lookup_field = 'leccion_pk' # Usaremos el ID del la lección desde la URL
     
-    def get_object(self):
-        # Identificar al usuario y la lección
+    def get_inscripcion_id(self):
+        """
+        Valida rol, tipo de lección e inscripción pagada. Con la caché
+        caliente (lección y accesos) no consulta la BD.
+        """
         user = self.request.user
         leccion_id = self.kwargs.get('leccion_pk')
-        leccion = get_object_or_404(Leccion, pk=leccion_id)
+        datos = cmi.datos_leccion(leccion_id)
+        if datos is None:
+            raise Http404
+        curso_id, tipo_contenido = datos
         
         # Validar Roles y Tipo de Contenido
         if not user.es_alumno:
             raise PermissionDenied("Solo los alumnos pueden reportar progreso SCORM.")
         
-        if leccion.tipo_contenido != Leccion.TIPO_SCORM:
+        if tipo_contenido != Leccion.TIPO_SCORM:
             raise PermissionDenied("Esta lección no es de tipo SCORM.")
         
         # Validar Inscripción
         # Asegura que el alumno esté inscrito y haya pagado el curso.
-        try: 
-            inscripcion = Inscripcion.objects.get(
-                alumno=user,
-                curso=leccion.modulo.curso,
-                estado_pago=Inscripcion.ESTADO_PAGADO
-            )
-        except Inscripcion.DoesNotExist:
+        inscripcion_id = accesos.inscripcion_pagada(user, curso_id)
+        if inscripcion_id is None:
             raise PermissionDenied("No estás inscrito en este curso o tu pago aún está pendiente.")
+        return inscripcion_id
+    
+    def get_object(self):
+        inscripcion_id = self.get_inscripcion_id()
+        leccion_id = self.kwargs.get('leccion_pk')
         
         # Obtener (o Crear si es la primera vez) el registro de progreso
         # Esto permite que la primera llamada GET (LMSInitialize) funcione
-        progreso, created = ProgresoLeccion.objects.get_or_create(
-            inscripcion=inscripcion,
-            leccion=leccion
+        progresos = ProgresoLeccion.objects.select_related('estado_cmi')
+        if self.request.method not in permissions.SAFE_METHODS:
+            # El commit solo compara el hash: el texto comprimido no se lee
+            progresos = progresos.defer('estado_cmi__suspend_data_comprimido')
+        progreso, created = progresos.get_or_create(
+            inscripcion_id=inscripcion_id,
+            leccion_id=leccion_id
         )
         
+        # Estado de commits diferidos que aún no llegó a la BD
+        progreso._campos_pendientes = set()
+        for campo, valor in cmi.pendiente(inscripcion_id, leccion_id).items():
+            if campo == 'suspend_data': # Se compara por hash al guardar (sin leer el texto)
+                progreso.suspend_data = valor
+            elif getattr(progreso, campo) != valor:
+                setattr(progreso, campo, valor)
+                progreso._campos_pendientes.add(campo)
+        
         if created:
             # Si es la primera vez, el punto de entrada es 'ab-initio' (desde el inicio)
             progreso.entry_point = 'ab-initio'
@@ -211,6 +245,62 @@ class ScormProgresoAPIView(generics.RetrieveUpdateAPIView):
             
         return progreso
     
+    def perform_update(self, serializer):
+        progreso = serializer.save()
+        cmi.confirmar(progreso)
+    
+    def update(self, request, *args, **kwargs):
+        if request.query_params.get('modo') != cmi.MODO_DIFERIDO:
+            return super().update(request, *args, **kwargs)
+        
+        inscripcion_id = self.get_inscripcion_id()
+        leccion_id = self.kwargs.get('leccion_pk')
+        serializer = self.get_serializer(data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        cambios = {
+            campo: valor for campo, valor in serializer.validated_data.items() if campo in cmi.CAMPOS
+        }
+        
+        # Completar, aprobar o suspender se guarda al momento (XP, certificados...)
+        if cmi.es_transicion(inscripcion_id, leccion_id, cambios):
+            kwargs['partial'] = True
+            return super().update(request, *args, **kwargs)
+        
+        estado = cmi.diferir(inscripcion_id, leccion_id, cambios)
+        datos = {'leccion': leccion_id}
+        for campo, valor in estado.items():
+            datos[campo] = serializer.fields[campo].to_representation(valor) if valor is not None else None
+        return Response(datos, status=status.HTTP_202_ACCEPTED)
+    
+class LatidoAPIView(APIView):
+    """
+    Latido del reproductor: tiempo dedicado y porcentaje visto de la lección.
+    
+    Solo acumula en la caché (202); la tarea 'volcar_latidos_task' lo escribe
+    en la BD por lotes. Los latidos repetidos o fuera de orden se aceptan sin
+    contar dos veces (ver evaluacion/latidos.py).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request, leccion_pk):
+        datos = cmi.datos_leccion(leccion_pk)
+        if datos is None:
+            raise Http404
+        if not request.user.es_alumno:
+            raise PermissionDenied("Solo los alumnos pueden reportar progreso.")
+        inscripcion_id = accesos.inscripcion_pagada(request.user, datos[0])
+        if inscripcion_id is None:
+            raise PermissionDenied("No estás inscrito en este curso o tu pago aún está pendiente.")
+        
+        serializer = LatidoSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        latido = serializer.validated_data
+        nuevo = latidos.registrar(
+            inscripcion_id, leccion_pk, latido['sesion'], latido['seq'],
+            latido['segundos'], latido.get('porcentaje_visto')
+        )
+        return Response({'seq': latido['seq'], 'duplicado': not nuevo}, status=status.HTTP_202_ACCEPTED)
+    
 class ResenaViewSet(viewsets.ModelViewSet):
     """
     API para gestionar Reseñas.
@@ -221,11 +311,15 @@ class ResenaViewSet(viewsets.ModelViewSet):
     serializer_class = ResenaSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOfResenaOrReadOnly]
     
+    # ?paginacion=cursor para scroll infinito sin OFFSET ni COUNT
+    pagination_class = PaginacionHibrida
+    cursor_ordering = ('-fecha_creacion', 'id')
+    
     def get_queryset(self):
         # Filtra las reseñas basadas en el curso_pk de la URL
         curso_pk = self.kwargs.get('curso_pk')
         if curso_pk:
-            return Resena.objects.filter(inscripcion__curso_id=curso_pk).order_by('-fecha_creacion')
+            return Resena.objects.filter(inscripcion__curso_id=curso_pk).order_by('-fecha_creacion', 'id')
         return Resena.objects.none() # No mostrar todas las reseñas globalmente
     
     def perform_create(self, serializer):
@@ -262,18 +356,23 @@ class InstructorDashboardAPIView(generics.GenericAPIView):
             )
         )
         
-        # Calcular total de inscripciones pagadas
-        total_inscripciones = Inscripcion.objects.filter(
+        # Calcular total de inscripciones pagadas y su monto en VES
+        # (con la tasa registrada en cada inscripción, no con la tasa en vivo)
+        ventas = Inscripcion.objects.filter(
             curso__instructor=user,
             estado_pago=Inscripcion.ESTADO_PAGADO
-        ).count()
+        ).aggregate(
+            total=Count('id'),
+            ventas_totales_ves=Sum('monto_pagado_ves')
+        )
         
         # Calcular total de reseñas
         total_resenas = Resena.objects.filter(inscripcion__curso__instructor=user).count()
         
         return Response({
-            'total_inscripciones': total_inscripciones,
+            'total_inscripciones': ventas['total'],
             'total_resenas': total_resenas,
+            'ventas_totales_ves': ventas['ventas_totales_ves'] or 0.00,
             'ganancias_totales_usd': analiticas.get('ganancias_totales_usd') or 0.00,
             'ganancias_pendientes_usd': analiticas.get('ganancias_pendientes_usd') or 0.00,
             'ganancias_pagadas_usd': analiticas.get('ganancias_pagadas_usd') or 0.00,
@@ -0,0 +1,109 @@
+"""
+Avance de cada inscripción en su curso (Inscripcion.porcentaje_progreso).
+
+- 'lecciones_completadas' cuenta los ProgresoLeccion completados. Cuando una
+  lección pasa a completada (o deja de estarlo) la inscripción se actualiza
+  con un único UPDATE con F(): no se cuentan filas.
+- El porcentaje se calcula contra 'Curso.num_lecciones' (contador mantenido
+  por las señales de cursos).
+- Si cambia el contenido del curso (lecciones nuevas, borradas o movidas) la
+  tarea 'recalcular_avance_task' reconstruye contadores y porcentajes de todas
+  sus inscripciones con UPDATEs con subconsultas.
+- Al llegar al 100% la inscripción se marca completada y se emite su certificado.
+"""
+import logging
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Count, OuterRef, Subquery, Value, IntegerField, FloatField
+from django.db.models.functions import Cast, Coalesce, Greatest, Least, NullIf
+from cursos.models import Curso
+from evaluacion.models import Inscripcion, ProgresoLeccion, Certificado
+
+logger = logging.getLogger(__name__)
+
+RECALCULO_KEY = "avance:recalculo:{}"
+RECALCULO_ESPERA = 10 # Segundos: agrupa los cambios seguidos del mismo curso
+RECALCULO_TIMEOUT = 60 * 10
+
+
+def _porcentaje(completadas):
+    """Expresión SQL: completadas * 100 / Curso.num_lecciones, entre 0 y 100."""
+    total = Subquery(
+        Curso.objects.filter(pk=OuterRef('curso_id')).values('num_lecciones')[:1],
+        output_field=IntegerField()
+    )
+    # En coma flotante: en SQLite un CAST a NUMERIC de un entero sigue siendo entero.
+    # La columna (DECIMAL 5,2) redondea el resultado.
+    porcentaje = Cast(completadas, FloatField()) * Value(100.0) / NullIf(total, 0)
+    return Coalesce(Least(porcentaje, Value(100.0)), Value(0.0), output_field=FloatField())
+
+
+def _completar(inscripciones):
+    """Marca completadas las inscripciones que llegaron al 100% y emite sus certificados."""
+    nuevas = list(
+        inscripciones.filter(completado=False, porcentaje_progreso__gte=100).values_list('pk', flat=True)
+    )
+    if nuevas:
+        Inscripcion.objects.filter(pk__in=nuevas, completado=False).update(completado=True)
+        Certificado.objects.bulk_create(
+            [Certificado(inscripcion_id=pk) for pk in nuevas], ignore_conflicts=True
+        )
+    return nuevas
+
+
+def ajustar_avance(inscripcion_id, delta):
+    """
+    Suma (o resta) lecciones completadas a la inscripción y actualiza su
+    porcentaje en el mismo UPDATE. Devuelve True si el curso quedó completado.
+    """
+    if delta > 0:
+        completadas = F('lecciones_completadas') + delta
+    else:
+        completadas = Greatest(F('lecciones_completadas') + delta, 0)
+    inscripciones = Inscripcion.objects.filter(pk=inscripcion_id)
+    # En el SET las columnas tienen el valor anterior: el porcentaje usa la misma expresión
+    inscripciones.update(lecciones_completadas=completadas, porcentaje_progreso=_porcentaje(completadas))
+    return bool(delta > 0 and _completar(inscripciones))
+
+
+def recalcular_avance(curso_ids=None):
+    """
+    Recalcula desde cero el avance de las inscripciones de los cursos dados
+    (o de todas). Una inscripción completada sigue completada.
+    """
+    inscripciones = Inscripcion.objects.all()
+    if curso_ids is not None:
+        inscripciones = inscripciones.filter(curso_id__in=list(curso_ids))
+
+    completadas = ProgresoLeccion.objects.filter(
+        inscripcion=OuterRef('pk'), completado=True, leccion__curso_id=OuterRef('curso_id')
+    ).order_by().values('inscripcion').annotate(total=Count('id')).values('total')
+    inscripciones.update(
+        lecciones_completadas=Coalesce(Subquery(completadas, output_field=IntegerField()), 0)
+    )
+    inscripciones.update(porcentaje_progreso=_porcentaje(F('lecciones_completadas')))
+    return _completar(inscripciones)
+
+
+def _encolar_recalculos(curso_ids):
+    # Solo los cursos con alumnos; un recálculo ya programado absorbe los cambios siguientes
+    con_alumnos = set(
+        Inscripcion.objects.filter(curso_id__in=curso_ids).values_list('curso_id', flat=True).distinct()
+    )
+    for curso_id in con_alumnos:
+        clave = RECALCULO_KEY.format(curso_id)
+        if not cache.add(clave, 1, RECALCULO_TIMEOUT):
+            continue
+        try:
+            from evaluacion.tasks import recalcular_avance_task
+            recalcular_avance_task.apply_async((curso_id,), countdown=RECALCULO_ESPERA)
+        except Exception as e:
+            cache.delete(clave)
+            logger.warning("No se pudo encolar el recálculo de avance del curso %s: %s", curso_id, e)
+
+
+def programar_recalculo(curso_ids):
+    """Programa el recálculo de los cursos al confirmar la transacción actual."""
+    curso_ids = {curso_id for curso_id in curso_ids if curso_id is not None}
+    if curso_ids:
+        transaction.on_commit(lambda: _encolar_recalculos(curso_ids))
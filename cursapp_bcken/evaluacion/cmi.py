@@ -0,0 +1,191 @@
+"""
+Escritura diferida del estado CMI de SCORM (LMSCommit).
+
+El contenido SCORM llama a LMSCommit cada pocos segundos, casi siempre para
+reescribir el mismo 'suspend_data'. Con '?modo=diferido' el commit solo
+guarda el último estado de cada (inscripción, lección) en la caché compartida
+y la tarea periódica 'volcar_commits_scorm_task' lo escribe en la BD con
+upserts por lotes (INSERT ... ON CONFLICT DO UPDATE).
+
+- Las transiciones de finalización ('completed', 'passed', 'failed' o
+  'completado') se guardan al momento por la ruta normal (con sus señales).
+  Se detectan comparando con la fila de la BD, no con el estado en caché.
+- LMSInitialize (GET) superpone el estado pendiente al de la BD.
+- Los pares con cambios se anotan en el índice de pendientes de
+  'evaluacion.pendientes' (marca + ranura numerada en la caché).
+- Un commit que repite el estado pendiente no reescribe la caché ni anota el
+  par; al volcar, el suspend_data se compara por hash con el de EstadoCmi.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from cursos.models import Leccion
+from evaluacion.models import ProgresoLeccion, Inscripcion, EstadoCmi
+from evaluacion.pendientes import IndicePendientes
+
+MODO_DIFERIDO = 'diferido'
+
+# Campos CMI que admite el commit diferido
+CAMPOS = ('estado_scorm', 'puntuacion_scorm', 'suspend_data', 'completado')
+CAMPOS_PROGRESO = ('estado_scorm', 'puntuacion_scorm', 'completado') # Columnas de ProgresoLeccion
+ESTADOS_FINALES = ('completed', 'passed', 'failed')
+
+ESTADO_KEY = "scorm:cmi:{}:{}" # (inscripción, lección) -> {campo: valor}
+ESTADO_TIMEOUT = 60 * 60 * 24 # Muy por encima del intervalo de volcado
+LECCION_KEY = "scorm:cmi:leccion:{}" # lección -> (curso, tipo de contenido)
+LECCION_TIMEOUT = 60 * 5
+PENDIENTES = IndicePendientes("scorm:cmi", ESTADO_TIMEOUT)
+LOCK_KEY = "scorm:cmi:volcado:lock"
+LOCK_TIMEOUT = 60
+RANURAS_POR_VOLCADO = 5000
+TAMANO_LOTE = 500
+
+
+def datos_leccion(leccion_id):
+    """(curso_id, tipo_contenido) de la lección, o None si no existe."""
+    clave = LECCION_KEY.format(leccion_id)
+    datos = cache.get(clave)
+    if datos is None:
+        datos = Leccion.objects.filter(pk=leccion_id).values_list('curso_id', 'tipo_contenido').first()
+        if datos is None:
+            return None
+        cache.set(clave, datos, LECCION_TIMEOUT)
+    return datos
+
+
+def pendiente(inscripcion_id, leccion_id):
+    """Último estado conocido del par (los campos que se han enviado)."""
+    return cache.get(ESTADO_KEY.format(inscripcion_id, leccion_id)) or {}
+
+
+def es_transicion(inscripcion_id, leccion_id, cambios):
+    """
+    True si los cambios finalizan (o reabren) la lección respecto a lo guardado
+    en la BD. Se compara con la fila y no con la caché: sin estado en caché
+    (caducado o desalojado) un 'completado' distinto al de la BD se volcaría
+    sin pasar por el ajuste del avance del curso.
+    """
+    estado = cambios.get('estado_scorm')
+    if estado not in ESTADOS_FINALES and 'completado' not in cambios:
+        return False # Commits de solo progreso: sin consultas
+    guardado = ProgresoLeccion.objects.filter(
+        inscripcion_id=inscripcion_id, leccion_id=leccion_id
+    ).values('estado_scorm', 'completado').first() or {}
+    if estado in ESTADOS_FINALES and estado != guardado.get('estado_scorm'):
+        return True
+    # Cualquier cambio de 'completado' mueve el avance del curso
+    return 'completado' in cambios and bool(cambios['completado']) != bool(guardado.get('completado'))
+
+
+def diferir(inscripcion_id, leccion_id, cambios):
+    """
+    Guarda los cambios en la caché y anota el par para el próximo volcado
+    (nada si no cambian el estado pendiente).
+    """
+    clave = ESTADO_KEY.format(inscripcion_id, leccion_id)
+    anterior = cache.get(clave) or {}
+    estado = {**anterior, **cambios}
+    if estado == anterior:
+        return estado
+    # Primero el estado y después la anotación (ver IndicePendientes.anotar)
+    cache.set(clave, estado, ESTADO_TIMEOUT)
+    PENDIENTES.anotar((inscripcion_id, leccion_id))
+    return estado
+
+
+def confirmar(progreso):
+    """
+    Tras guardar el progreso por la ruta normal, el estado en caché pasa a
+    ser el de la BD (un volcado posterior solo reescribiría lo mismo).
+    """
+    cache.set(
+        ESTADO_KEY.format(progreso.inscripcion_id, progreso.leccion_id),
+        {campo: getattr(progreso, campo) for campo in CAMPOS},
+        ESTADO_TIMEOUT
+    )
+
+
+def _upsert(estados):
+    """
+    Escribe {(inscripción, lección): {campo: valor}} en ProgresoLeccion.
+    Un bulk_create por cada combinación de campos enviados; el suspend_data
+    va a EstadoCmi.
+    """
+    inscripciones = set(Inscripcion.objects.filter(
+        pk__in={inscripcion_id for inscripcion_id, _ in estados}
+    ).values_list('pk', flat=True))
+    lecciones = set(Leccion.objects.filter(
+        pk__in={leccion_id for _, leccion_id in estados}
+    ).values_list('pk', flat=True))
+
+    grupos = {}
+    textos = {}
+    for (inscripcion_id, leccion_id), estado in estados.items():
+        # Inscripción o lección borradas mientras el estado esperaba
+        if inscripcion_id not in inscripciones or leccion_id not in lecciones:
+            continue
+        campos = tuple(sorted(campo for campo in CAMPOS_PROGRESO if campo in estado))
+        grupos.setdefault(campos, []).append(ProgresoLeccion(
+            inscripcion_id=inscripcion_id,
+            leccion_id=leccion_id,
+            **{campo: estado[campo] for campo in campos}
+        ))
+        if 'suspend_data' in estado:
+            textos[(inscripcion_id, leccion_id)] = estado['suspend_data'] or ''
+
+    total = 0
+    with transaction.atomic():
+        for campos, filas in grupos.items():
+            if campos:
+                ProgresoLeccion.objects.bulk_create(
+                    filas,
+                    batch_size=TAMANO_LOTE,
+                    update_conflicts=True,
+                    unique_fields=['inscripcion', 'leccion'],
+                    update_fields=list(campos),
+                )
+            else: # Solo suspend_data: basta con que exista el progreso
+                ProgresoLeccion.objects.bulk_create(filas, batch_size=TAMANO_LOTE, ignore_conflicts=True)
+            total += len(filas)
+        if textos:
+            _upsert_suspend_data(textos)
+    return total
+
+
+def _upsert_suspend_data(textos):
+    """Escribe en EstadoCmi los suspend_data cuyo hash cambió."""
+    progresos = ProgresoLeccion.objects.filter(
+        inscripcion_id__in={inscripcion_id for inscripcion_id, _ in textos},
+        leccion_id__in={leccion_id for _, leccion_id in textos},
+    ).values_list('inscripcion_id', 'leccion_id', 'pk', 'estado_cmi__huella')
+    nuevos = []
+    for inscripcion_id, leccion_id, progreso_id, huella in progresos:
+        texto = textos.get((inscripcion_id, leccion_id))
+        if texto is None or (huella is None and not texto):
+            continue
+        estado = EstadoCmi.desde_texto(progreso_id, texto)
+        if estado.huella != huella:
+            nuevos.append(estado)
+    if nuevos:
+        EstadoCmi.guardar_varios(nuevos, batch_size=TAMANO_LOTE)
+
+
+def volcar():
+    """
+    Escribe en la BD los estados anotados desde el último volcado.
+    Devuelve el número de progresos escritos (None si otro volcado está en curso).
+    """
+    if not cache.add(LOCK_KEY, 1, LOCK_TIMEOUT):
+        return None
+    try:
+        pares, ranuras = PENDIENTES.tomar(RANURAS_POR_VOLCADO)
+        if not ranuras:
+            return 0
+
+        claves = {ESTADO_KEY.format(*par): par for par in pares}
+        estados = {claves[clave]: estado for clave, estado in cache.get_many(list(claves)).items()}
+        total = _upsert(estados) if estados else 0
+
+        PENDIENTES.avanzar(ranuras)
+        return total
+    finally:
+        cache.delete(LOCK_KEY)
@@ -0,0 +1,240 @@
+"""
+Latidos del reproductor: tiempo dedicado y porcentaje visto de cada lección.
+
+El reproductor envía un latido cada 15-30 segundos mientras el alumno está en
+la lección ({sesion, seq, segundos, porcentaje_visto}). Escribir cada latido
+en la BD sería un UPDATE por alumno activo cada pocos segundos, así que el
+endpoint solo acumula en la caché compartida y la tarea periódica
+'volcar_latidos_task' escribe los incrementos por lotes.
+
+- 'segundos' es el tiempo desde el latido anterior de la misma sesión de
+  reproducción (acotado a SEGUNDOS_MAXIMO). No se confía en él: cada sesión
+  lleva un reloj con la hora del servidor hasta la que ya se le acreditó
+  tiempo, y un latido no suma más de lo que ese reloj puede avanzar sin
+  pasar de la hora actual. Entre todas las sesiones del par, cada minuto de
+  reloj suma a lo sumo los segundos que ya pasaron de él (contador por
+  minuto con 'cache.incr', el exceso se devuelve): abrir muchas sesiones a
+  la vez no multiplica el tiempo.
+- El volcado suma los minutos completos a 'tiempo_dedicado_minutos' con F()
+  y deja el resto de segundos para el siguiente. Solo cuando el par lleva
+  INACTIVIDAD segundos sin latidos el resto se redondea: de 30 s en adelante
+  se vuelca un minuto y la diferencia queda en negativo, así un latido que
+  llega tarde no vuelve a contarse; por debajo de 30 s se conserva para la
+  próxima vez que el alumno vuelva a la lección.
+- 'porcentaje_visto' nunca baja: se guarda el máximo y el volcado aplica
+  Greatest() contra la BD.
+- Duplicados y desorden: cada (sesión, seq) se acepta una sola vez con
+  'cache.add' (atómico, aunque lleguen a la vez a dos workers). Además se
+  recuerda el mayor 'seq' de la sesión: un latido más viejo que VENTANA no
+  suma tiempo; uno que llega tarde dentro de la ventana sí (una sola vez).
+- Índice de pendientes de 'evaluacion.pendientes', igual que en cmi.py.
+"""
+import time
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Case, When, Value, IntegerField, DecimalField
+from django.db.models.functions import Greatest
+from cursos.models import Leccion
+from evaluacion.models import ProgresoLeccion, Inscripcion
+from evaluacion.pendientes import IndicePendientes
+
+SEGUNDOS_MAXIMO = 60 # Un latido no puede sumar más de esto (intervalo máximo del cliente x2)
+VENTANA = 64 # Latidos anteriores al último que aún se aceptan si llegan tarde
+
+SESION_KEY = "latidos:sesion:{}:{}:{}" # (inscripción, lección, sesión) -> seq máximo
+SEQ_KEY = "latidos:seq:{}:{}:{}:{}" # (inscripción, lección, sesión, seq) recibido
+RELOJ_KEY = "latidos:reloj:{}:{}:{}" # (inscripción, lección, sesión) -> hora acreditada
+SESION_TIMEOUT = 60 * 60 * 6
+MINUTO_KEY = "latidos:minuto:{}:{}:{}" # (inscripción, lección, minuto de reloj) -> segundos acreditados
+MINUTO_TIMEOUT = 60 * 5
+SEGUNDOS_KEY = "latidos:segundos:{}:{}" # (inscripción, lección) -> segundos sin volcar
+PORCENTAJE_KEY = "latidos:porcentaje:{}:{}" # (inscripción, lección) -> porcentaje máximo
+ULTIMO_KEY = "latidos:ultimo:{}:{}" # (inscripción, lección) -> hora del último latido
+INACTIVIDAD = 60 * 2 # Sin latidos durante este tiempo el alumno dejó la lección
+ACUMULADO_TIMEOUT = 60 * 60 * 24
+PENDIENTES = IndicePendientes("latidos", ACUMULADO_TIMEOUT)
+LOCK_KEY = "latidos:volcado:lock"
+LOCK_TIMEOUT = 60
+RANURAS_POR_VOLCADO = 5000
+TAMANO_LOTE = 500
+
+
+def _es_nuevo(inscripcion_id, leccion_id, sesion, seq):
+    """True si el latido no se había recibido antes en esta sesión."""
+    clave = SESION_KEY.format(inscripcion_id, leccion_id, sesion)
+    ultimo = cache.get(clave)
+    if ultimo is not None and ultimo - seq >= VENTANA:
+        return False
+    if not cache.add(SEQ_KEY.format(inscripcion_id, leccion_id, sesion, seq), 1, SESION_TIMEOUT):
+        return False
+    # El máximo solo descarta los latidos muy viejos: basta con get/set
+    if ultimo is None or seq > ultimo:
+        cache.set(clave, seq, SESION_TIMEOUT)
+    return True
+
+
+def _acreditar(inscripcion_id, leccion_id, sesion, segundos, ahora):
+    """
+    Segundos del latido que se acreditan según la hora del servidor: avanza
+    el reloj de la sesión (nunca más allá de 'ahora' ni desde antes de
+    SEGUNDOS_MAXIMO) y reparte el tramo en los contadores por minuto del par.
+    """
+    clave = RELOJ_KEY.format(inscripcion_id, leccion_id, sesion)
+    desde = max(cache.get(clave, 0), ahora - SEGUNDOS_MAXIMO)
+    segundos = min(segundos, ahora - desde)
+    if segundos <= 0:
+        return 0
+    # Basta con get/set: si dos latidos de la sesión se cruzan, los contadores por minuto acotan el total
+    cache.set(clave, desde + segundos, SESION_TIMEOUT)
+
+    acreditados = 0
+    inicio, fin = desde, desde + segundos
+    while inicio < fin:
+        minuto = inicio // 60
+        tramo = min(fin, (minuto + 1) * 60) - inicio
+        clave = MINUTO_KEY.format(inscripcion_id, leccion_id, minuto)
+        cache.add(clave, 0, MINUTO_TIMEOUT)
+        # Varias sesiones a la vez: el 'incr' es atómico y cada una devuelve su exceso
+        # El minuto en curso solo admite los segundos que ya pasaron
+        exceso = min(tramo, cache.incr(clave, tramo) - min(60, ahora - minuto * 60))
+        if exceso > 0:
+            cache.decr(clave, exceso)
+            tramo -= exceso
+        acreditados += tramo
+        inicio = (minuto + 1) * 60
+    return acreditados
+
+
+def registrar(inscripcion_id, leccion_id, sesion, seq, segundos, porcentaje=None):
+    """
+    Acumula un latido en la caché y anota el par para el próximo volcado.
+    Devuelve False si el latido era un duplicado.
+    """
+    if not _es_nuevo(inscripcion_id, leccion_id, sesion, seq):
+        return False
+
+    ahora = int(time.time())
+    cache.set(ULTIMO_KEY.format(inscripcion_id, leccion_id), ahora, ACUMULADO_TIMEOUT)
+    cambios = False
+    segundos = _acreditar(inscripcion_id, leccion_id, sesion, segundos, ahora)
+    if segundos:
+        clave = SEGUNDOS_KEY.format(inscripcion_id, leccion_id)
+        cache.add(clave, 0, ACUMULADO_TIMEOUT)
+        cache.incr(clave, segundos)
+        cambios = True
+    if porcentaje is not None:
+        # El porcentaje lo envía siempre el mismo reproductor: basta con get/set
+        clave = PORCENTAJE_KEY.format(inscripcion_id, leccion_id)
+        maximo = cache.get(clave)
+        if maximo is None or porcentaje > maximo:
+            cache.set(clave, porcentaje, ACUMULADO_TIMEOUT)
+            cambios = True
+
+    # Primero los acumulados y después la anotación (ver IndicePendientes.anotar)
+    if cambios:
+        PENDIENTES.anotar((inscripcion_id, leccion_id))
+    return True
+
+
+def _escribir(incrementos):
+    """
+    Aplica {(inscripción, lección): (minutos, porcentaje)} a ProgresoLeccion:
+    crea los progresos que falten y suma con un UPDATE por lote (CASE por fila).
+    """
+    inscripciones = set(Inscripcion.objects.filter(
+        pk__in={inscripcion_id for inscripcion_id, _ in incrementos}
+    ).values_list('pk', flat=True))
+    lecciones = set(Leccion.objects.filter(
+        pk__in={leccion_id for _, leccion_id in incrementos}
+    ).values_list('pk', flat=True))
+    # Inscripción o lección borradas mientras el latido esperaba
+    incrementos = {
+        par: valores for par, valores in incrementos.items()
+        if par[0] in inscripciones and par[1] in lecciones
+    }
+    if not incrementos:
+        return 0
+
+    with transaction.atomic():
+        ProgresoLeccion.objects.bulk_create(
+            [ProgresoLeccion(inscripcion_id=i, leccion_id=l) for i, l in incrementos],
+            batch_size=TAMANO_LOTE,
+            ignore_conflicts=True
+        )
+        progresos = ProgresoLeccion.objects.filter(
+            inscripcion_id__in={inscripcion_id for inscripcion_id, _ in incrementos},
+            leccion_id__in={leccion_id for _, leccion_id in incrementos},
+        ).values_list('inscripcion_id', 'leccion_id', 'pk')
+        filas = [
+            (pk, *incrementos[(inscripcion_id, leccion_id)])
+            for inscripcion_id, leccion_id, pk in progresos
+            if (inscripcion_id, leccion_id) in incrementos
+        ]
+        for inicio in range(0, len(filas), TAMANO_LOTE):
+            lote = filas[inicio:inicio + TAMANO_LOTE]
+            minutos = Case(
+                *[When(pk=pk, then=Value(m)) for pk, m, _ in lote],
+                default=Value(0),
+                output_field=IntegerField()
+            )
+            porcentaje = Case(
+                *[When(pk=pk, then=Value(p)) for pk, _, p in lote if p is not None],
+                default=F('porcentaje_visto'),
+                output_field=DecimalField(max_digits=5, decimal_places=2)
+            )
+            ProgresoLeccion.objects.filter(pk__in=[pk for pk, _, _ in lote]).update(
+                tiempo_dedicado_minutos=F('tiempo_dedicado_minutos') + minutos,
+                porcentaje_visto=Greatest(F('porcentaje_visto'), porcentaje),
+            )
+    return len(filas)
+
+
+def volcar():
+    """
+    Escribe en la BD los latidos acumulados desde el último volcado.
+    Devuelve el número de progresos escritos (None si otro volcado está en curso).
+    """
+    if not cache.add(LOCK_KEY, 1, LOCK_TIMEOUT):
+        return None
+    try:
+        pares, ranuras = PENDIENTES.tomar(RANURAS_POR_VOLCADO)
+        if not ranuras:
+            return 0
+
+        segundos = cache.get_many([SEGUNDOS_KEY.format(*par) for par in pares])
+        porcentajes = cache.get_many([PORCENTAJE_KEY.format(*par) for par in pares])
+        ultimos = cache.get_many([ULTIMO_KEY.format(*par) for par in pares])
+        ahora = time.time()
+
+        incrementos = {}
+        descontar = {} # par -> segundos volcados
+        inactivos = set()
+        for par in pares:
+            acumulado = segundos.get(SEGUNDOS_KEY.format(*par), 0)
+            minutos, sobrante = divmod(max(acumulado, 0), 60) # Negativo: un redondeo pendiente de saldar
+            if ahora - ultimos.get(ULTIMO_KEY.format(*par), 0) >= INACTIVIDAD:
+                # El alumno dejó la lección: se redondea el resto (ver arriba)
+                inactivos.add(par)
+                minutos += int(sobrante >= 30)
+            if minutos:
+                descontar[par] = minutos * 60
+            porcentaje = porcentajes.get(PORCENTAJE_KEY.format(*par))
+            if minutos or porcentaje is not None:
+                incrementos[par] = (minutos, porcentaje)
+        total = _escribir(incrementos) if incrementos else 0
+
+        # Solo tras escribir: los segundos sobrantes y los latidos nuevos se quedan
+        for par in pares:
+            resto = segundos.get(SEGUNDOS_KEY.format(*par), 0)
+            if par in descontar:
+                try:
+                    resto = cache.decr(SEGUNDOS_KEY.format(*par), descontar[par])
+                except ValueError: # Los segundos caducaron: no queda nada que descontar
+                    resto = 0
+            # Mientras el alumno sigue en la lección el resto espera al siguiente volcado
+            if resto > 0 and par not in inactivos:
+                PENDIENTES.anotar(par)
+        PENDIENTES.avanzar(ranuras)
+        return total
+    finally:
+        cache.delete(LOCK_KEY)
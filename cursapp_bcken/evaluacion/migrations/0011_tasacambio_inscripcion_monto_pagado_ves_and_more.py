@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluacion', '0010_alter_progresoleccion_estado_scorm_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TasaCambio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tasa', models.DecimalField(decimal_places=4, help_text='Bolívares por 1 USD.', max_digits=14)),
+                ('fuente', models.CharField(blank=True, help_text='API de donde se obtuvo la tasa.', max_length=255)),
+                ('fecha_obtenida', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Tasa de Cambio',
+                'verbose_name_plural': 'Tasas de Cambio',
+                'ordering': ['-fecha_obtenida'],
+            },
+        ),
+        migrations.AddField(
+            model_name='inscripcion',
+            name='monto_pagado_ves',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Precio en VES del curso al momento de la inscripción.', max_digits=16, null=True),
+        ),
+        migrations.AddField(
+            model_name='inscripcion',
+            name='tasa_cambio',
+            field=models.ForeignKey(blank=True, help_text='Tasa BCV con la que se calculó el monto en VES.', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='inscripciones', to='evaluacion.tasacambio'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluacion', '0011_tasacambio_inscripcion_monto_pagado_ves_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='resena',
+            index=models.Index(fields=['-fecha_creacion', 'id'], name='resena_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:01
+
+import zlib
+import hashlib
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def mover_suspend_data(apps, schema_editor):
+    """Copia el suspend_data de cada progreso a EstadoCmi, comprimido."""
+    ProgresoLeccion = apps.get_model('evaluacion', 'ProgresoLeccion')
+    EstadoCmi = apps.get_model('evaluacion', 'EstadoCmi')
+    lote = []
+    progresos = ProgresoLeccion.objects.exclude(suspend_data__isnull=True).exclude(suspend_data='')
+    for pk, texto in progresos.values_list('pk', 'suspend_data').iterator(chunk_size=500):
+        datos = texto.encode('utf-8')
+        lote.append(EstadoCmi(
+            progreso_id=pk,
+            suspend_data_comprimido=zlib.compress(datos),
+            huella=hashlib.sha256(datos).hexdigest(),
+            tamano=len(datos)
+        ))
+        if len(lote) >= 500:
+            EstadoCmi.objects.bulk_create(lote)
+            lote = []
+    EstadoCmi.objects.bulk_create(lote)
+
+
+def restaurar_suspend_data(apps, schema_editor):
+    ProgresoLeccion = apps.get_model('evaluacion', 'ProgresoLeccion')
+    EstadoCmi = apps.get_model('evaluacion', 'EstadoCmi')
+    for estado in EstadoCmi.objects.iterator(chunk_size=500):
+        texto = zlib.decompress(bytes(estado.suspend_data_comprimido)).decode('utf-8')
+        ProgresoLeccion.objects.filter(pk=estado.progreso_id).update(suspend_data=texto)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluacion', '0012_resena_resena_fecha_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadoCmi',
+            fields=[
+                ('progreso', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='estado_cmi', serialize=False, to='evaluacion.progresoleccion')),
+                ('suspend_data_comprimido', models.BinaryField()),
+                ('huella', models.CharField(help_text='SHA-256 del texto sin comprimir', max_length=64)),
+                ('tamano', models.PositiveIntegerField(default=0, help_text='Bytes del texto sin comprimir')),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Estado CMI',
+                'verbose_name_plural': 'Estados CMI',
+            },
+        ),
+        migrations.RunPython(mover_suspend_data, restaurar_suspend_data),
+        migrations.RemoveField(
+            model_name='progresoleccion',
+            name='suspend_data',
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:11
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value, F
+from django.db.models.functions import Cast, Coalesce, Least, NullIf
+
+
+def calcular_avance(apps, schema_editor):
+    # Mismo cálculo que evaluacion.avance.recalcular_avance (sin emitir certificados)
+    Inscripcion = apps.get_model('evaluacion', 'Inscripcion')
+    ProgresoLeccion = apps.get_model('evaluacion', 'ProgresoLeccion')
+    Curso = apps.get_model('cursos', 'Curso')
+    completadas = ProgresoLeccion.objects.filter(
+        inscripcion=OuterRef('pk'), completado=True, leccion__curso_id=OuterRef('curso_id')
+    ).order_by().values('inscripcion').annotate(total=Count('id')).values('total')
+    Inscripcion.objects.update(
+        lecciones_completadas=Coalesce(Subquery(completadas, output_field=models.IntegerField()), 0)
+    )
+    total = Subquery(
+        Curso.objects.filter(pk=OuterRef('curso_id')).values('num_lecciones')[:1],
+        output_field=models.IntegerField()
+    )
+    porcentaje = Cast(F('lecciones_completadas'), models.FloatField()) * Value(100.0) / NullIf(total, 0)
+    Inscripcion.objects.update(
+        porcentaje_progreso=Coalesce(Least(porcentaje, Value(100.0)), Value(0.0), output_field=models.FloatField())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluacion', '0013_estado_cmi'),
+        ('cursos', '0019_leccion_curso_instructor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inscripcion',
+            name='lecciones_completadas',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(calcular_avance, migrations.RunPython.noop),
+    ]
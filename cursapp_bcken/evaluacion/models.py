@@ -4,6 +4,9 @@ from cursos.models import Leccion
 from django.db.models import Sum
 from django.core.validators import MinValueValidator, MaxValueValidator
 import uuid
+import zlib
+import hashlib
+from django.core.exceptions import ObjectDoesNotExist
 
 # -------------------------------------------------------------
 # 1. Modelos de Evaluación (Cuestionario, Pregunta, Respuesta)
@@ -138,8 +141,27 @@ class Inscripcion(models.Model):
     )
     referencia_pago = models.CharField(max_length=100, blank=True, null=True, unique=True)
     
+    # Snapshot de la tasa BCV usada al inscribirse (para reportes y conciliación)
+    tasa_cambio = models.ForeignKey(
+        'TasaCambio',
+        on_delete=models.PROTECT,
+        related_name='inscripciones',
+        null=True,
+        blank=True,
+        help_text="Tasa BCV con la que se calculó el monto en VES."
+    )
+    monto_pagado_ves = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text="Precio en VES del curso al momento de la inscripción."
+    )
+    
     fecha_inscripcion = models.DateTimeField(auto_now_add=True)
     completado = models.BooleanField(default=False)
+    # Lecciones completadas del curso (ver evaluacion/avance.py): el porcentaje se calcula con él
+    lecciones_completadas = models.PositiveIntegerField(default=0, editable=False)
     porcentaje_progreso = models.DecimalField(
         max_digits=5,
         decimal_places=2,
@@ -214,14 +236,6 @@ class ProgresoLeccion(models.Model):
         help_text="Puntuación (0-100) reportada por el SCORM"
     )
     
-    # cmi.suspend_data (Datos de Suspención)
-    # Campo CRÍTICO. Guarda dónde quedó el usuario en el SCORM (Ej: "página 3, video 1:20")
-    suspend_data = models.TextField(
-        blank=True,
-        null=True,
-        help_text="Datos de suspensión del SCORM (dónde guardar)"
-    )
-    
     # cmi.core.entry (Punto de entrada)
     # 'ab-initio' (primera vez), 'resume' (continuar)
     entry_point = models.CharField(max_length=10, default='ab-initio', blank=True)
@@ -235,6 +249,92 @@ class ProgresoLeccion(models.Model):
     def __str__(self):
         return f"Progreso {self.leccion.titulo}: {self.porcentaje_visto}%"
     
+    # cmi.suspend_data (Datos de Suspención)
+    # Guarda dónde quedó el usuario en el SCORM (Ej: "página 3, video 1:20").
+    # Vive comprimido en EstadoCmi para no inflar la tabla de progresos.
+    @property
+    def suspend_data(self):
+        if hasattr(self, '_suspend_data'):
+            return self._suspend_data
+        try:
+            return self.estado_cmi.suspend_data
+        except ObjectDoesNotExist:
+            return None
+    
+    @suspend_data.setter
+    def suspend_data(self, valor):
+        # Solo en memoria: se persiste con 'guardar_suspend_data'
+        self._suspend_data = valor
+    
+    def guardar_suspend_data(self, texto):
+        """
+        Guarda cmi.suspend_data si cambió (se compara el hash, sin descomprimir).
+        Devuelve True si escribió.
+        """
+        if ProgresoLeccion.estado_cmi.is_cached(self):
+            huella_actual = getattr(self._state.fields_cache['estado_cmi'], 'huella', None)
+        else:
+            # Solo el hash: cargar el EstadoCmi traería el texto comprimido
+            huella_actual = EstadoCmi.objects.filter(pk=self.pk).values_list('huella', flat=True).first()
+        if huella_actual is None and not texto:
+            return False
+        estado = EstadoCmi.desde_texto(self.pk, texto)
+        if estado.huella == huella_actual:
+            return False
+        EstadoCmi.guardar_varios([estado])
+        self.estado_cmi = estado
+        self.__dict__.pop('_suspend_data', None)
+        return True
+    
+class EstadoCmi(models.Model):
+    """
+    Estado CMI voluminoso de un ProgresoLeccion (cmi.suspend_data), guardado
+    aparte y comprimido con zlib. El hash del texto permite descartar los
+    commits que reenvían los mismos datos sin leerlos ni descomprimirlos.
+    """
+    progreso = models.OneToOneField(
+        ProgresoLeccion,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='estado_cmi'
+    )
+    suspend_data_comprimido = models.BinaryField()
+    huella = models.CharField(max_length=64, help_text="SHA-256 del texto sin comprimir")
+    tamano = models.PositiveIntegerField(default=0, help_text="Bytes del texto sin comprimir")
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Estado CMI"
+        verbose_name_plural = "Estados CMI"
+    
+    @classmethod
+    def desde_texto(cls, progreso_id, texto):
+        datos = (texto or '').encode('utf-8')
+        return cls(
+            progreso_id=progreso_id,
+            suspend_data_comprimido=zlib.compress(datos),
+            huella=hashlib.sha256(datos).hexdigest(),
+            tamano=len(datos)
+        )
+    
+    @classmethod
+    def guardar_varios(cls, estados, batch_size=500):
+        """Upsert (INSERT ... ON CONFLICT DO UPDATE) de los estados."""
+        cls.objects.bulk_create(
+            estados,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['progreso'],
+            update_fields=['suspend_data_comprimido', 'huella', 'tamano', 'fecha_actualizacion']
+        )
+    
+    @property
+    def suspend_data(self):
+        return zlib.decompress(bytes(self.suspend_data_comprimido)).decode('utf-8')
+    
+    def __str__(self):
+        return f"Estado CMI del progreso {self.progreso_id} ({self.tamano} bytes)"
+    
 class IntentoCuestionario(models.Model):
     """
     Almacena un intento de un alumno en un Cuestionario.
@@ -512,6 +612,10 @@ class Resena(models.Model):
         verbose_name_plural = "Reseñas"
         ordering = ['-fecha_creacion']
         unique_together = ('inscripcion',) # Asegura que la inscripción sea única
+        indexes = [
+            # Clave de la paginación por cursor de las reseñas
+            models.Index(fields=['-fecha_creacion', 'id'], name='resena_fecha_idx'),
+        ]
         
     def __str__(self):
         return f"Reseña de {self.inscripcion.alumno.username} para {self.inscripcion.curso.titulo}"
@@ -519,6 +623,24 @@ class Resena(models.Model):
 # -------------------------------------------------------------
 # 6. Modelo de Transacciones y Payouts
 # -------------------------------------------------------------
+class TasaCambio(models.Model):
+    """
+    Historial de la tasa USD/VES del BCV.
+    Se guarda un registro por cada consulta exitosa a la API externa, para que
+    reportes y conciliaciones usen la tasa histórica y no la tasa en vivo.
+    """
+    tasa = models.DecimalField(max_digits=14, decimal_places=4, help_text="Bolívares por 1 USD.")
+    fuente = models.CharField(max_length=255, blank=True, help_text="API de donde se obtuvo la tasa.")
+    fecha_obtenida = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        verbose_name = "Tasa de Cambio"
+        verbose_name_plural = "Tasas de Cambio"
+        ordering = ['-fecha_obtenida']
+        
+    def __str__(self):
+        return f"{self.tasa} VES/USD ({self.fecha_obtenida:%Y-%m-%d %H:%M})"
+    
 class Transaccion(models.Model):
     """
     Registra una venta completada y calcula la división de ingresos
@@ -0,0 +1,79 @@
+"""
+Índice de pares (inscripción, lección) pendientes de volcar a la BD, en la
+caché compartida. Lo usan los commits SCORM diferidos ('evaluacion.cmi') y
+los latidos del reproductor ('evaluacion.latidos').
+
+- La caché no tiene conjuntos: cada par con cambios se marca una sola vez
+  ('cache.add') y se anota en una ranura numerada ('cache.incr' y después
+  'cache.set'); el volcado recorre las ranuras desde la última procesada.
+- Entre el 'incr' y el 'set' de otro proceso la ranura todavía no existe.
+  El volcado se detiene en la primera ranura que falta y no avanza el cursor
+  más allá; solo la salta si sigue faltando ESPERA_HUECO segundos después
+  (la caché la desalojó). En ese caso la marca del par caduca en
+  MARCA_TIMEOUT y el siguiente cambio vuelve a anotarlo.
+"""
+import time
+from django.core.cache import cache
+
+MARCA_TIMEOUT = 60 * 2
+ESPERA_HUECO = 60
+
+
+class IndicePendientes:
+
+    def __init__(self, prefijo, timeout):
+        self.marca_key = prefijo + ":marca:{}:{}"
+        self.ranuras_key = prefijo + ":ranuras"
+        self.ranura_key = prefijo + ":ranura:{}"
+        self.cursor_key = prefijo + ":cursor"
+        self.hueco_key = prefijo + ":hueco" # (ranura que falta, desde cuándo)
+        self.timeout = timeout
+
+    def anotar(self, par):
+        """
+        Anota el par para el próximo volcado (nada si ya estaba anotado).
+        Se llama después de guardar sus datos: el volcado borra las marcas
+        antes de leerlos, así ningún cambio queda sin volcar.
+        """
+        if cache.add(self.marca_key.format(*par), 1, MARCA_TIMEOUT):
+            cache.add(self.ranuras_key, 0, None)
+            ranura = cache.incr(self.ranuras_key)
+            cache.set(self.ranura_key.format(ranura), par, self.timeout)
+
+    def tomar(self, maximo):
+        """
+        Devuelve (pares, ranuras): los pares anotados desde el último volcado
+        (hasta 'maximo' ranuras) y el rango de ranuras leídas, que se pasa a
+        'avanzar' una vez escritos. Borra las marcas de esos pares.
+        """
+        cursor = cache.get(self.cursor_key, 0)
+        tope = cache.get(self.ranuras_key, 0)
+        if tope < cursor: # La caché se reinició: el contador volvió a empezar
+            cursor = 0
+        numeros = range(cursor + 1, min(tope, cursor + maximo) + 1)
+        encontradas = cache.get_many([self.ranura_key.format(n) for n in numeros])
+
+        pares = set()
+        for n in numeros:
+            par = encontradas.get(self.ranura_key.format(n))
+            if par is not None:
+                pares.add(tuple(par))
+            elif not self._hueco_vencido(n):
+                numeros = range(cursor + 1, n)
+                break
+        cache.delete_many([self.marca_key.format(*par) for par in pares])
+        return pares, numeros
+
+    def _hueco_vencido(self, ranura):
+        """True si la ranura lleva más de ESPERA_HUECO segundos sin aparecer."""
+        hueco = cache.get(self.hueco_key)
+        if hueco is None or hueco[0] != ranura:
+            cache.set(self.hueco_key, (ranura, time.time()), self.timeout)
+            return False
+        return time.time() - hueco[1] >= ESPERA_HUECO
+
+    def avanzar(self, ranuras):
+        """Descarta las ranuras ya volcadas y mueve el cursor tras la última."""
+        if ranuras:
+            cache.delete_many([self.ranura_key.format(n) for n in ranuras])
+            cache.set(self.cursor_key, ranuras[-1], None)
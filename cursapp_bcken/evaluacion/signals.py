@@ -1,31 +1,60 @@
 from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
 from .models import ProgresoLeccion, IntentoCuestionario, PuntosAlumno, Resena, Inscripcion, Transaccion
-from django.db.models import Avg, Count
+from django.db.models import Avg, Count, F
 from core.models import Usuario
+from cursos.models import Leccion, Modulo
 from decimal import Decimal
 
 @receiver(pre_save, sender=ProgresoLeccion)
-def otorgar_xp_por_leccion(sender, instance, created, **kargs):
+def recordar_completado(sender, instance, update_fields=None, **kargs):
     """
-    Otorga XP automáticamente cuando una lección se marca como completada
-    por primera vez
+    Guarda si la lección ya estaba completada, para detectar la transición
+    al guardar (pre_save no recibe 'created': una fila nueva no estaba completada).
     """
-    # Si el objeto no es nuevo (no tiene pk), no podemos comparar
-    if instance.pk is None:
+    instance._completado_antes = False
+    if instance._state.adding:
         return
+    if update_fields is not None and 'completado' not in update_fields:
+        instance._completado_antes = None # El guardado no toca 'completado'
+        return
+    instance._completado_antes = bool(
+        ProgresoLeccion.objects.filter(pk=instance.pk).values_list('completado', flat=True).first()
+    )
+
+@receiver(post_save, sender=ProgresoLeccion)
+def otorgar_xp_por_leccion(sender, instance, **kargs):
+    """
+    Cuando una lección pasa a completada suma la lección al avance del curso
+    (o la resta si deja de estarlo). La XP se otorga solo la primera vez.
+    """
+    antes = getattr(instance, '_completado_antes', None)
+    if antes is None or antes == instance.completado:
+        return
+    from evaluacion.avance import ajustar_avance
     
-    # Si la lección está completada y no es la primera vez se guarda (para evitar dobles puntos)
-    if instance.completado and not created:
-        try:
-            # Verificar si ya dimos XP por esta lección (para evitar trampas)
-            progreso_anterior = ProgresoLeccion.objects.get(pk=instance.pk)
-            if not progreso_anterior.completado: # Si NO estaba completada antes
-                usuario = instance.inscripcion.alumno
-                usuario.xp_totales += 10 # Otorga 10 XP
-                usuario.save(update_fields=['xp_totales'])
-        except ProgresoLeccion.DoesNotExist:
-            return
+    ajustar_avance(instance.inscripcion_id, 1 if instance.completado else -1)
+    if instance.completado:
+        # 'fecha_completado' se fija una sola vez (UPDATE condicional, sin carreras):
+        # desmarcar y volver a marcar la lección no otorga XP de nuevo
+        ahora = timezone.now()
+        primera_vez = ProgresoLeccion.objects.filter(
+            pk=instance.pk, fecha_completado__isnull=True
+        ).update(fecha_completado=ahora)
+        if primera_vez:
+            instance.fecha_completado = ahora
+            # Otorga 10 XP (UPDATE atómico: sin leer al usuario)
+            Usuario.objects.filter(inscripciones_curso__pk=instance.inscripcion_id).update(
+                xp_totales=F('xp_totales') + 10
+            )
+
+@receiver(post_delete, sender=ProgresoLeccion)
+def descontar_leccion_completada(sender, instance, **kargs):
+    if instance.completado:
+        from evaluacion.avance import ajustar_avance
+
+        ajustar_avance(instance.inscripcion_id, -1)
             
 @receiver(post_save, sender=IntentoCuestionario)
 def otorgar_xp_por_cuestionario(sender, instance, created, **kargs):
@@ -55,6 +84,12 @@ def recalcular_calificaciones_curso(curso_id):
     calificación en el modelo Curso.
     """
     from cursos.models import Curso
+    from cursos.snapshots import invalidar_cursos
+    from cursos.facetas import invalidar_catalogo
+    
+    # Los promedios se muestran en el detalle cacheado del curso y en la faceta de calificación
+    invalidar_cursos([curso_id])
+    invalidar_catalogo()
     
     # Obtener todas las reseñas activas de un curso
     resenas = Resena.objects.filter(inscripcion__curso_id=curso_id)
@@ -136,4 +171,77 @@ def crear_transaccion_post_inscripcion(sender, instance, created, **kwargs):
             monto_instructor_usd=monto_instructor,
             comision_aplicada_porcentaje=comision_porcentaje,
             estado_pago_instructor=Transaccion.ESTADO_PENDIENTE
-        )
\ No newline at end of file
+        )
+
+@receiver(pre_save, sender=Inscripcion)
+def recordar_estado_pago(sender, instance, update_fields=None, **kwargs):
+    """
+    Guarda el estado de pago anterior para mantener 'Curso.num_inscritos_pagados'.
+    """
+    instance._estado_pago_anterior = None
+    if instance._state.adding:
+        return
+    if update_fields is not None and 'estado_pago' not in update_fields:
+        return
+    instance._estado_pago_anterior = (
+        Inscripcion.objects.filter(pk=instance.pk).values_list('estado_pago', flat=True).first()
+    )
+
+@receiver(post_save, sender=Inscripcion)
+def contar_inscrito_pagado(sender, instance, created, **kwargs):
+    from cursos.contadores import ajustar_curso
+
+    anterior = getattr(instance, '_estado_pago_anterior', None)
+    if not created and anterior is None:
+        return
+    pagada_antes = anterior == Inscripcion.ESTADO_PAGADO
+    pagada_ahora = instance.estado_pago == Inscripcion.ESTADO_PAGADO
+    if pagada_antes != pagada_ahora:
+        ajustar_curso(instance.curso_id, num_inscritos_pagados=1 if pagada_ahora else -1)
+
+@receiver(post_delete, sender=Inscripcion)
+def descontar_inscrito_pagado(sender, instance, **kwargs):
+    from cursos.contadores import ajustar_curso
+
+    if instance.estado_pago == Inscripcion.ESTADO_PAGADO:
+        ajustar_curso(instance.curso_id, num_inscritos_pagados=-1)
+
+@receiver(post_save, sender=Inscripcion)
+@receiver(post_delete, sender=Inscripcion)
+def invalidar_accesos_inscripcion(sender, instance, **kwargs):
+    """
+    Cualquier alta, cambio (p. ej. el webhook que marca el pago) o baja de
+    una inscripción invalida la caché de cursos pagados del alumno.
+    """
+    from evaluacion.accesos import invalidar
+
+    invalidar([instance.alumno_id])
+
+@receiver(post_save, sender=Leccion)
+def recalcular_avance_leccion(sender, instance, created, **kwargs):
+    """
+    Una lección nueva o movida de curso cambia el total de lecciones: se
+    recalcula el avance de los inscritos (en segundo plano).
+    """
+    from evaluacion.avance import programar_recalculo
+
+    if created:
+        programar_recalculo([instance.curso_id])
+        return
+    anterior = getattr(instance, '_contadores_anterior', None) # Ver cursos.signals.recordar_leccion
+    if anterior is not None and anterior['curso_id'] != instance.curso_id:
+        programar_recalculo([anterior['curso_id'], instance.curso_id])
+
+@receiver(post_delete, sender=Leccion)
+def recalcular_avance_leccion_borrada(sender, instance, **kwargs):
+    from evaluacion.avance import programar_recalculo
+
+    programar_recalculo([instance.curso_id])
+
+@receiver(post_save, sender=Modulo)
+def recalcular_avance_modulo(sender, instance, created, **kwargs):
+    from evaluacion.avance import programar_recalculo
+
+    curso_anterior_id = getattr(instance, '_curso_anterior_id', None) # Ver cursos.signals.recordar_curso_modulo
+    if not created and curso_anterior_id is not None and curso_anterior_id != instance.curso_id:
+        programar_recalculo([curso_anterior_id, instance.curso_id])
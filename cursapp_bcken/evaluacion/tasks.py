@@ -0,0 +1,50 @@
+from celery import shared_task
+from django.core.cache import cache
+from utils.monetizacion import refrescar_tasa_bcv
+from evaluacion import cmi, avance, latidos
+
+@shared_task
+def refrescar_tasa_bcv_task():
+    """
+    Tarea periódica (Celery beat) que refresca la tasa BCV en la caché compartida
+    antes de que se venza, para que los requests nunca consulten la API externa.
+    """
+    tasa = refrescar_tasa_bcv()
+    if tasa is None:
+        return "Tasa BCV no actualizada (refresco en curso o error de la API)."
+    return f"Tasa BCV actualizada: {tasa}"
+
+
+@shared_task
+def volcar_commits_scorm_task():
+    """
+    Tarea periódica (Celery beat) que escribe en la BD, con upserts por lotes,
+    los commits SCORM diferidos que esperan en la caché.
+    """
+    total = cmi.volcar()
+    if total is None:
+        return "Volcado SCORM en curso en otro worker."
+    return f"Progresos SCORM volcados: {total}"
+
+
+@shared_task
+def volcar_latidos_task():
+    """
+    Tarea periódica (Celery beat) que suma en la BD el tiempo dedicado y el
+    porcentaje visto acumulados por los latidos del reproductor.
+    """
+    total = latidos.volcar()
+    if total is None:
+        return "Volcado de latidos en curso en otro worker."
+    return f"Progresos actualizados por latidos: {total}"
+
+
+@shared_task
+def recalcular_avance_task(curso_id):
+    """
+    Recalcula el avance de los inscritos de un curso cuyo contenido cambió.
+    Se libera la marca primero: un cambio durante el recálculo programa otro.
+    """
+    cache.delete(avance.RECALCULO_KEY.format(curso_id))
+    completadas = avance.recalcular_avance([curso_id])
+    return f"Avance recalculado del curso {curso_id} ({len(completadas)} inscripciones completadas)."
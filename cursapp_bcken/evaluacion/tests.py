@@ -1,3 +1,478 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.db.models import ProtectedError
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.test import APIClient
+from core.models import Usuario
+from cursos.models import Curso, Modulo, Leccion
+from evaluacion.models import Inscripcion, ProgresoLeccion, EstadoCmi, Certificado, TasaCambio
+from evaluacion.tasks import volcar_commits_scorm_task, recalcular_avance_task, volcar_latidos_task
+from evaluacion import accesos, cmi, pendientes, latidos
+from utils import monetizacion
+from utils.pruebas import DatosCursoMixin
 
-# Create your tests here.
+
+class TasaBcvTests(TestCase):
+    """Tasa BCV: servida desde la caché, refrescada con candado y sin perder la última conocida."""
+
+    def setUp(self):
+        monetizacion._volcar_hits() # Hits pendientes de otros tests
+        cache.clear()
+
+    def api(self, tasa):
+        respuesta = mock.Mock()
+        respuesta.json.return_value = {'current': {'usd': tasa}}
+        return mock.patch('utils.monetizacion.requests.get', return_value=respuesta)
+
+    def test_refresco_y_lectura_sin_consultas(self):
+        with self.api('36.5'):
+            self.assertEqual(monetizacion.refrescar_tasa_bcv(), Decimal('36.5'))
+        with self.assertNumQueries(0):
+            vigente = monetizacion.obtener_tasa_vigente()
+        self.assertEqual(vigente, {'id': TasaCambio.objects.get().pk, 'tasa': Decimal('36.5')})
+
+        # Los hits se cuentan en memoria; la caché no se toca en cada lectura
+        with mock.patch.object(monetizacion, '_incrementar_contador') as incrementar:
+            monetizacion.obtener_tasa_bcv()
+            monetizacion.obtener_tasa_bcv()
+        incrementar.assert_not_called()
+        estadisticas = monetizacion.obtener_estadisticas_tasa()
+        self.assertEqual((estadisticas['hits'], estadisticas['refrescos']), (3, 1))
+
+    def test_candado_y_error_conservan_la_ultima_tasa(self):
+        with self.api('36.5'):
+            monetizacion.refrescar_tasa_bcv()
+
+        # Otro worker está refrescando: no se consulta la API
+        cache.add(monetizacion.LOCK_KEY, 1)
+        with self.api('40') as get:
+            self.assertIsNone(monetizacion.refrescar_tasa_bcv())
+        get.assert_not_called()
+        cache.delete(monetizacion.LOCK_KEY)
+
+        with self.api('no-es-un-numero'):
+            self.assertIsNone(monetizacion.refrescar_tasa_bcv())
+        self.assertEqual(monetizacion.obtener_tasa_bcv(), Decimal('36.5'))
+        self.assertEqual(monetizacion.obtener_estadisticas_tasa()['errores'], 1)
+
+    def test_cache_vacia_recupera_el_historial(self):
+        TasaCambio.objects.create(tasa=Decimal('35'))
+        TasaCambio.objects.update(fecha_obtenida=timezone.now() - timedelta(days=1))
+        with mock.patch('evaluacion.tasks.refrescar_tasa_bcv_task.delay') as encolar:
+            self.assertEqual(monetizacion.obtener_tasa_bcv(), Decimal('35'))
+            self.assertEqual(monetizacion.obtener_tasa_bcv(), Decimal('35'))
+        # Tasa vencida: un único refresco en cola aunque se lea varias veces
+        encolar.assert_called_once()
+
+
+class TasaHistoricaTests(TestCase):
+    """Cada inscripción guarda la tasa y el monto en VES con que se calculó."""
+
+    def setUp(self):
+        cache.clear()
+        self.instructor = Usuario.objects.create_user(
+            username='instructor', password='clave', rol=Usuario.ROL_INSTRUCTOR
+        )
+        self.curso = Curso.objects.create(
+            titulo='Curso', slug='curso', descripcion='-', instructor=self.instructor,
+            precio_usd=Decimal('10.00'), estado=Curso.ESTADO_PUBLICADO
+        )
+        self.tasa = self.refrescar('40')
+
+    def refrescar(self, tasa):
+        respuesta = mock.Mock()
+        respuesta.json.return_value = {'current': {'usd': tasa}}
+        with mock.patch('utils.monetizacion.requests.get', return_value=respuesta):
+            monetizacion.refrescar_tasa_bcv()
+        return TasaCambio.objects.latest('fecha_obtenida')
+
+    def inscribir(self, username):
+        client = APIClient()
+        client.force_authenticate(Usuario.objects.create_user(username=username, password='clave'))
+        respuesta = client.post('/api/v1/evaluacion/matricula/', {'curso': self.curso.pk}, format='json')
+        self.assertEqual(respuesta.status_code, 201)
+        return Inscripcion.objects.get(pk=respuesta.data['inscripcion']['id'])
+
+    def test_inscripcion_conserva_la_tasa_historica(self):
+        primera = self.inscribir('alumno1')
+        self.assertEqual(primera.tasa_cambio, self.tasa)
+        self.assertEqual(primera.monto_pagado_ves, Decimal('400.00'))
+
+        # La tasa cambia: la inscripción anterior no se recalcula
+        nueva = self.refrescar('50')
+        segunda = self.inscribir('alumno2')
+        primera.refresh_from_db()
+        self.assertEqual((primera.tasa_cambio, primera.monto_pagado_ves), (self.tasa, Decimal('400.00')))
+        self.assertEqual((segunda.tasa_cambio, segunda.monto_pagado_ves), (nueva, Decimal('500.00')))
+
+        # El reporte del instructor suma los montos históricos, no la tasa en vivo
+        Inscripcion.objects.update(estado_pago=Inscripcion.ESTADO_PAGADO)
+        client = APIClient()
+        client.force_authenticate(self.instructor)
+        datos = client.get('/api/v1/evaluacion/instructor/dashboard/').data
+        self.assertEqual(datos['total_inscripciones'], 2)
+        self.assertEqual(datos['ventas_totales_ves'], Decimal('900.00'))
+
+    def test_tasa_usada_no_se_puede_borrar(self):
+        self.inscribir('alumno')
+        with self.assertRaises(ProtectedError):
+            self.tasa.delete()
+        self.assertTrue(TasaCambio.objects.filter(pk=self.tasa.pk).exists())
+
+
+class ScormCommitDiferidoTests(DatosCursoMixin, TestCase):
+    """Los commits SCORM diferidos esperan en la caché y se vuelcan por lotes."""
+
+    def setUp(self):
+        super().setUp()
+        self.crear_leccion(titulo='SCORM', tipo_contenido=Leccion.TIPO_SCORM)
+        self.alumno = Usuario.objects.create_user(username='alumno', password='clave')
+        self.inscripcion = Inscripcion.objects.create(
+            alumno=self.alumno, curso_id=self.curso.pk, precio_pagado_usd=0,
+            estado_pago=Inscripcion.ESTADO_PAGADO
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.alumno)
+        self.url = f'/api/v1/evaluacion/scorm/commit/{self.leccion.pk}/'
+
+    def test_commits_diferidos_y_volcado(self):
+        self.assertEqual(self.client.get(self.url).data['entry_point'], 'ab-initio')
+
+        # Con el acceso ya validado el commit no toca la base de datos
+        with self.assertNumQueries(0):
+            for pagina in range(1, 4):
+                respuesta = self.client.patch(
+                    f'{self.url}?modo=diferido',
+                    {'suspend_data': f'pagina={pagina}', 'estado_scorm': 'incomplete'},
+                    format='json'
+                )
+        self.assertEqual(respuesta.status_code, 202)
+        progreso = ProgresoLeccion.objects.get(inscripcion=self.inscripcion, leccion=self.leccion)
+        self.assertIsNone(progreso.suspend_data)
+
+        # LMSInitialize ve el estado pendiente
+        datos = self.client.get(self.url).data
+        self.assertEqual(datos['suspend_data'], 'pagina=3')
+        self.assertEqual(datos['entry_point'], 'resume')
+
+        self.assertEqual(volcar_commits_scorm_task(), 'Progresos SCORM volcados: 1')
+        progreso.refresh_from_db()
+        self.assertEqual((progreso.suspend_data, progreso.estado_scorm), ('pagina=3', 'incomplete'))
+        self.assertEqual(volcar_commits_scorm_task(), 'Progresos SCORM volcados: 0')
+
+    def test_transicion_se_compara_con_la_bd(self):
+        self.client.get(self.url)
+        self.client.patch(self.url, {'completado': True}, format='json')
+        self.inscripcion.refresh_from_db()
+        self.assertEqual(self.inscripcion.lecciones_completadas, 1)
+
+        # Sin estado en la caché (desalojado) reabrir la lección no se difiere
+        cache.clear()
+        respuesta = self.client.patch(f'{self.url}?modo=diferido', {'completado': False}, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.inscripcion.refresh_from_db()
+        self.assertEqual(self.inscripcion.lecciones_completadas, 0)
+
+        # Reenviar el mismo valor sí se difiere
+        respuesta = self.client.patch(f'{self.url}?modo=diferido', {'completado': False}, format='json')
+        self.assertEqual(respuesta.status_code, 202)
+
+    def test_ranura_a_medio_anotar(self):
+        self.client.get(self.url)
+        indice = cmi.PENDIENTES
+        par = (self.inscripcion.pk, self.leccion.pk)
+        # Otro commit ya tomó la ranura 1 ('incr') pero aún no la escribió
+        cache.add(indice.ranuras_key, 0, None)
+        cache.incr(indice.ranuras_key)
+        self.client.patch(f'{self.url}?modo=diferido', {'suspend_data': 'a'}, format='json')
+        self.assertEqual(volcar_commits_scorm_task(), 'Progresos SCORM volcados: 0')
+
+        # El volcado esperó en la ranura 1 sin saltarse la 2
+        cache.set(indice.ranura_key.format(1), par)
+        self.assertEqual(volcar_commits_scorm_task(), 'Progresos SCORM volcados: 1')
+        progreso = ProgresoLeccion.objects.get(inscripcion=self.inscripcion, leccion=self.leccion)
+        self.assertEqual(progreso.suspend_data, 'a')
+
+        # Una ranura que no aparece (desalojada) se salta pasado ESPERA_HUECO
+        cache.incr(indice.ranuras_key)
+        self.client.patch(f'{self.url}?modo=diferido', {'suspend_data': 'b'}, format='json')
+        self.assertEqual(volcar_commits_scorm_task(), 'Progresos SCORM volcados: 0')
+        with mock.patch.object(pendientes, 'ESPERA_HUECO', 0):
+            self.assertEqual(volcar_commits_scorm_task(), 'Progresos SCORM volcados: 1')
+        progreso.refresh_from_db()
+        self.assertEqual(progreso.suspend_data, 'b')
+
+    def test_finalizacion_se_guarda_al_momento(self):
+        self.client.get(self.url)
+        self.client.patch(f'{self.url}?modo=diferido', {'suspend_data': 'fin'}, format='json')
+        respuesta = self.client.patch(
+            f'{self.url}?modo=diferido',
+            {'estado_scorm': 'passed', 'puntuacion_scorm': '90', 'completado': True},
+            format='json'
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        progreso = ProgresoLeccion.objects.get(inscripcion=self.inscripcion, leccion=self.leccion)
+        # El estado pendiente se guarda junto con la transición
+        self.assertEqual((progreso.suspend_data, progreso.estado_scorm), ('fin', 'passed'))
+        self.assertTrue(progreso.completado)
+        self.alumno.refresh_from_db()
+        self.assertEqual(self.alumno.xp_totales, 10)
+
+        # Los commits siguientes con el mismo estado vuelven a diferirse
+        respuesta = self.client.patch(
+            f'{self.url}?modo=diferido', {'estado_scorm': 'passed', 'suspend_data': 'repaso'}, format='json'
+        )
+        self.assertEqual(respuesta.status_code, 202)
+
+    def test_suspend_data_comprimido_y_sin_reescrituras(self):
+        datos = 'q1=a;q2=b;' * 6000
+        self.client.get(self.url)
+        self.assertEqual(self.client.patch(self.url, {'suspend_data': datos}, format='json').status_code, 200)
+        estado = EstadoCmi.objects.get(progreso__inscripcion=self.inscripcion)
+        self.assertEqual(estado.tamano, len(datos))
+        self.assertLess(len(estado.suspend_data_comprimido), len(datos) // 20)
+        self.assertEqual(self.client.get(self.url).data['suspend_data'], datos)
+
+        # Reenviar el mismo estado: solo las lecturas, ninguna escritura
+        with self.assertNumQueries(1):
+            self.client.patch(self.url, {'suspend_data': datos, 'estado_scorm': 'not attempted'}, format='json')
+
+        respuesta = self.client.patch(self.url, {'suspend_data': 'x' * 64001}, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_guardar_suspend_data_no_lee_el_texto(self):
+        self.client.get(self.url)
+        progreso = ProgresoLeccion.objects.get(inscripcion=self.inscripcion, leccion=self.leccion)
+        self.assertTrue(progreso.guardar_suspend_data('pagina=1'))
+
+        progreso = ProgresoLeccion.objects.get(pk=progreso.pk)
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertFalse(progreso.guardar_suspend_data('pagina=1'))
+        self.assertEqual(len(consultas), 1)
+        self.assertNotIn('suspend_data_comprimido', consultas[0]['sql'])
+
+        # El commit tampoco trae el texto al buscar el progreso
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.patch(self.url, {'suspend_data': 'pagina=1'}, format='json')
+        self.assertFalse(any('suspend_data_comprimido' in consulta['sql'] for consulta in consultas))
+
+
+class AccesosTests(DatosCursoMixin, TestCase):
+    """Caché de cursos pagados: sin consultas en caliente e invalidada por el webhook."""
+
+    def setUp(self):
+        super().setUp()
+        self.crear_leccion(titulo='Video')
+        self.alumno = Usuario.objects.create_user(username='alumno', password='clave')
+        self.inscripcion = Inscripcion.objects.create(
+            alumno=self.alumno, curso_id=self.curso.pk, precio_pagado_usd=0
+        )
+
+    def test_webhook_invalida_accesos(self):
+        self.assertFalse(accesos.esta_inscrito(self.alumno, self.curso.pk))
+        with self.assertNumQueries(0):
+            self.assertFalse(accesos.esta_inscrito(self.alumno, self.curso.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = APIClient().post('/api/v1/evaluacion/pagos/webhook/', {
+                'evento': 'pago_exitoso', 'referencia': self.inscripcion.pk, 'id_transaccion_gateway': 'tx-1'
+            }, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(accesos.inscripcion_pagada(self.alumno, self.curso.pk), self.inscripcion.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(accesos.esta_inscrito(self.alumno, self.curso.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.inscripcion.delete()
+        self.assertFalse(accesos.esta_inscrito(self.alumno, self.curso.pk))
+
+
+class AvanceTests(DatosCursoMixin, TestCase):
+    """Avance del curso: O(1) al completar una lección y recálculo al cambiar el contenido."""
+
+    def setUp(self):
+        super().setUp()
+        self.lecciones = [
+            self.crear_leccion(titulo='L0'),
+            Leccion.objects.create(modulo=self.modulo, titulo='L1', orden=2),
+        ]
+        self.alumno = Usuario.objects.create_user(username='alumno', password='clave')
+        self.inscripcion = Inscripcion.objects.create(
+            alumno=self.alumno, curso_id=self.curso.pk, precio_pagado_usd=0,
+            estado_pago=Inscripcion.ESTADO_PAGADO
+        )
+
+    def completar(self, leccion, completado=True):
+        progreso, _ = ProgresoLeccion.objects.get_or_create(inscripcion=self.inscripcion, leccion=leccion)
+        progreso.completado = completado
+        progreso.save(update_fields=['completado'])
+        self.inscripcion.refresh_from_db()
+
+    def test_avance_y_recalculo(self):
+        self.completar(self.lecciones[0])
+        self.assertEqual(self.inscripcion.porcentaje_progreso, Decimal('50'))
+        self.assertFalse(self.inscripcion.completado)
+        self.completar(self.lecciones[0]) # Ya estaba completada: no cuenta dos veces
+        self.assertEqual(self.inscripcion.lecciones_completadas, 1)
+
+        self.completar(self.lecciones[1])
+        self.assertEqual(self.inscripcion.porcentaje_progreso, Decimal('100'))
+        self.assertTrue(self.inscripcion.completado)
+        self.assertTrue(Certificado.objects.filter(inscripcion=self.inscripcion).exists())
+        self.alumno.refresh_from_db()
+        self.assertEqual(self.alumno.xp_totales, 20)
+
+        # Una lección nueva programa el recálculo del curso
+        with mock.patch('evaluacion.tasks.recalcular_avance_task.apply_async') as encolar:
+            with self.captureOnCommitCallbacks(execute=True):
+                Leccion.objects.create(modulo=self.modulo, titulo='L2', orden=3)
+        encolar.assert_called_once()
+        recalcular_avance_task(self.curso.pk)
+        self.inscripcion.refresh_from_db()
+        self.assertEqual(self.inscripcion.porcentaje_progreso, Decimal('66.67'))
+        self.assertTrue(self.inscripcion.completado) # Un curso completado sigue completado
+
+    def test_xp_solo_la_primera_vez(self):
+        self.completar(self.lecciones[0])
+        fecha = ProgresoLeccion.objects.get(leccion=self.lecciones[0]).fecha_completado
+        self.assertIsNotNone(fecha)
+
+        # Desmarcar y volver a marcar mueve el avance, pero no otorga más XP
+        for completado in (False, True, False, True):
+            self.completar(self.lecciones[0], completado)
+            self.assertEqual(self.inscripcion.lecciones_completadas, int(completado))
+        self.alumno.refresh_from_db()
+        self.assertEqual(self.alumno.xp_totales, 10)
+        self.assertEqual(ProgresoLeccion.objects.get(leccion=self.lecciones[0]).fecha_completado, fecha)
+
+
+class LatidosTests(DatosCursoMixin, TestCase):
+    """Latidos del reproductor: acumulados en la caché, sin duplicados y volcados por lotes."""
+
+    def setUp(self):
+        super().setUp()
+        self.crear_leccion(titulo='Video')
+        alumno = Usuario.objects.create_user(username='alumno', password='clave')
+        self.inscripcion = Inscripcion.objects.create(
+            alumno=alumno, curso_id=self.curso.pk, precio_pagado_usd=0, estado_pago=Inscripcion.ESTADO_PAGADO
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(alumno)
+        self.url = f'/api/v1/evaluacion/latido/{self.leccion.pk}/'
+        # Hora del servidor controlada por el test
+        reloj = mock.patch.object(latidos, 'time')
+        self.reloj = reloj.start()
+        self.addCleanup(reloj.stop)
+        self.reloj.time.return_value = 60 * 10000
+
+    def pasar(self, segundos):
+        self.reloj.time.return_value += segundos
+
+    def latido(self, seq, segundos=30, porcentaje=None, sesion='s1'):
+        datos = {'sesion': sesion, 'seq': seq, 'segundos': segundos}
+        if porcentaje is not None:
+            datos['porcentaje_visto'] = porcentaje
+        return self.client.post(self.url, datos, format='json')
+
+    def segundos_sin_volcar(self):
+        return cache.get(latidos.SEGUNDOS_KEY.format(self.inscripcion.pk, self.leccion.pk))
+
+    def minutos(self):
+        return ProgresoLeccion.objects.get(
+            inscripcion=self.inscripcion, leccion=self.leccion
+        ).tiempo_dedicado_minutos
+
+    def test_latidos_duplicados_desordenados_y_volcado(self):
+        self.latido(1, porcentaje='10')
+        with self.assertNumQueries(0):
+            self.pasar(30)
+            self.latido(3, porcentaje='30')
+            self.pasar(30)
+            self.latido(2, porcentaje='20') # Llega tarde: cuenta
+            respuesta = self.latido(3) # Repetido: no cuenta
+        self.assertEqual(respuesta.status_code, 202)
+        self.assertTrue(respuesta.data['duplicado'])
+        self.assertEqual(self.latido(4, segundos=3600).status_code, 400)
+
+        # 90 segundos: se vuelca un minuto y el resto espera
+        self.assertEqual(volcar_latidos_task(), 'Progresos actualizados por latidos: 1')
+        progreso = ProgresoLeccion.objects.get(inscripcion=self.inscripcion, leccion=self.leccion)
+        self.assertEqual((progreso.tiempo_dedicado_minutos, progreso.porcentaje_visto), (1, Decimal('30')))
+
+        # Otra sesión de reproducción empieza de nuevo en seq 1
+        self.pasar(60)
+        self.latido(1, porcentaje='5', sesion='s2')
+        volcar_latidos_task()
+        progreso.refresh_from_db()
+        self.assertEqual((progreso.tiempo_dedicado_minutos, progreso.porcentaje_visto), (2, Decimal('30')))
+
+        # Un latido más viejo que la ventana no cuenta
+        self.latido(latidos.VENTANA + 10, sesion='s2')
+        self.assertTrue(self.latido(5, sesion='s2').data['duplicado'])
+
+    def test_segundos_acotados_por_el_reloj(self):
+        # Una sesión no suma más tiempo del que pasó en el servidor
+        self.latido(1, segundos=60)
+        self.pasar(10)
+        self.latido(2, segundos=60)
+        self.assertEqual(self.segundos_sin_volcar(), 70)
+
+        # Muchas sesiones a la vez tampoco: cada minuto de reloj suma 60 s como mucho
+        for i in range(20):
+            self.latido(1, segundos=60, sesion=f'p{i}')
+        self.assertEqual(self.segundos_sin_volcar(), 70)
+        self.pasar(30)
+        for i in range(20):
+            self.latido(2, segundos=30, sesion=f'p{i}')
+        self.assertEqual(self.segundos_sin_volcar(), 100)
+        volcar_latidos_task()
+        self.assertEqual(self.minutos(), 1)
+
+    def test_resto_de_segundos_se_vuelca_al_terminar(self):
+        self.latido(1, segundos=45)
+        self.assertEqual(volcar_latidos_task(), 'Progresos actualizados por latidos: 0')
+        # El alumno sigue en la lección: el resto espera aunque falte un latido
+        self.pasar(30)
+        self.assertEqual(volcar_latidos_task(), 'Progresos actualizados por latidos: 0')
+        # Sin latidos durante INACTIVIDAD, los 45 s se redondean a un minuto
+        self.pasar(latidos.INACTIVIDAD)
+        self.assertEqual(volcar_latidos_task(), 'Progresos actualizados por latidos: 1')
+        self.assertEqual(self.minutos(), 1)
+        self.assertEqual(volcar_latidos_task(), 'Progresos actualizados por latidos: 0')
+
+        # Un latido que llega tarde salda el redondeo: 60 s siguen siendo un minuto
+        self.latido(2, segundos=15)
+        self.assertEqual(self.segundos_sin_volcar(), 0)
+        volcar_latidos_task()
+        self.assertEqual(self.minutos(), 1)
+
+        # Menos de 30 s al terminar no se pierden: esperan a la próxima visita
+        self.pasar(30)
+        self.latido(3, segundos=20)
+        self.pasar(latidos.INACTIVIDAD)
+        self.assertEqual(volcar_latidos_task(), 'Progresos actualizados por latidos: 0')
+        self.assertEqual(self.segundos_sin_volcar(), 20)
+        self.latido(1, segundos=40, sesion='s2')
+        volcar_latidos_task()
+        self.assertEqual(self.minutos(), 2)
+
+    def test_segundos_caducados_al_volcar(self):
+        self.latido(1, segundos=60)
+        self.pasar(30)
+        self.latido(2, segundos=30)
+        escribir = latidos._escribir
+
+        def escribir_y_caducar(incrementos):
+            cache.delete(latidos.SEGUNDOS_KEY.format(self.inscripcion.pk, self.leccion.pk))
+            return escribir(incrementos)
+
+        with mock.patch.object(latidos, '_escribir', escribir_y_caducar):
+            self.assertEqual(volcar_latidos_task(), 'Progresos actualizados por latidos: 1')
+        # El cursor avanzó igual: no se vuelve a volcar el mismo minuto
+        self.assertEqual(volcar_latidos_task(), 'Progresos actualizados por latidos: 0')
+        self.assertEqual(self.minutos(), 1)
@@ -6,6 +6,9 @@ import sys
 
 def main():
     """Run administrative tasks."""
+    # 'manage.py test' usa los ajustes de pruebas (sin Redis) salvo que se indique otro módulo
+    if sys.argv[1:2] == ['test']:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cursapp_bcken.settings_test')
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cursapp_bcken.settings')
     try:
         from django.core.management import execute_from_command_line
@@ -1,7 +1,9 @@
 from rest_framework import generics, permissions
 from recomendacion.api.serializers import CursoListSerializer
 from cursos.models import Curso
-from evaluacion.models import InteraccionLeccion, Inscripcion
+from cursos.api.viewsets import CursoViewSet
+from evaluacion.models import InteraccionLeccion
+from evaluacion import accesos
 from django.db.models import Count
 
 class RecomendacionAPIView(generics.ListAPIView):
@@ -17,10 +19,7 @@ class RecomendacionAPIView(generics.ListAPIView):
         user = self.request.user
         
         # Identificar cursos ya inscritos (para excluirlos)
-        cursos_inscritos_ids = Inscripcion.objects.filter(
-            alumno=user,
-            estado_pago=Inscripcion.ESTADO_PAGADO
-        ).values_list('curso_id', flat=True)
+        cursos_inscritos_ids = list(accesos.cursos_pagados(user.pk))
         
         # Análisis de Comportamiento
         # Buscar la categoría donde el usuario tuvo la mayor interacción (tasa_interes > 0)
@@ -39,12 +38,12 @@ class RecomendacionAPIView(generics.ListAPIView):
             # Recomendar 3 cursos de la categoría más afín (la primera en afinidades).
             categoria_preferida_id = afinidades['leccion__modulo__curso__categoria']
             
-            recomendaciones = Curso.objects.filter(
+            recomendaciones = CursoViewSet.plan_listado(Curso.objects.filter(
                 estado=Curso.ESTADO_PUBLICADO,
                 categoria_id=categoria_preferida_id
             ).exclude(
                 id__in=cursos_inscritos_ids # Excluir cursos ya comprados
-            ).order_by('?')[:3]
+            )).order_by('?')[:3]
             
             # Si se encuentran cursos, devolver estas 3 recomendaciones.
             
@@ -52,8 +51,8 @@ class RecomendacionAPIView(generics.ListAPIView):
                 return recomendaciones
             
         # Cold Start: Si no hay cursos en la categoría afín, devuelve los cursos más recientes
-        return Curso.objects.filter(
+        return CursoViewSet.plan_listado(Curso.objects.filter(
             estado=Curso.ESTADO_PUBLICADO
         ).exclude(
             id__in=cursos_inscritos_ids
-        ).order_by('-fecha_creacion')[:5]
\ No newline at end of file
+        )).order_by('-fecha_creacion')[:5]
\ No newline at end of file
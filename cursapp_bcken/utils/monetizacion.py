@@ -1,43 +1,193 @@
+import time
+import logging
+import threading
 import requests
 from django.core.cache import cache
 from django.conf import settings
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
+
+logger = logging.getLogger(__name__)
 
 # Definición de constantes
 API_URL = "https://api.dolarvzla.com/public/exchange-rate"
 CAMPO_NAME = "current" # Nombre del campo que especifica la Tasa BCV en la API
 CACHE_KEY = "bcv_exchange_rate"
-CACHE_TIMEOUT = 60 * 60 * 6 # 6 horas de caché
+CACHE_TIMEOUT = None # La tasa nunca expira: si el refresco falla se sigue sirviendo la última conocida
+TASA_VIGENCIA = 60 * 60 * 6 # 6 horas: pasado este tiempo la tasa se considera 'stale'
+LOCK_KEY = f"{CACHE_KEY}:lock"
+LOCK_TIMEOUT = 30 # Segundos máximos que un worker puede retener el refresco
+REFRESCO_PROGRAMADO_KEY = f"{CACHE_KEY}:refresco_programado"
+STATS_KEY = f"{CACHE_KEY}:stats:" + "{}"
+STATS = ('hits', 'misses', 'refrescos', 'errores')
+# Los hits se cuentan en memoria del proceso y se suman a la caché compartida
+# como mucho una vez cada HITS_INTERVALO segundos (no un round trip por request)
+HITS_INTERVALO = 30
 
-def obtener_tasa_bcv():
+_hits = {'pendientes': 0, 'volcado': time.monotonic()}
+_hits_lock = threading.Lock()
+
+
+def _incrementar_contador(nombre, cantidad=1):
+    """Incrementa un contador de la caché compartida (crea la clave si no existe)."""
+    clave = STATS_KEY.format(nombre)
+    cache.add(clave, 0, None) # Primer uso o caché reiniciada
+    try:
+        cache.incr(clave, cantidad)
+    except ValueError:
+        cache.set(clave, cantidad, None)
+
+
+def _contar_hit():
+    with _hits_lock:
+        _hits['pendientes'] += 1
+        if time.monotonic() - _hits['volcado'] < HITS_INTERVALO:
+            return
+    _volcar_hits()
+
+
+def _volcar_hits():
+    """Suma a la caché compartida los hits contados en este proceso."""
+    with _hits_lock:
+        cantidad, _hits['pendientes'] = _hits['pendientes'], 0
+        _hits['volcado'] = time.monotonic()
+    if cantidad:
+        _incrementar_contador('hits', cantidad)
+
+
+def obtener_estadisticas_tasa():
     """
-    Obtener la tasa de cambio USD/VES del BCV, usando caché para optimizar.
-    Si la API falla, devuelve un valor predeterminado o la última tasa conocida.
+    Devuelve los contadores de uso del servicio de tasa (hits, misses, refrescos, errores).
+    Los hits de otros procesos pueden llegar con hasta HITS_INTERVALO segundos de retraso.
     """
-    # Intentar obtener de la caché
-    tasa = cache.get(CACHE_KEY)
-    if tasa is not None:
-        return Decimal(tasa)
-    
-    # Si no está en caché, consultar la API externa
+    _volcar_hits()
+    valores = cache.get_many([STATS_KEY.format(nombre) for nombre in STATS])
+    return {nombre: valores.get(STATS_KEY.format(nombre), 0) for nombre in STATS}
+
+
+def consultar_api_bcv():
+    """
+    Consulta la API externa y devuelve la tasa USD/VES del BCV.
+    Realiza I/O de red: SOLO debe llamarse desde tareas en segundo plano (Celery).
+    Lanza una excepción si la API falla o no devuelve la tasa.
+    """
+    response = requests.get(API_URL, timeout=5)
+    response.raise_for_status() # Lanza HTTPError si la respuesta es un error
+    data = response.json()
+
+    # Parsear la respuesta y encontrar la tasa del BCV
+    tasa_str = (data.get(CAMPO_NAME) or {}).get('usd')
+    if not tasa_str:
+        raise ValueError("La API de BCV no devolvió la tasa 'usd'.")
+
     try:
-        response = requests.get(API_URL, timeout=5) 
-        response.raise_for_status() # Lanza HTTPError si la respuesta es un error
-        data = response.json()
-        
-        # Parsear la respuesta y encontrar la tasa del BCV
-        tasa_str = data.get(CAMPO_NAME, None).get('usd')
-        
-        if tasa_str:
-            tasa = Decimal(tasa_str)
-            # Almacena en caché antes de devolver
-            cache.set(CACHE_KEY, tasa_str, CACHE_TIMEOUT)
-            return tasa
-        # Si la API responde pero no tiene el campo esperado
-        print("Advertencia: API de BCV no devolvió la tasa 'rate'.")
-        return Decimal('0.00') # Valor por defecto de emergencia
-    except requests.RequestException as e:
-        print(f"Error al conectar con la API de BCV: {e}")
-        # Retornar la última tasa conocida o un valor fijo en caso de fallo total
-        return Decimal('0.00')
-    
\ No newline at end of file
+        tasa = Decimal(str(tasa_str))
+    except InvalidOperation:
+        raise ValueError(f"La API de BCV devolvió una tasa inválida: {tasa_str!r}")
+
+    if tasa <= 0:
+        raise ValueError(f"La API de BCV devolvió una tasa no positiva: {tasa}")
+    return tasa
+
+
+def refrescar_tasa_bcv():
+    """
+    Consulta la API y actualiza la tasa en la caché compartida.
+
+    Usa un candado (single-flight) para que, aunque varios workers lo intenten
+    a la vez, solo uno consulte la API. Si la consulta falla, la tasa anterior
+    se mantiene intacta (serve-stale-on-error).
+
+    Devuelve la nueva tasa, o None si otro worker ya estaba refrescando o la API falló.
+    """
+    if not cache.add(LOCK_KEY, 1, LOCK_TIMEOUT):
+        # Otro worker ya está consultando la API
+        return None
+
+    try:
+        tasa = consultar_api_bcv()
+    except (requests.RequestException, ValueError) as e:
+        _incrementar_contador('errores')
+        logger.warning("Error al refrescar la tasa BCV, se conserva la última conocida: %s", e)
+        return None
+    else:
+        # Historial: un registro por consulta para reportes y conciliación
+        from evaluacion.models import TasaCambio
+        registro = TasaCambio.objects.create(tasa=tasa.quantize(Decimal('0.0001')), fuente=API_URL)
+        cache.set(CACHE_KEY, _entrada_cache(registro), CACHE_TIMEOUT)
+        _incrementar_contador('refrescos')
+        return registro.tasa
+    finally:
+        cache.delete(LOCK_KEY)
+        cache.delete(REFRESCO_PROGRAMADO_KEY)
+
+
+def _programar_refresco():
+    """
+    Encola (una sola vez) la tarea de refresco en segundo plano.
+    Nunca consulta la API dentro del request.
+    """
+    if not cache.add(REFRESCO_PROGRAMADO_KEY, 1, LOCK_TIMEOUT):
+        return # Ya hay un refresco en cola
+    try:
+        from evaluacion.tasks import refrescar_tasa_bcv_task
+        refrescar_tasa_bcv_task.delay()
+    except Exception as e:
+        cache.delete(REFRESCO_PROGRAMADO_KEY)
+        logger.warning("No se pudo encolar el refresco de la tasa BCV: %s", e)
+
+
+def _entrada_cache(registro):
+    """Convierte un registro de TasaCambio en la entrada que se guarda en caché."""
+    return {
+        'id': registro.id,
+        'tasa': str(registro.tasa),
+        'actualizada': registro.fecha_obtenida.timestamp(),
+    }
+
+
+def _cargar_ultima_tasa_registrada():
+    """
+    Recupera la última tasa del historial (BD local, sin red) y la vuelve a
+    poner en la caché. Se usa cuando la caché se vació o reinició.
+    """
+    from evaluacion.models import TasaCambio
+    registro = TasaCambio.objects.order_by('-fecha_obtenida').first()
+    if registro is None:
+        return None
+    entrada = _entrada_cache(registro)
+    cache.add(CACHE_KEY, entrada, CACHE_TIMEOUT)
+    return entrada
+
+
+def obtener_tasa_vigente():
+    """
+    Obtener la tasa de cambio USD/VES del BCV vigente desde la caché compartida.
+
+    Nunca realiza I/O de red: la tasa la mantiene fresca la tarea periódica
+    'refrescar_tasa_bcv_task' (Celery beat). Si la tasa está vencida se sirve
+    igualmente (stale) y se programa un refresco.
+
+    Devuelve un dict {'id': <TasaCambio.id>, 'tasa': Decimal} o None si no hay
+    ninguna tasa conocida.
+    """
+    entrada = cache.get(CACHE_KEY)
+    if entrada is None:
+        _incrementar_contador('misses')
+        entrada = _cargar_ultima_tasa_registrada()
+        if entrada is None:
+            _programar_refresco()
+            return None
+    else:
+        _contar_hit()
+
+    if time.time() - entrada['actualizada'] > TASA_VIGENCIA:
+        _programar_refresco()
+    return {'id': entrada.get('id'), 'tasa': Decimal(entrada['tasa'])}
+
+
+def obtener_tasa_bcv():
+    """
+    Atajo que devuelve solo el valor de la tasa vigente (Decimal) o None.
+    """
+    vigente = obtener_tasa_vigente()
+    return vigente['tasa'] if vigente else None
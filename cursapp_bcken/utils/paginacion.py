@@ -0,0 +1,207 @@
+import json
+import base64
+import binascii
+from datetime import date, datetime
+from decimal import Decimal
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class PaginacionCursorCompuesto(BasePagination):
+    """
+    Paginación por cursor (keyset) sobre una clave compuesta y estable,
+    por ejemplo ('-fecha_creacion', 'id').
+
+    - Cada página es un 'WHERE (clave) < (última fila)' + LIMIT: cuesta lo mismo
+      en la página 1 que en la 10.000 (no usa OFFSET).
+    - Nunca ejecuta COUNT(*).
+    - Devuelve cursores opacos 'next' y 'previous'.
+
+    La vista define la clave con 'cursor_ordering' (tupla) o, si admite varios
+    órdenes, con 'cursor_ordenamientos' ({valor de ?ordering=: tupla}); el
+    primero es el orden por defecto.
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    invalid_cursor_message = 'Cursor inválido.'
+
+    @classmethod
+    def solicitada(cls, request):
+        """El cliente pide modo cursor con ?paginacion=cursor o enviando un ?cursor=."""
+        return (
+            request.query_params.get('paginacion') == 'cursor' or
+            cls.cursor_query_param in request.query_params
+        )
+
+    # --- Clave de ordenamiento ---
+
+    def get_ordering(self, request, view):
+        ordenamientos = getattr(view, 'cursor_ordenamientos', None)
+        if ordenamientos:
+            pedido = request.query_params.get(api_settings.ORDERING_PARAM)
+            return ordenamientos.get(pedido, next(iter(ordenamientos.values())))
+        return getattr(view, 'cursor_ordering', ('-id',))
+
+    @staticmethod
+    def _campo(orden):
+        return orden.lstrip('-')
+
+    def _filtro_despues_de(self, ordering, posicion):
+        """
+        Construye el WHERE equivalente a '(clave) > posicion' respetando la
+        dirección de cada campo: (a < v1) OR (a = v1 AND b > v2) OR ...
+        """
+        condicion = Q()
+        iguales = Q()
+        for orden, valor in zip(ordering, posicion):
+            campo = self._campo(orden)
+            lookup = 'lt' if orden.startswith('-') else 'gt'
+            condicion |= iguales & Q(**{f'{campo}__{lookup}': valor})
+            iguales &= Q(**{campo: valor})
+        return condicion
+
+    @staticmethod
+    def _invertir(ordering):
+        return tuple(orden[1:] if orden.startswith('-') else f'-{orden}' for orden in ordering)
+
+    # --- Codificación de cursores ---
+
+    @staticmethod
+    def _serializar_valor(valor):
+        if isinstance(valor, (datetime, date)):
+            return valor.isoformat()
+        if isinstance(valor, Decimal):
+            return str(valor)
+        return valor
+
+    def codificar_cursor(self, posicion, hacia_atras):
+        datos = {'p': [self._serializar_valor(v) for v in posicion], 'r': int(hacia_atras)}
+        crudo = json.dumps(datos, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(crudo).decode('ascii').rstrip('=')
+
+    def decodificar_cursor(self, token, ordering):
+        try:
+            relleno = '=' * (-len(token) % 4)
+            datos = json.loads(base64.urlsafe_b64decode(token + relleno))
+            posicion = datos['p']
+            hacia_atras = bool(datos.get('r'))
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(posicion, list) or len(posicion) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+        # Solo valores escalares (un cursor manipulado podría traer listas u objetos)
+        if not all(isinstance(v, (str, int, float)) and not isinstance(v, bool) for v in posicion):
+            raise NotFound(self.invalid_cursor_message)
+        return posicion, hacia_atras
+
+    # --- API de paginación de DRF ---
+
+    def get_page_size(self, request):
+        try:
+            tamano = int(request.query_params[self.page_size_query_param])
+            if tamano > 0:
+                return min(tamano, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = tuple(self.get_ordering(request, view))
+
+        token = request.query_params.get(self.cursor_query_param)
+        posicion, hacia_atras = (None, False)
+        if token:
+            posicion, hacia_atras = self.decodificar_cursor(token, self.ordering)
+
+        ordering = self._invertir(self.ordering) if hacia_atras else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if posicion is not None:
+            try:
+                queryset = queryset.filter(self._filtro_despues_de(ordering, posicion))
+            except (ValueError, TypeError, DjangoValidationError):
+                # Valores que no corresponden al tipo del campo (cursor manipulado)
+                raise NotFound(self.invalid_cursor_message)
+
+        # Se pide una fila extra para saber si hay más páginas
+        filas = list(queryset[:self.page_size + 1])
+        hay_mas = len(filas) > self.page_size
+        filas = filas[:self.page_size]
+
+        if hacia_atras:
+            filas.reverse()
+            self.hay_siguiente = posicion is not None
+            self.hay_anterior = hay_mas
+        else:
+            self.hay_siguiente = hay_mas
+            self.hay_anterior = posicion is not None
+
+        self.filas = filas
+        return filas
+
+    def _posicion(self, instancia):
+        return [getattr(instancia, self._campo(orden)) for orden in self.ordering]
+
+    def _construir_url(self, instancia, hacia_atras):
+        url = remove_query_param(self.request.build_absolute_uri(), 'offset')
+        token = self.codificar_cursor(self._posicion(instancia), hacia_atras)
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def get_next_link(self):
+        if not self.hay_siguiente or not self.filas:
+            return None
+        return self._construir_url(self.filas[-1], hacia_atras=False)
+
+    def get_previous_link(self):
+        if not self.hay_anterior or not self.filas:
+            return None
+        return self._construir_url(self.filas[0], hacia_atras=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class PaginacionHibrida(LimitOffsetPagination):
+    """
+    LimitOffset por defecto (clientes existentes: 'count', 'next', 'previous')
+    y paginación por cursor cuando el cliente la pide con ?paginacion=cursor
+    (scroll infinito).
+
+    Las búsquedas (?search=) se ordenan por relevancia, que no es una clave
+    de cursor: con ?paginacion=cursor se paginan con offset y un ?cursor=
+    junto a una búsqueda se rechaza.
+    """
+
+    @staticmethod
+    def es_busqueda(request):
+        return bool(request.query_params.get(api_settings.SEARCH_PARAM, '').strip())
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.paginador_cursor = None
+        if PaginacionCursorCompuesto.solicitada(request):
+            if not self.es_busqueda(request):
+                self.paginador_cursor = PaginacionCursorCompuesto()
+                return self.paginador_cursor.paginate_queryset(queryset, request, view)
+            if PaginacionCursorCompuesto.cursor_query_param in request.query_params:
+                raise ValidationError({
+                    PaginacionCursorCompuesto.cursor_query_param:
+                        "La paginación por cursor no admite búsquedas; use limit/offset."
+                })
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.paginador_cursor is not None:
+            return self.paginador_cursor.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,34 @@
+"""
+Datos comunes de los tests de 'cursos' y 'evaluacion'.
+"""
+from django.core.cache import cache
+from core.models import Usuario
+from cursos.models import Curso, Modulo, Leccion
+from evaluacion.models import TasaCambio
+from utils.monetizacion import obtener_tasa_vigente
+
+
+class DatosCursoMixin:
+    """
+    Caché vacía, tasa BCV ya cargada en la caché e instructor en cada test;
+    'crear_leccion' arma el árbol curso -> módulo -> lección del instructor.
+    """
+    tasa_bcv = 40 # None: sin tasa conocida
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        if self.tasa_bcv is not None:
+            TasaCambio.objects.create(tasa=self.tasa_bcv)
+            obtener_tasa_vigente()
+        self.instructor = Usuario.objects.create_user(
+            username='instructor', password='clave', rol=Usuario.ROL_INSTRUCTOR
+        )
+
+    def crear_leccion(self, precio_usd=0, **campos):
+        self.curso = Curso.objects.create(
+            titulo='Curso', slug='curso', descripcion='-', instructor=self.instructor, precio_usd=precio_usd
+        )
+        self.modulo = Modulo.objects.create(curso=self.curso, titulo='M1', descripcion='-', orden=1)
+        self.leccion = Leccion.objects.create(modulo=self.modulo, orden=1, **campos)
+        return self.leccion